@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import io
+import json
+import math
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import numpy as np
+from flask import Flask
+
+from gordo.server.asgi import AsgiApp
+from tests.conftest import (
+    api_version,
+    base_route,
+    config_str,
+    gordo_ml_server_client,
+    gordo_name,
+    gordo_project,
+    gordo_revision,
+    model_collection_directory,
+    second_gordo_name,
+    sensors,
+    trained_model_directories,
+    trained_model_directory,
+)
+
+
+"""
+`benchmark` is a pytest-benchmark fixture: https://pytest-benchmark.readthedocs.io/en/latest/
+
+Compares serving concurrent predictions of the app of
+:func:`gordo.server.server.build_app` for slow clients, which send their body in
+chunks, with the default 8 gthread threads, and asynchronously with ``AsgiApp``.
+"""
+
+N_REQUESTS = 32
+GTHREAD_THREADS = 8
+CHUNK_SIZE = 4096
+CHUNK_DELAY = 0.002
+
+
+def _body(n_tags: int) -> bytes:
+    return json.dumps({"X": np.random.random((100, n_tags)).tolist()}).encode()
+
+
+class _SlowStream(io.BytesIO):
+    """Request body sent in chunks of CHUNK_SIZE, CHUNK_DELAY apart"""
+
+    def read(self, size=-1):
+        data = super().read(size)
+        time.sleep(CHUNK_DELAY * math.ceil(len(data) / CHUNK_SIZE))
+        return data
+
+
+def _serve_gthread(app: Flask, path: str, body: bytes):
+    def post(_):
+        return app.test_client().post(
+            path,
+            input_stream=_SlowStream(body),
+            content_length=len(body),
+            content_type="application/json",
+        )
+
+    with ThreadPoolExecutor(max_workers=GTHREAD_THREADS) as executor:
+        return [resp.status_code for resp in executor.map(post, range(N_REQUESTS))]
+
+
+def _serve_asgi(asgi_app: AsgiApp, path: str, body: bytes):
+    async def post():
+        chunks = [body[i : i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE)]
+        scope = {
+            "type": "http",
+            "method": "POST",
+            "path": path,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+        sent = []
+
+        async def receive():
+            await asyncio.sleep(CHUNK_DELAY)
+            chunk = chunks.pop(0)
+            return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+        async def send(message):
+            sent.append(message)
+
+        await asgi_app(scope, receive, send)
+        return sent[0]["status"]
+
+    async def post_all():
+        return await asyncio.gather(*(post() for _ in range(N_REQUESTS)))
+
+    return asyncio.run(post_all())
+
+
+@pytest.mark.parametrize("mode", ("gthread", "asgi"))
+def test_bench_server_mode(
+    benchmark, gordo_ml_server_client, base_route, sensors, mode
+):
+    """Benchmark serving N_REQUESTS concurrent predictions from slow clients"""
+    benchmark.group = "server-mode"
+    app = gordo_ml_server_client.application
+    path = f"{base_route}/prediction"
+    body = _body(len(sensors))
+    if mode == "gthread":
+        statuses = benchmark(_serve_gthread, app, path, body)
+    else:
+        asgi_app = AsgiApp(app, max_workers=app.config["INFERENCE_THREADS"])
+        statuses = benchmark(_serve_asgi, asgi_app, path, body)
+        asgi_app.shutdown()
+    assert statuses == [200] * N_REQUESTS
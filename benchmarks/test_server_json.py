@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+import pytest
+import numpy as np
+import pandas as pd
+from flask import Flask, g, jsonify
+
+from gordo.server import utils as server_utils
+from gordo.server.server import RevisionJSONEncoder
+
+
+"""
+`benchmark` is a pytest-benchmark fixture: https://pytest-benchmark.readthedocs.io/en/latest/
+"""
+
+
+def _anomaly_response_data(n_rows: int, n_tags: int = 20) -> dict:
+    """Data of an anomaly response of n_rows for a model of n_tags"""
+    columns = pd.MultiIndex.from_tuples(
+        [
+            (group, f"tag-{i}")
+            for group in (
+                "model-input",
+                "model-output",
+                "tag-anomaly-scaled",
+                "tag-anomaly-unscaled",
+            )
+            for i in range(n_tags)
+        ]
+        + [("total-anomaly-scaled", ""), ("total-anomaly-unscaled", "")]
+    )
+    df = pd.DataFrame(
+        np.random.random((n_rows, len(columns))),
+        columns=columns,
+        index=pd.date_range("2020-01-01", periods=n_rows, freq="10T", tz="UTC"),
+    )
+    return {"data": server_utils.dataframe_to_dict(df), "time-seconds": "0.1"}
+
+
+def _encode_then_add_revision(data: dict):
+    """How the revision was added before, decoding and encoding the response again"""
+    response = jsonify(data)
+    body = response.get_json()
+    body["revision"] = g.revision
+    response.set_data(json.dumps(body).encode())
+    return response
+
+
+def _encode_with_revision(data: dict):
+    return jsonify(data)
+
+
+@pytest.mark.parametrize("n_rows", (1000, 10000))
+@pytest.mark.parametrize("encode", (_encode_with_revision, _encode_then_add_revision))
+def test_bench_revision_in_response(benchmark, n_rows, encode):
+    """Benchmark encoding an anomaly response, including its revision"""
+    benchmark.group = f"revision-in-response-{n_rows}-rows"
+    app = Flask(__name__)
+    app.json_encoder = RevisionJSONEncoder
+    data = _anomaly_response_data(n_rows)
+
+    with app.test_request_context():
+        g.revision = "1234"
+        response = benchmark(encode, data)
+        assert response.get_json()["revision"] == "1234"
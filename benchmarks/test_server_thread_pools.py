@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+import timeit
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+from gordo.server import thread_pools
+
+
+"""
+`benchmark` is a pytest-benchmark fixture: https://pytest-benchmark.readthedocs.io/en/latest/
+
+Throughput and latency of a worker running BLAS heavy requests concurrently,
+for different sizes of the BLAS/OpenMP thread pools, from one thread per call to
+one per core, the libraries' default. Each benchmark serves N_REQUESTS, so its
+time is the inverse of the throughput, and the median and 99th percentile of
+the latency of the requests are in its ``extra_info``.
+
+TensorFlow's thread pools can only be sized once per process, before it runs
+anything, so aren't compared here.
+"""
+
+N_REQUESTS = 32
+CPUS = thread_pools.available_cpus()
+BLAS_THREADS = sorted({1, 2, max(1, CPUS // 2), CPUS})
+
+
+def _request(X: np.ndarray, weights: np.ndarray) -> float:
+    """A request, running a few dense layers, giving its latency"""
+    start_time = timeit.default_timer()
+    for _ in range(5):
+        X = np.tanh(X @ weights)
+    return timeit.default_timer() - start_time
+
+
+def _serve(concurrency: int, X: np.ndarray, weights: np.ndarray):
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(lambda _: _request(X, weights), range(N_REQUESTS)))
+
+
+@pytest.mark.parametrize("concurrency", (1, 8))
+@pytest.mark.parametrize("blas_threads", BLAS_THREADS)
+def test_bench_blas_thread_pool(benchmark, concurrency, blas_threads):
+    """Benchmark serving N_REQUESTS with `concurrency` threads"""
+    benchmark.group = f"thread-pools-concurrency-{concurrency}"
+    X = np.random.random((200, 300))
+    weights = np.random.random((300, 300))
+
+    with threadpool_limits(limits=blas_threads):
+        latencies = benchmark(_serve, concurrency, X, weights)
+
+    benchmark.extra_info["derived_blas_threads"] = thread_pools.derive_settings(
+        cpus=CPUS, workers=1, concurrency=concurrency, environ={}
+    ).blas
+    benchmark.extra_info["latency_p50_s"] = float(np.percentile(latencies, 50))
+    benchmark.extra_info["latency_p99_s"] = float(np.percentile(latencies, 99))
+    assert len(latencies) == N_REQUESTS
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+import dateutil
+import pytest
+import numpy as np
+import pandas as pd
+
+from gordo.server import utils as server_utils
+
+
+"""
+`benchmark` is a pytest-benchmark fixture: https://pytest-benchmark.readthedocs.io/en/latest/
+"""
+
+
+def _dataframe_from_dict_isoparse(data: dict) -> pd.DataFrame:
+    """
+    Parsing of the index as done by `dataframe_from_dict` before it was vectorized,
+    one timestamp at the time with `dateutil.parser.isoparse`, always sorting.
+    """
+    df = pd.DataFrame.from_dict(data)
+    try:
+        df.index = df.index.map(dateutil.parser.isoparse)  # type: ignore
+    except (TypeError, ValueError):
+        df.index = df.index.map(int)
+    df.sort_index(inplace=True)
+    return df
+
+
+@pytest.mark.parametrize("n_rows", (100, 1000, 10000, 100000))
+@pytest.mark.parametrize(
+    "parse", (server_utils.dataframe_from_dict, _dataframe_from_dict_isoparse)
+)
+def test_bench_dataframe_from_dict(benchmark, n_rows, parse):
+    """Benchmark parsing the timestamps of a request's 'X'"""
+    benchmark.group = f"dataframe_from_dict-{n_rows}-rows"
+    df = pd.DataFrame(
+        np.random.random((n_rows, 4)),
+        columns=[f"tag-{i}" for i in range(4)],
+        index=pd.date_range("2020-01-01", periods=n_rows, freq="10T", tz="UTC"),
+    )
+    data = server_utils.dataframe_to_dict(df)
+
+    parsed = benchmark(parse, data)
+    assert (parsed.index == df.index).all()
@@ -23,6 +23,7 @@ from typing import Tuple, List, Any, cast
 from gordo.builder.build_model import ModelBuilder
 from gordo import serializer
 from gordo.server import server
+from gordo.server import metadata_catalog
 from gordo import __version__
 from gordo.machine import Machine
 from gordo.cli.workflow_generator import workflow_cli
@@ -342,6 +343,19 @@ def get_all_score_strings(machine):
     help="Run with custom config for prometheus",
     is_flag=True,
 )
+@click.option(
+    "--preload",
+    help="Load the EXPECTED_MODELS before forking the workers, which warm them up.",
+    is_flag=True,
+    envvar="GORDO_SERVER_PRELOAD",
+)
+@click.option(
+    "--asgi",
+    help="Serve the app asynchronously with uvicorn workers, running the models "
+    "in a thread pool of INFERENCE_THREADS (default: number of available CPUs) threads.",
+    is_flag=True,
+    envvar="GORDO_SERVER_ASGI",
+)
 def run_server_cli(
     host,
     port,
@@ -352,6 +366,8 @@ def run_server_cli(
     log_level,
     server_app,
     with_prometheus_config,
+    preload,
+    asgi,
 ):
     """
     Run the gordo server app with Gunicorn
@@ -369,12 +385,28 @@ def run_server_cli(
         threads=threads,
         worker_class=worker_class,
         server_app=server_app,
+        preload=preload,
+        asgi=asgi,
     )
 
 
+@click.command("build-metadata-catalog")
+@click.argument(
+    "model-collection-dir", envvar="MODEL_COLLECTION_DIR", type=click.Path(exists=True)
+)
+def build_metadata_catalog_cli(model_collection_dir: str):
+    """
+    Write the metadata catalog of a revision's models, read by the server
+    instead of each model's metadata.json
+    """
+    path = metadata_catalog.write_catalog(model_collection_dir)
+    click.echo(f"Wrote metadata catalog to {path}")
+
+
 gordo.add_command(workflow_cli)
 gordo.add_command(build)
 gordo.add_command(run_server_cli)
+gordo.add_command(build_metadata_catalog_cli)
 
 
 if __name__ == "__main__":
@@ -3,7 +3,7 @@ import numpy as np
 import pandas as pd
 import xarray as xr
 
-from typing import Optional, Union
+from typing import Collection, Optional, Set, Union
 from datetime import timedelta
 
 from sklearn.preprocessing import MinMaxScaler
@@ -17,6 +17,42 @@ from gordo.machine.model import utils as model_utils
 from gordo.machine.model.models import KerasAutoEncoder
 from gordo.machine.model.anomaly.base import AnomalyDetectorBase
 
+# The top level columns of the anomalies, and the columns each is calculated from
+ANOMALY_COLUMN_DEPENDENCIES = {
+    "tag-anomaly-scaled": (),
+    "total-anomaly-scaled": ("tag-anomaly-scaled",),
+    "tag-anomaly-unscaled": (),
+    "total-anomaly-unscaled": ("tag-anomaly-unscaled",),
+    "smooth-tag-anomaly-scaled": ("tag-anomaly-scaled",),
+    "smooth-total-anomaly-scaled": ("total-anomaly-scaled",),
+    "smooth-tag-anomaly-unscaled": ("tag-anomaly-unscaled",),
+    "smooth-total-anomaly-unscaled": ("total-anomaly-unscaled",),
+    "anomaly-confidence": ("tag-anomaly-scaled",),
+    "total-anomaly-confidence": ("total-anomaly-scaled",),
+}
+
+
+def required_anomaly_columns(columns: Optional[Collection[str]] = None) -> Set[str]:
+    """
+    The anomaly columns which have to be calculated to give ``columns``, all of
+    them if ``columns`` is ``None``.
+
+    Example
+    -------
+    >>> sorted(required_anomaly_columns(["smooth-total-anomaly-scaled"]))
+    ['smooth-total-anomaly-scaled', 'tag-anomaly-scaled', 'total-anomaly-scaled']
+    """
+    if columns is None:
+        return set(ANOMALY_COLUMN_DEPENDENCIES)
+    required: Set[str] = set()
+    pending = [name for name in columns if name in ANOMALY_COLUMN_DEPENDENCIES]
+    while pending:
+        name = pending.pop()
+        if name not in required:
+            required.add(name)
+            pending.extend(ANOMALY_COLUMN_DEPENDENCIES[name])
+    return required
+
 
 class DiffBasedAnomalyDetector(AnomalyDetectorBase):
     def __init__(
@@ -322,6 +358,9 @@ class DiffBasedAnomalyDetector(AnomalyDetectorBase):
         X: Union[pd.DataFrame, xr.DataArray],
         y: Union[pd.DataFrame, xr.DataArray],
         frequency: Optional[timedelta] = None,
+        model_output: Optional[np.ndarray] = None,
+        timestamp_format: str = "iso",
+        columns: Optional[Collection[str]] = None,
     ) -> Union[pd.DataFrame, xr.Dataset]:
         """
         Create an anomaly dataframe from the base provided dataframe.
@@ -332,6 +371,15 @@ class DiffBasedAnomalyDetector(AnomalyDetectorBase):
             Dataframe representing the data to go into the model.
         y: pd.DataFrame
             Dataframe representing the target output of the model.
+        model_output: Optional[np.ndarray]
+            Output of the model given ``X``, if already calculated.
+        timestamp_format: str
+            Format of the ``start`` and ``end`` columns, see
+            :func:`gordo.machine.model.utils.make_base_dataframe`
+        columns: Optional[Collection[str]]
+            Top level columns to give, besides ``start`` and ``end``, such as
+            ``tag-anomaly-scaled`` or ``model-output``. Only these, and the columns
+            they are calculated from, are calculated. Defaults to all of them.
 
         Returns
         -------
@@ -339,11 +387,16 @@ class DiffBasedAnomalyDetector(AnomalyDetectorBase):
             A superset of the original base dataframe with added anomaly specific
             features
         """
+        required = required_anomaly_columns(columns)
+
+        def requested(name: str) -> bool:
+            return columns is None or name in columns
 
         # Get the model output, falling back to transform if 'predict' doesn't exist
-        model_output = (
-            self.predict(X) if hasattr(self, "predict") else self.transform(X)
-        )
+        if model_output is None:
+            model_output = (
+                self.predict(X) if hasattr(self, "predict") else self.transform(X)
+            )
 
         # Create the basic dataframe with 'model-output' & 'model-input'
         data = model_utils.make_base_dataframe(
@@ -353,100 +406,106 @@ class DiffBasedAnomalyDetector(AnomalyDetectorBase):
             target_tag_list=y.columns,
             index=getattr(X, "index", None),
             frequency=frequency,
+            timestamp_format=timestamp_format,
         )
+        model_output_df = data["model-output"]
+        unrequested = [
+            name for name in ("model-input", "model-output") if not requested(name)
+        ]
+        if unrequested:
+            data = data.drop(columns=unrequested, level=0)
+
+        if "tag-anomaly-scaled" in required:
+            model_out_scaled = pd.DataFrame(
+                self.scaler.transform(model_output_df),
+                columns=model_output_df.columns,
+                index=data.index,
+            )
 
-        model_out_scaled = pd.DataFrame(
-            self.scaler.transform(data["model-output"]),
-            columns=data["model-output"].columns,
-            index=data.index,
-        )
-
-        # Calculate the absolute scaled tag anomaly
-        # Ensure to offset the y to match model out, which could be less if it is a LSTM
-        scaled_y = self.scaler.transform(y)
-        tag_anomaly_scaled = np.abs(model_out_scaled - scaled_y[-len(data) :, :])
-        tag_anomaly_scaled.columns = pd.MultiIndex.from_product(
-            (("tag-anomaly-scaled",), tag_anomaly_scaled.columns)
-        )
-        data = data.join(tag_anomaly_scaled)
+            # Calculate the absolute scaled tag anomaly
+            # Ensure to offset the y to match model out, which could be less if it is a LSTM
+            scaled_y = self.scaler.transform(y)
+            tag_anomaly_scaled = np.abs(model_out_scaled - scaled_y[-len(data) :, :])
+            tag_anomaly_scaled.columns = pd.MultiIndex.from_product(
+                (("tag-anomaly-scaled",), tag_anomaly_scaled.columns)
+            )
+            if requested("tag-anomaly-scaled"):
+                data = data.join(tag_anomaly_scaled)
 
         # Calculate scaled total anomaly
-        data["total-anomaly-scaled"] = np.square(data["tag-anomaly-scaled"]).mean(
-            axis=1
-        )
+        if "total-anomaly-scaled" in required:
+            total_anomaly_scaled = np.square(tag_anomaly_scaled).mean(axis=1)
+            if requested("total-anomaly-scaled"):
+                data["total-anomaly-scaled"] = total_anomaly_scaled
 
         # Calculate the absolute unscaled tag anomalies
-        unscaled_abs_diff = pd.DataFrame(
-            data=np.abs(
-                data["model-output"].to_numpy() - y.to_numpy()[-len(data) :, :]
-            ),
-            index=data.index,
-            columns=pd.MultiIndex.from_product(
-                (("tag-anomaly-unscaled",), y.columns.tolist())
-            ),
-        )
-        data = data.join(unscaled_abs_diff)
+        if "tag-anomaly-unscaled" in required:
+            unscaled_abs_diff = pd.DataFrame(
+                data=np.abs(model_output_df.to_numpy() - y.to_numpy()[-len(data) :, :]),
+                index=data.index,
+                columns=pd.MultiIndex.from_product(
+                    (("tag-anomaly-unscaled",), y.columns.tolist())
+                ),
+            )
+            if requested("tag-anomaly-unscaled"):
+                data = data.join(unscaled_abs_diff)
 
         # Calculate the scaled total anomaly
-        data["total-anomaly-unscaled"] = np.square(data["tag-anomaly-unscaled"]).mean(
-            axis=1
-        )
+        if "total-anomaly-unscaled" in required:
+            total_anomaly_unscaled = np.square(unscaled_abs_diff).mean(axis=1)
+            if requested("total-anomaly-unscaled"):
+                data["total-anomaly-unscaled"] = total_anomaly_unscaled
 
         if self.window is not None and self.smoothing_method is not None:
             # Calculate scaled tag-level smoothed anomaly scores
-            smooth_tag_anomaly_scaled = self._smoothing(tag_anomaly_scaled)
-            smooth_tag_anomaly_scaled.columns = smooth_tag_anomaly_scaled.columns.set_levels(
-                ["smooth-tag-anomaly-scaled"], level=0
-            )
-            data = data.join(smooth_tag_anomaly_scaled)
+            if requested("smooth-tag-anomaly-scaled"):
+                smooth_tag_anomaly_scaled = self._smoothing(tag_anomaly_scaled)
+                smooth_tag_anomaly_scaled.columns = smooth_tag_anomaly_scaled.columns.set_levels(
+                    ["smooth-tag-anomaly-scaled"], level=0
+                )
+                data = data.join(smooth_tag_anomaly_scaled)
 
             # Calculate scaled smoothed total anomaly score
-            data["smooth-total-anomaly-scaled"] = self._smoothing(
-                data["total-anomaly-scaled"]
-            )
+            if requested("smooth-total-anomaly-scaled"):
+                data["smooth-total-anomaly-scaled"] = self._smoothing(
+                    total_anomaly_scaled
+                )
 
             # Calculate unscaled tag-level smoothed anomaly scores
-            smooth_tag_anomaly_unscaled = self._smoothing(unscaled_abs_diff)
+            if requested("smooth-tag-anomaly-unscaled"):
+                smooth_tag_anomaly_unscaled = self._smoothing(unscaled_abs_diff)
 
-            smooth_tag_anomaly_unscaled.columns = smooth_tag_anomaly_unscaled.columns.set_levels(
-                ["smooth-tag-anomaly-unscaled"], level=0
-            )
-            data = data.join(smooth_tag_anomaly_unscaled)
+                smooth_tag_anomaly_unscaled.columns = smooth_tag_anomaly_unscaled.columns.set_levels(
+                    ["smooth-tag-anomaly-unscaled"], level=0
+                )
+                data = data.join(smooth_tag_anomaly_unscaled)
 
             # Calculate unscaled smoothed total anomaly score
-            data["smooth-total-anomaly-unscaled"] = self._smoothing(
-                data["total-anomaly-unscaled"]
-            )
+            if requested("smooth-total-anomaly-unscaled"):
+                data["smooth-total-anomaly-unscaled"] = self._smoothing(
+                    total_anomaly_unscaled
+                )
 
         # If we have `thresholds_` values, then we can calculate anomaly confidence
-        confidence, index = None, None
-
-        if hasattr(self, "feature_thresholds_"):
-            confidence = tag_anomaly_scaled.values / self.feature_thresholds_.values
-            index = tag_anomaly_scaled.index
-
-        if confidence is not None and index is not None:
+        if requested("anomaly-confidence") and hasattr(self, "feature_thresholds_"):
             # Dataframe of % abs_diff is of the thresholds
             # This is now based on the smoothed tag anomaly
             anomaly_confidence_scores = pd.DataFrame(
-                confidence,
-                index=index,
+                tag_anomaly_scaled.values / self.feature_thresholds_.values,
+                index=tag_anomaly_scaled.index,
                 columns=pd.MultiIndex.from_product(
-                    (("anomaly-confidence",), data["model-output"].columns)
+                    (("anomaly-confidence",), model_output_df.columns)
                 ),
             )
             data = data.join(anomaly_confidence_scores)
 
-        total_anomaly_confidence = None
-
-        if hasattr(self, "aggregate_threshold_"):
-            total_anomaly_confidence = (
-                data["total-anomaly-scaled"] / self.aggregate_threshold_
+        if requested("total-anomaly-confidence") and hasattr(
+            self, "aggregate_threshold_"
+        ):
+            data["total-anomaly-confidence"] = (
+                total_anomaly_scaled / self.aggregate_threshold_
             )
 
-        if total_anomaly_confidence is not None:
-            data["total-anomaly-confidence"] = total_anomaly_confidence
-
         # Explicitly raise error if we were required to do threshold based calculations
         # should would have required a call to .cross_validate before .anomaly
         if self.require_thresholds and not any(
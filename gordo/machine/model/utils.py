@@ -4,7 +4,7 @@ import typing
 import functools
 import logging
 from typing import Optional, Union, List
-from datetime import timedelta, datetime
+from datetime import timedelta
 
 import numpy as np
 import pandas as pd
@@ -46,6 +46,71 @@ def metric_wrapper(metric, scaler: Optional[TransformerMixin] = None):
     return _wrapper
 
 
+def isoformat_index(index: pd.DatetimeIndex) -> np.ndarray:
+    """
+    Vectorized equivalent of calling ``.isoformat()`` on each timestamp of the index.
+
+    Parameters
+    ----------
+    index: pd.DatetimeIndex
+        Timestamps to format.
+
+    Returns
+    -------
+    np.ndarray
+        Array of ISO 8601 formatted strings.
+
+    Examples
+    --------
+    >>> index = pd.DatetimeIndex(["2020-01-01T00:00:00", "2020-01-01T00:00:00.5"], tz="UTC")
+    >>> isoformat_index(index).tolist()
+    ['2020-01-01T00:00:00+00:00', '2020-01-01T00:00:00.500000+00:00']
+    """
+    wall_time = index.tz_localize(None) if index.tz is not None else index
+    nanoseconds = wall_time.asi8 % 1_000_000_000
+
+    # Timestamp.isoformat gives nanoseconds when there are any, leave those to it.
+    if np.any(nanoseconds % 1000):
+        return np.array([ts.isoformat() for ts in index], dtype=object)
+
+    formatted = np.datetime_as_string(wall_time.values, unit="s")
+
+    # Microseconds are only given for timestamps which have any
+    has_fraction = nanoseconds != 0
+    if has_fraction.any():
+        fractions = np.char.mod(".%06d", nanoseconds // 1000)
+        formatted = np.where(has_fraction, np.char.add(formatted, fractions), formatted)
+
+    if index.tz is not None:
+        offsets_s = (wall_time.asi8 - index.asi8) // 1_000_000_000
+        unique_offsets, inverse = np.unique(offsets_s, return_inverse=True)
+        offset_strings = np.array(
+            [
+                f"{'-' if offset < 0 else '+'}{abs(offset) // 3600:02d}:{abs(offset) % 3600 // 60:02d}"
+                for offset in unique_offsets
+            ]
+        )
+        formatted = np.char.add(formatted, offset_strings[inverse])
+    return formatted.astype(object)
+
+
+def _timestamp_column(
+    index: typing.Union[pd.Index, range],
+    frequency: typing.Optional[timedelta],
+    timestamp_format: str,
+) -> np.ndarray:
+    """
+    The start (``frequency=None``) or end timestamps of the index, if it has any.
+    """
+    if not isinstance(index, pd.DatetimeIndex):
+        return np.full(len(index), None, dtype=object)
+    if frequency is not None:
+        index = index + frequency
+    if timestamp_format == "epoch":
+        return index.asi8 // 1_000_000
+    return isoformat_index(index)
+
+
 def make_base_dataframe(
     tags: typing.Union[typing.List[SensorTag], typing.List[str]],
     model_input: np.ndarray,
@@ -53,6 +118,7 @@ def make_base_dataframe(
     target_tag_list: Optional[Union[List[SensorTag], List[str]]] = None,
     index: typing.Optional[np.ndarray] = None,
     frequency: typing.Optional[timedelta] = None,
+    timestamp_format: str = "iso",
 ) -> pd.DataFrame:
     """
     Construct a dataframe which has a MultiIndex column consisting of top level keys
@@ -76,81 +142,86 @@ def make_base_dataframe(
         to the length of ``model_output``, should the model output less than its input.
     frequency: Optional[datetime.timedelta]
         The spacing of the time between points.
+    timestamp_format: str
+        Format of the ``start`` and ``end`` columns, either ``"iso"`` for ISO 8601
+        strings (default), or ``"epoch"`` for integer milliseconds since the Unix epoch.
 
     Returns
     -------
     pd.DataFrame
     """
+    if timestamp_format not in ("iso", "epoch"):
+        raise ValueError(
+            f"Unsupported timestamp_format '{timestamp_format}', use 'iso' or 'epoch'"
+        )
 
     # Set target_tag_list to default to tags if not specified.
     target_tag_list = target_tag_list if target_tag_list is not None else tags
 
     # match length of output, and ensure we're working with numpy arrays, not pandas.
-    model_input = getattr(model_input, "values", model_input)[-len(model_output) :, :]
     model_output = getattr(model_output, "values", model_output)
-
-    names_n_values = (("model-input", model_input), ("model-output", model_output))
+    model_input = getattr(model_input, "values", model_input)[-len(model_output) :, :]
 
     # Define the index which all series/dataframes will share
     index = (
         index[-len(model_output) :] if index is not None else range(len(model_output))
     )
 
-    # Series to hold the start times for each point or just 'None' values
-    start_series = pd.Series(
-        index
-        if isinstance(index, pd.DatetimeIndex)
-        else (None for _ in range(len(index))),
-        index=index,
-    )
-
-    # Calculate the end times if possible, or also all 'None's
-    end_series = start_series.map(
-        lambda start: (start + frequency).isoformat()
-        if isinstance(start, datetime) and frequency is not None
-        else None
-    )
-
-    # Convert to isoformatted string for JSON serialization.
-    start_series = start_series.map(
-        lambda start: start.isoformat() if hasattr(start, "isoformat") else None
-    )
-
-    # The resulting DF will be multiindex, so we define and initialize it here
-    # with the start and end times from above.
-    columns = pd.MultiIndex.from_product((("start", "end"), ("",)))
-    data: pd.DataFrame = pd.DataFrame(
-        {("start", ""): start_series, ("end", ""): end_series},
-        columns=columns,
-        index=index,
-    )
-
-    # Begin looping over the model-input and model-output; mapping them into
-    # the multiindex column dataframe, and naming their second level labels as needed.
+    # Start times for each point and, if the frequency is known, the end times.
+    # Otherwise they are all 'None's
+    start = _timestamp_column(index, None, timestamp_format)
+    if frequency is not None and isinstance(index, pd.DatetimeIndex):
+        end = _timestamp_column(index, frequency, timestamp_format)
+    else:
+        end = np.full(len(index), None, dtype=object)
+
+    # Columns will be multi level with the title of the output on top
+    # and specific names below, ie. ('model-output', 'tag-0') as a column
+    columns: List[typing.Tuple[str, str]] = []
     name: str
     values: np.ndarray
-    for (name, values) in filter(lambda nv: nv[1] is not None, names_n_values):
-
+    for (name, values) in (
+        ("model-input", model_input),
+        ("model-output", model_output),
+    ):
         _tags = tags if name == "model-input" else target_tag_list
 
         # Create the second level of column names, either as the tag names
         # or simple range of numbers
         if values.shape[1] == len(_tags):
-            # map(...) to satisfy mypy to match second possible outcome
-            second_lvl_names = map(
-                str, (tag.name if isinstance(tag, SensorTag) else tag for tag in _tags)
-            )
+            second_lvl_names = [
+                str(tag.name if isinstance(tag, SensorTag) else tag) for tag in _tags
+            ]
         else:
-            second_lvl_names = map(str, range(values.shape[1]))
-
-        # Columns will be multi level with the title of the output on top
-        # and specific names below, ie. ('model-output', 'tag-0') as a column
-        columns = pd.MultiIndex.from_tuples(
-            (name, sub_name) for sub_name in second_lvl_names
+            second_lvl_names = [str(i) for i in range(values.shape[1])]
+        columns.extend((name, sub_name) for sub_name in second_lvl_names)
+
+    # Model input and output go into a single block when they share a dtype,
+    # rather than joining a frame per group.
+    if model_input.dtype == model_output.dtype:
+        data = pd.DataFrame(
+            np.hstack((model_input, model_output)),
+            columns=pd.MultiIndex.from_tuples(columns),
+            index=index,
+        )
+    else:
+        n_input = model_input.shape[1]
+        data = pd.concat(
+            (
+                pd.DataFrame(
+                    model_input,
+                    columns=pd.MultiIndex.from_tuples(columns[:n_input]),
+                    index=index,
+                ),
+                pd.DataFrame(
+                    model_output,
+                    columns=pd.MultiIndex.from_tuples(columns[n_input:]),
+                    index=index,
+                ),
+            ),
+            axis=1,
         )
 
-        # Pass valudes, offsetting any differences in length compared to index, as set by model-output size
-        other = pd.DataFrame(values[-len(model_output) :], columns=columns, index=index)
-        data = data.join(other)
-
+    data.insert(0, ("end", ""), end)
+    data.insert(0, ("start", ""), start)
     return data
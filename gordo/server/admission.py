@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+
+import math
+import threading
+
+from contextlib import contextmanager
+from functools import wraps
+from typing import Iterator
+
+from flask import Flask, Response, current_app, g, jsonify, make_response, request
+
+from gordo.server import timing
+
+"""
+Admission control of the prediction endpoints, so a burst of large requests
+queues up, and is eventually shed, instead of running all at once and degrading
+the latency of every request, or running the worker out of memory.
+
+The work of a request is measured by its cost, the number of rows times the
+number of tags of its ``X``. Each worker runs requests until the sum of their
+costs reaches ``ADMISSION_MAX_COST``, and further requests wait for at most
+``ADMISSION_MAX_WAIT_S`` seconds for the requests running to finish. Small
+requests, with a cost of at most ``ADMISSION_SMALL_COST``, are let in before the
+larger ones waiting, so interactive requests are not stuck behind backfills.
+
+Requests which can't be let in in time get a ``503 Service Unavailable`` response,
+and requests arriving when ``ADMISSION_MAX_QUEUE`` requests are already waiting
+get a ``429 Too Many Requests`` response, both with a ``Retry-After`` header.
+"""
+
+EXTENSION_NAME = "gordo_admission"
+
+
+class Overloaded(Exception):
+    """
+    The request was not let in.
+
+    Parameters
+    ----------
+    message: str
+        Why the request was not let in.
+    status_code: int
+        Status code of the response to the request.
+    retry_after: int
+        Seconds the client should wait before retrying.
+    """
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    def response(self) -> Response:
+        response = make_response(jsonify(message=self.message), self.status_code)
+        response.headers["Retry-After"] = str(self.retry_after)
+        return response
+
+
+class AdmissionController:
+    """
+    Lets requests in while the sum of the costs of the requests running is within
+    ``max_cost``, small requests first.
+
+    Parameters
+    ----------
+    max_cost: int
+        Maximum sum of the costs of the requests running at the same time. A request
+        costing more than this runs on its own.
+    max_wait: float
+        Maximum seconds a request waits to be let in.
+    small_cost: int
+        Requests costing at most this are let in before larger requests.
+    max_queue: int
+        Maximum number of requests waiting to be let in.
+    metrics: Optional[GordoServerPrometheusMetrics]
+        Metrics to report the requests waiting, and the requests shed, to.
+    """
+
+    def __init__(
+        self,
+        max_cost: int,
+        max_wait: float,
+        small_cost: int,
+        max_queue: int,
+        metrics=None,
+    ):
+        self.max_cost = max_cost
+        self.max_wait = max_wait
+        self.small_cost = small_cost
+        self.max_queue = max_queue
+        self.metrics = metrics
+        self.retry_after = max(1, math.ceil(max_wait))
+        self._condition = threading.Condition()
+        self._cost = 0
+        self._waiting = 0
+        self._waiting_small = 0
+        self.shed = 0
+
+    def _set_waiting(self, waiting: int, waiting_small: int):
+        self._waiting = waiting
+        self._waiting_small = waiting_small
+        if self.metrics is not None:
+            self.metrics.admission_queue_depth.labels(*self.metrics.label_values).set(
+                waiting
+            )
+
+    def _shed(self, name: str, message: str, status_code: int):
+        self.shed += 1
+        if self.metrics is not None:
+            self.metrics.admission_shed.labels(*self.metrics.label_values, name).inc()
+        raise Overloaded(message, status_code, self.retry_after)
+
+    def _can_run(self, cost: int, small: bool) -> bool:
+        if not small and self._waiting_small:
+            return False
+        return self._cost + cost <= self.max_cost
+
+    def acquire(self, cost: int, name: str = "") -> int:
+        """
+        Wait until a request of ``cost`` can run, and count it as running.
+
+        Parameters
+        ----------
+        cost: int
+            Cost of the request.
+        name: str
+            Name of the model, used as the label of the metrics.
+
+        Returns
+        -------
+        int
+            The cost to :meth:`~AdmissionController.release` once the request is done.
+
+        Raises
+        ------
+        Overloaded
+            If the request was not let in.
+        """
+        cost = min(cost, self.max_cost)
+        small = cost <= self.small_cost
+        with self._condition:
+            if not self._can_run(cost, small):
+                if self._waiting >= self.max_queue:
+                    self._shed(
+                        name,
+                        f"Too many requests waiting, {self._waiting}, try again later",
+                        429,
+                    )
+                self._set_waiting(self._waiting + 1, self._waiting_small + small)
+                try:
+                    admitted = self._condition.wait_for(
+                        lambda: self._can_run(cost, small), timeout=self.max_wait
+                    )
+                finally:
+                    self._set_waiting(self._waiting - 1, self._waiting_small - small)
+                    # Larger requests may have been waiting on this one
+                    self._condition.notify_all()
+                if not admitted:
+                    self._shed(
+                        name,
+                        f"The server is busy, and the request was not let in within "
+                        f"{self.max_wait} seconds, try again later",
+                        503,
+                    )
+            self._cost += cost
+            return cost
+
+    def release(self, cost: int):
+        """
+        Count a request of ``cost`` as done, letting in the requests waiting for it.
+        """
+        with self._condition:
+            self._cost -= cost
+            self._condition.notify_all()
+
+    @contextmanager
+    def admit(self, cost: int, name: str = "") -> Iterator[None]:
+        """
+        Run the block as a request of ``cost``.
+        """
+        cost = self.acquire(cost, name)
+        try:
+            yield
+        finally:
+            self.release(cost)
+
+    def stats(self) -> dict:
+        """
+        Statistics of the admission controller
+        """
+        with self._condition:
+            return {
+                "cost": self._cost,
+                "max-cost": self.max_cost,
+                "waiting": self._waiting,
+                "shed": self.shed,
+            }
+
+
+def get_controller():
+    """
+    The app's :class:`.AdmissionController`, or ``None`` if admission control is
+    not enabled.
+    """
+    return current_app.extensions.get(EXTENSION_NAME)
+
+
+def admitted(f):
+    """
+    Decorate a view, after ``flask.g.X`` is set by
+    :func:`gordo.server.utils.extract_X_y`, to only run it once the app's
+    :class:`.AdmissionController`, if it's enabled, lets the request in. The request
+    is counted as running until its response is sent, for streamed responses.
+    """
+
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        controller = get_controller()
+        if controller is None:
+            return f(*args, **kwargs)
+
+        name = (request.view_args or {}).get("gordo_name", "")
+        try:
+            with timing.phase(timing.ADMISSION):
+                cost = controller.acquire(g.X.size, name)
+        except Overloaded as exc:
+            return exc.response()
+
+        try:
+            response = f(*args, **kwargs)
+        except BaseException:
+            controller.release(cost)
+            raise
+        if isinstance(response, Response) and response.is_streamed:
+            response.call_on_close(lambda: controller.release(cost))
+        else:
+            controller.release(cost)
+        return response
+
+    return wrapper
+
+
+def init_app(app: Flask, metrics=None):
+    """
+    Enable admission control for the app, if ``ADMISSION_MAX_COST`` is configured.
+    """
+    max_cost = app.config["ADMISSION_MAX_COST"]
+    if max_cost > 0:
+        app.extensions[EXTENSION_NAME] = AdmissionController(
+            max_cost=max_cost,
+            max_wait=app.config["ADMISSION_MAX_WAIT_S"],
+            small_cost=app.config["ADMISSION_SMALL_COST"],
+            max_queue=app.config["ADMISSION_MAX_QUEUE"],
+            metrics=metrics,
+        )
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+import time
+
+from typing import Dict, Optional, Tuple
+
+"""
+Identities of the artifacts of the model collection, the files of the models and
+of the metadata catalogs, which the server's caches are keyed by, so an artifact
+replaced in place is loaded again rather than served stale.
+
+Taking the identity of a file on a network filesystem takes milliseconds, so each
+file's identity is only checked again every ``LISTING_REFRESH_INTERVAL_S``
+seconds, like the listings of :mod:`gordo.server.listings`.
+"""
+
+# Identity of an artifact, its inode, modification time and size, which changes
+# when it's replaced, even in place
+ArtifactIdentity = Tuple[int, int, int]
+
+
+def artifact_identity(path: str) -> Optional[ArtifactIdentity]:
+    """
+    Identity of the file of an artifact, or ``None`` if it doesn't exist.
+
+    Parameters
+    ----------
+    path: str
+        Path of the artifact.
+
+    Returns
+    -------
+    Optional[ArtifactIdentity]
+    """
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class ArtifactIdentities:
+    """
+    Identities of artifacts, each checked at most every ``interval`` seconds.
+
+    Parameters
+    ----------
+    interval: float
+        Seconds an identity is used for before it's checked again. If 0, it's
+        checked every time.
+    max_entries: int
+        Number of identities at which those which are due to be checked again
+        are dropped, so requests for models which don't exist can't grow it
+        without bounds.
+    """
+
+    def __init__(self, interval: float = 10.0, max_entries: int = 10000):
+        self.interval = interval
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._identities: Dict[str, Tuple[Optional[ArtifactIdentity], float]] = dict()
+
+    def get(self, path: str) -> Optional[ArtifactIdentity]:
+        """
+        Identity of the artifact at ``path``, as of at most ``interval`` seconds ago.
+        """
+        now = time.monotonic()
+        cached = self._identities.get(path)
+        if cached is not None and now - cached[1] < self.interval:
+            return cached[0]
+
+        identity = artifact_identity(path)
+        if self.interval > 0:
+            with self._lock:
+                if len(self._identities) >= self.max_entries:
+                    self._drop_expired(now)
+                self._identities[path] = (identity, now)
+        return identity
+
+    def clear(self):
+        """
+        Forget all identities, so they are all checked on their next use.
+        """
+        with self._lock:
+            self._identities.clear()
+
+    def _drop_expired(self, now: float):
+        self._identities = {
+            path: cached
+            for path, cached in self._identities.items()
+            if now - cached[1] < self.interval
+        }
+
+
+# Identities of the artifacts loaded by the server, checked every
+# LISTING_REFRESH_INTERVAL_S seconds, as configured by the app
+identities = ArtifactIdentities()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from gordo.server import thread_pools
+from gordo.server.server import build_app
+
+"""
+Asynchronous (ASGI) serving of the gordo server app.
+
+The request body is received, and the response sent, on the event loop of the
+worker, so slow clients don't hold up a thread. Only running the Flask app itself,
+where the model does its work, and producing each chunk of its response, is done
+in a thread pool of a bounded size, by default the number of CPUs the worker may
+use, given its cgroup CPU quota, which ``INFERENCE_THREADS`` overrides.
+
+Served with ``gordo run-server --asgi``, which runs the app with uvicorn workers.
+"""
+
+_END_OF_RESPONSE = object()
+
+
+def _environ(scope: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+    """
+    WSGI environ of the HTTP request in ``scope``, with its ``body``.
+    """
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": "HTTP/%s" % scope.get("http_version", "1.1"),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"], environ["REMOTE_PORT"] = (
+            scope["client"][0],
+            str(scope["client"][1]),
+        )
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin1").upper().replace("-", "_")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            key = name
+        else:
+            key = "HTTP_" + name
+        value = value.decode("latin1")
+        if key in environ:
+            value = environ[key] + "," + value
+        environ[key] = value
+    return environ
+
+
+class AsgiApp:
+    """
+    ASGI app serving a WSGI app, running the WSGI app in a bounded thread pool.
+
+    Parameters
+    ----------
+    wsgi_app: Callable
+        The WSGI app to serve, i.e. the app of :func:`gordo.server.server.build_app`
+    max_workers: Optional[int]
+        Number of threads running the WSGI app, defaults to the number of CPUs
+        available, see :func:`gordo.server.thread_pools.available_cpus`.
+    """
+
+    def __init__(self, wsgi_app: Callable, max_workers: Optional[int] = None):
+        self.wsgi_app = wsgi_app
+        self.max_workers = max_workers or thread_pools.available_cpus()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Created on first use, in the worker, rather than in a process which
+        # might be forked after building the app
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="gordo-inference"
+            )
+        return self._executor
+
+    def shutdown(self):
+        """
+        Shut down the thread pool, waiting for the running requests.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def __call__(self, scope: Dict[str, Any], receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+        else:
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope: Dict[str, Any], receive, send):
+        body = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+
+        environ = _environ(scope, b"".join(body))
+        loop = asyncio.get_event_loop()
+        started: List[Tuple[str, List[Tuple[str, str]]]] = []
+
+        def start_response(status: str, headers, exc_info=None):
+            started[:] = [(status, headers)]
+
+        def run_app():
+            result = self.wsgi_app(environ, start_response)
+            iterator = iter(result)
+            # The app may only start the response when its first chunk is produced
+            return result, iterator, next(iterator, _END_OF_RESPONSE)
+
+        result, iterator, chunk = await loop.run_in_executor(self.executor, run_app)
+        try:
+            status, headers = started[0]
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": int(status.split(" ", 1)[0]),
+                    "headers": [
+                        (name.lower().encode("latin1"), value.encode("latin1"))
+                        for name, value in headers
+                    ],
+                }
+            )
+            while chunk is not _END_OF_RESPONSE:
+                if chunk:
+                    await send(
+                        {"type": "http.response.body", "body": chunk, "more_body": True}
+                    )
+                chunk = await loop.run_in_executor(
+                    self.executor, next, iterator, _END_OF_RESPONSE
+                )
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            if hasattr(result, "close"):
+                await loop.run_in_executor(self.executor, result.close)
+
+
+def build_asgi_app(config: Optional[Dict[str, Any]] = None) -> AsgiApp:
+    """
+    Build the gordo server app, as an ASGI app.
+
+    Parameters
+    ----------
+    config: Optional[Dict[str, Any]]
+        Passed to :func:`gordo.server.server.build_app`
+    """
+    app = build_app(config)
+    return AsgiApp(app, max_workers=app.config["INFERENCE_THREADS"])
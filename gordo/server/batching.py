@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import timeit
+import weakref
+
+from typing import Collection, Dict, Iterator, List, Optional
+
+import numpy as np
+from flask import Flask, Response, current_app, g, jsonify, make_response, request
+
+from gordo.machine.model.anomaly.base import AnomalyDetectorBase
+from gordo.server import model_io
+
+"""
+Micro-batching of concurrent predictions on the same model.
+
+Small requests are dominated by the per-call overhead of the model, so concurrent
+requests for the same model are held for a short window, stacked into a single
+call to :func:`gordo.server.model_io.get_model_output`, and the output split
+back to each of the requests.
+
+Only models whose output for a row depends on nothing but that row can be
+stacked, so only models made of the estimators in ``MICRO_BATCH_ESTIMATORS`` are
+batched.
+"""
+
+logger = logging.getLogger(__name__)
+
+EXTENSION_NAME = "gordo_micro_batcher"
+
+# Class names of the estimators whose output for a row only depends on that row
+BATCHABLE_ESTIMATORS = (
+    "KerasAutoEncoder",
+    "MinMaxScaler",
+    "StandardScaler",
+    "RobustScaler",
+    "MaxAbsScaler",
+)
+
+
+class BatchTimeout(TimeoutError):
+    """
+    The batch a request joined gave no output in time.
+
+    Parameters
+    ----------
+    message: str
+        Why the request failed.
+    retry_after: int
+        Seconds the client should wait before retrying.
+    """
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+
+    def response(self) -> Response:
+        response = make_response(jsonify(message=self.message), 503)
+        response.headers["Retry-After"] = str(self.retry_after)
+        return response
+
+
+def estimators(model) -> Iterator:
+    """
+    The estimators making up ``model``, the steps of pipelines and the base
+    estimators of anomaly detectors, which are used to get its output.
+    """
+    if hasattr(model, "steps"):
+        for _, step in model.steps:
+            yield from estimators(step)
+    elif isinstance(model, AnomalyDetectorBase):
+        yield from estimators(model.base_estimator)
+    else:
+        yield model
+
+
+class _PendingPrediction:
+    """
+    A single request's input, waiting to be part of a batch.
+    """
+
+    __slots__ = ("X", "done", "output", "error", "enqueued_at")
+
+    def __init__(self, X):
+        self.X = X
+        self.done = threading.Event()
+        self.output = None
+        self.error: Optional[BaseException] = None
+        self.enqueued_at = timeit.default_timer()
+
+
+class _Batch:
+    """
+    Pending predictions for a single model, run by the thread which opened the batch.
+    """
+
+    __slots__ = ("items", "rows", "full")
+
+    def __init__(self):
+        self.items: List[_PendingPrediction] = []
+        self.rows = 0
+        self.full = threading.Event()
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent predictions on the same model into a single call.
+
+    The first request for a model opens a batch and waits up to ``max_wait_s``,
+    or until the batch holds ``max_rows`` rows, for other requests to join.
+    It then runs the model once on the stacked input, and hands each request
+    its part of the output.
+
+    Only models made of the ``batchable_estimators`` are batched, as stacking
+    the input of a model whose output for a row depends on other rows, such as
+    an LSTM, would change the output of each request. Models which don't give
+    one row of output per row of input are also detected on their first batch,
+    and are run per request from then on.
+
+    Parameters
+    ----------
+    max_wait_s: float
+        Longest time, in seconds, a request waits for others to join its batch.
+    max_rows: int
+        Number of rows at which a batch is run without waiting any longer.
+        Requests of this size or larger are never batched.
+    metrics: Optional[gordo.server.prometheus.GordoServerPrometheusMetrics]
+        Metrics to report batch sizes and queue wait times to.
+    max_result_wait_s: float
+        Longest time, in seconds, a request waits for the output of the batch it
+        joined, before failing with a :class:`.BatchTimeout`.
+    batchable_estimators: Collection[str]
+        Class names of the estimators whose output for a row only depends on
+        that row.
+    """
+
+    def __init__(
+        self,
+        max_wait_s: float = 0.005,
+        max_rows: int = 1000,
+        metrics=None,
+        max_result_wait_s: float = 60.0,
+        batchable_estimators: Collection[str] = BATCHABLE_ESTIMATORS,
+    ):
+        self.max_wait_s = max_wait_s
+        self.max_rows = max_rows
+        self.max_result_wait_s = max_result_wait_s
+        self.metrics = metrics
+        self.batchable_estimators = frozenset(batchable_estimators)
+        self._lock = threading.Lock()
+        self._batches: Dict[int, _Batch] = dict()
+        self._batchable: "weakref.WeakSet" = weakref.WeakSet()
+        self._unbatchable: "weakref.WeakSet" = weakref.WeakSet()
+
+    def get_model_output(self, model, X, name: str = "") -> np.ndarray:
+        """
+        Same as :func:`gordo.server.model_io.get_model_output`, but run as part of
+        a batch with concurrent calls on the same ``model``.
+
+        Parameters
+        ----------
+        model
+            The model to get the output of.
+        X: Union[np.ndarray, pd.DataFrame]
+            2d array of sample(s)
+        name: str
+            Name of the model, used as the label of the metrics.
+
+        Returns
+        -------
+        np.ndarray
+        """
+        if len(X) >= self.max_rows or not self.is_batchable(model):
+            return model_io.get_model_output(model=model, X=X)
+
+        pending = _PendingPrediction(X)
+        key = id(model)
+        with self._lock:
+            batch = self._batches.get(key)
+            is_leader = batch is None
+            if is_leader:
+                batch = self._batches[key] = _Batch()
+            batch.items.append(pending)
+            batch.rows += len(X)
+
+            # Close a full batch, so the next request opens a new one.
+            if batch.rows >= self.max_rows:
+                del self._batches[key]
+                batch.full.set()
+
+        if is_leader:
+            batch.full.wait(self.max_wait_s)
+            with self._lock:
+                if self._batches.get(key) is batch:
+                    del self._batches[key]
+            self._run(model, batch.items, name)
+        elif not pending.done.wait(self.max_wait_s + self.max_result_wait_s):
+            raise BatchTimeout(
+                f"No output from the batch of model '{name}' within "
+                f"{self.max_result_wait_s} seconds"
+            )
+
+        if pending.error is not None:
+            raise pending.error
+        return pending.output
+
+    def is_batchable(self, model) -> bool:
+        """
+        Whether ``model`` is only made of batchable estimators, and wasn't found
+        to give a different number of rows than its input.
+        """
+        if model in self._batchable:
+            return True
+        if model in self._unbatchable:
+            return False
+        if all(
+            type(estimator).__name__ in self.batchable_estimators
+            for estimator in estimators(model)
+        ):
+            self._batchable.add(model)
+            return True
+        self._unbatchable.add(model)
+        return False
+
+    def _run(self, model, items: List[_PendingPrediction], name: str):
+        """
+        Run the model on the stacked input of ``items``, setting each item's output.
+        """
+        start_time = timeit.default_timer()
+        try:
+            if self.metrics is not None:
+                label_values = self.metrics.model_label_values(name)
+                for item in items:
+                    self.metrics.batch_queue_wait_seconds.labels(*label_values).observe(
+                        start_time - item.enqueued_at
+                    )
+                self.metrics.batch_size_rows.labels(*label_values).observe(
+                    sum(len(item.X) for item in items)
+                )
+
+            if len(items) > 1 and self._run_stacked(model, items):
+                return
+            for item in items:
+                try:
+                    item.output = model_io.get_model_output(model=model, X=item.X)
+                except Exception as exc:
+                    item.error = exc
+        except BaseException as exc:
+            # Fail the requests which didn't get an outcome, rather than none at all
+            for item in items:
+                if item.output is None and item.error is None:
+                    item.error = exc
+            raise
+        finally:
+            for item in items:
+                item.done.set()
+
+    def _run_stacked(self, model, items: List[_PendingPrediction]) -> bool:
+        """
+        Run the model once on all of the items, returning ``False`` if the items
+        have to be run one by one instead.
+        """
+        try:
+            X = np.concatenate([getattr(item.X, "values", item.X) for item in items])
+            output = model_io.get_model_output(model=model, X=X)
+        except Exception:
+            # Let each request get its own output or error
+            return False
+
+        if len(output) != len(X):
+            logger.debug(
+                f"Model output of length {len(output)} does not match input of "
+                f"length {len(X)}, disabling batching for this model."
+            )
+            self._batchable.discard(model)
+            self._unbatchable.add(model)
+            return False
+
+        start = 0
+        for item in items:
+            end = start + len(item.X)
+            item.output = output[start:end]
+            start = end
+        return True
+
+
+def init_app(app: Flask, metrics=None):
+    """
+    Enable micro-batching for the app, if ``MICRO_BATCH_WAIT_MS`` is configured.
+    """
+    wait_ms = app.config["MICRO_BATCH_WAIT_MS"]
+    if wait_ms > 0:
+        app.extensions[EXTENSION_NAME] = MicroBatcher(
+            max_wait_s=wait_ms / 1000,
+            max_rows=app.config["MICRO_BATCH_MAX_ROWS"],
+            metrics=metrics,
+            max_result_wait_s=app.config["MICRO_BATCH_RESULT_TIMEOUT_S"],
+            batchable_estimators=app.config["MICRO_BATCH_ESTIMATORS"],
+        )
+
+
+def is_enabled() -> bool:
+    """
+    Whether micro-batching is enabled for the current app.
+    """
+    return EXTENSION_NAME in current_app.extensions
+
+
+def get_model_output(X) -> np.ndarray:
+    """
+    Get the output of the current request's model, ``flask.g.model``, given ``X``;
+    batched with concurrent requests if micro-batching is enabled for the app.
+    """
+    batcher = current_app.extensions.get(EXTENSION_NAME)
+    if batcher is None:
+        return model_io.get_model_output(model=g.model, X=X)
+    name = (request.view_args or {}).get("gordo_name", "")
+    return batcher.get_model_output(g.model, X, name=name)
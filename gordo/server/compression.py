@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import zlib
+
+from typing import Callable, Iterable, Iterator, Optional
+
+from flask import Flask, Response, current_app, request
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+"""
+Compression of responses, negotiated with the ``Accept-Encoding`` of the request.
+
+Supports ``gzip``, and ``zstd`` if the optional ``zstandard`` package is installed.
+Both ``zlib`` and ``zstandard`` release the GIL while compressing, so compressing
+large responses doesn't hold up the other threads of the worker.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Mimetypes worth compressing, parquet is compressed already
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/vnd.apache.arrow.stream",
+    "text/html",
+    "text/plain",
+}
+
+
+def available_encodings() -> list:
+    """
+    Encodings the server can compress responses with, in order of preference.
+    """
+    return ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+
+def _compressobj(encoding: str, level: int):
+    """
+    An object with ``compress(data)`` and ``flush()`` methods, compressing to ``encoding``.
+    """
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compressobj()
+    # wbits of 16 + MAX_WBITS gives a gzip header and trailer
+    return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def _flush_block(compressor, encoding: str) -> bytes:
+    """
+    Flush the data compressed so far, without ending the stream.
+    """
+    if encoding == "zstd":
+        return compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+    return compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def compress_stream(
+    chunks: Iterable[bytes],
+    encoding: str,
+    level: int,
+    on_chunk: Optional[Callable[[int, int], None]] = None,
+) -> Iterator[bytes]:
+    """
+    Compress a stream of chunks, flushing after each of them so every chunk
+    is sent as soon as it's ready.
+
+    Parameters
+    ----------
+    chunks: Iterable[bytes]
+        Chunks to compress.
+    encoding: str
+        ``"gzip"`` or ``"zstd"``
+    level: int
+        Compression level.
+    on_chunk: Optional[Callable[[int, int], None]]
+        Called with the size of each chunk before and after compression.
+
+    Returns
+    -------
+    Iterator[bytes]
+    """
+    compressor = _compressobj(encoding, level)
+    for chunk in chunks:
+        if not chunk:
+            continue
+        compressed = compressor.compress(chunk) + _flush_block(compressor, encoding)
+        if on_chunk is not None:
+            on_chunk(len(chunk), len(compressed))
+        yield compressed
+    tail = compressor.flush()
+    if on_chunk is not None:
+        on_chunk(0, len(tail))
+    yield tail
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    """
+    Compress ``data`` with ``encoding`` at ``level``.
+    """
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    compressor = _compressobj(encoding, level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _should_compress(response: Response) -> bool:
+    return (
+        response.mimetype in COMPRESSIBLE_MIMETYPES
+        and 200 <= response.status_code < 300
+        and response.status_code != 204
+        and "Content-Encoding" not in response.headers
+        and not response.direct_passthrough
+    )
+
+
+def compress_response(response: Response, metrics=None) -> Response:
+    """
+    Compress the response with the best of the encodings accepted by the request,
+    if it is large enough, or is streamed.
+    """
+    if not _should_compress(response):
+        return response
+    response.vary.add("Accept-Encoding")
+
+    encoding = request.accept_encodings.best_match(available_encodings())
+    if encoding is None:
+        return response
+
+    config = current_app.config
+    level = config[
+        "RESPONSE_COMPRESSION_ZSTD_LEVEL"
+        if encoding == "zstd"
+        else "RESPONSE_COMPRESSION_GZIP_LEVEL"
+    ]
+
+    def record(n_bytes: int, n_compressed_bytes: int):
+        if metrics is not None:
+            label_values = metrics.label_values + [encoding]
+            metrics.response_bytes.labels(*label_values).inc(n_bytes)
+            metrics.response_compressed_bytes.labels(*label_values).inc(
+                n_compressed_bytes
+            )
+
+    if response.is_streamed:
+        chunks = (
+            chunk.encode(response.charset) if isinstance(chunk, str) else chunk
+            for chunk in response.response
+        )
+        response.response = compress_stream(chunks, encoding, level, on_chunk=record)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < config["RESPONSE_COMPRESSION_MIN_BYTES"]:
+            return response
+        compressed = compress(data, encoding, level)
+        record(len(data), len(compressed))
+        response.set_data(compressed)
+
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_app(app: Flask, metrics=None):
+    """
+    Compress the app's responses, if ``RESPONSE_COMPRESSION`` is enabled.
+    """
+    if not app.config["RESPONSE_COMPRESSION"]:
+        return
+
+    @app.after_request
+    def _compress_response(response: Response) -> Response:
+        return compress_response(response, metrics=metrics)
@@ -0,0 +1,21 @@
+import os
+
+from gordo.server import thread_pools
+
+
+def post_fork(server, worker):
+    thread_pools.configure_worker(
+        workers=server.cfg.workers,
+        worker_class=server.cfg.worker_class_str,
+        threads=server.cfg.threads,
+    )
+
+
+def post_worker_init(worker):
+    # Preloaded models are run once the worker's thread pools are sized, rather
+    # than before forking, which isn't safe once TensorFlow has run anything
+    if os.getenv("PRELOAD_MODELS", "false") != "false":
+        # Already imported by the app
+        from gordo.server import utils as server_utils
+
+        server_utils.warm_up_models()
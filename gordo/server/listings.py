@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import threading
+
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+
+from flask import Flask, current_app
+
+"""
+Listings of the directories of the model collection, the revisions of the
+project and the models of each revision, kept in memory rather than listed on
+every request, as listing a network mounted directory, like on Azure Files, takes
+milliseconds.
+
+Listed on first use, and then watched by a thread of each worker, which every
+``LISTING_REFRESH_INTERVAL_S`` seconds lists again the directories which changed
+since. Directories are watched by polling their modification time, as inotify
+doesn't see the changes made to network filesystems by other hosts. A name missing
+from a listing is looked up again straight away, so a new revision can be served
+without waiting for the next refresh. Setting the interval to 0 lists the
+directories on every request instead.
+"""
+
+logger = logging.getLogger(__name__)
+
+EXTENSION_NAME = "gordo_listings"
+
+
+class Listing(NamedTuple):
+    """
+    The names in a directory, those of them which are directories, and its version,
+    its modification time when listed.
+    """
+
+    names: Tuple[str, ...]
+    version: str
+    directories: FrozenSet[str] = frozenset()
+
+
+def list_directory(directory: str) -> Optional[Listing]:
+    """
+    The listing of ``directory``, or ``None`` if it doesn't exist.
+    """
+    try:
+        # The version is taken first, so a change while listing is seen next time
+        version = str(os.stat(directory).st_mtime_ns)
+        with os.scandir(directory) as it:
+            entries = list(it)
+        return Listing(
+            tuple(entry.name for entry in entries),
+            version,
+            frozenset(entry.name for entry in entries if entry.is_dir()),
+        )
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+class DirectoryListings:
+    """
+    Listings of directories, refreshed every ``interval`` seconds by a thread
+    started on first use.
+
+    Parameters
+    ----------
+    interval: float
+        Seconds between checks of the directories for changes. If 0, directories
+        are listed every time instead.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._listings: Dict[str, Optional[Listing]] = dict()
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def get(self, directory: str) -> Optional[Listing]:
+        """
+        The listing of ``directory``, or ``None`` if it doesn't exist.
+        """
+        directory = os.path.normpath(directory)
+        if self.interval <= 0:
+            return list_directory(directory)
+        try:
+            return self._listings[directory]
+        except KeyError:
+            return self._list(directory)
+
+    def contains(self, directory: str, name: str, is_dir: bool = False) -> bool:
+        """
+        Whether ``name`` is in ``directory``, and, with ``is_dir``, is a directory.
+        If it's not in the listing, the directory is listed again, in case it was
+        added since.
+        """
+
+        def found(listing: Optional[Listing]) -> bool:
+            if listing is None:
+                return False
+            return name in (listing.directories if is_dir else listing.names)
+
+        if found(self.get(directory)):
+            return True
+        if self.interval <= 0:
+            return False
+        return found(self._list(os.path.normpath(directory)))
+
+    def refresh(self):
+        """
+        List the directories which changed since they were last listed.
+        """
+        for directory, listing in list(self._listings.items()):
+            try:
+                version: Optional[str] = str(os.stat(directory).st_mtime_ns)
+            except (FileNotFoundError, NotADirectoryError):
+                version = None
+            if version != (listing.version if listing is not None else None):
+                self._list(directory)
+
+    def stop(self):
+        """
+        Stop watching the directories.
+        """
+        self._stopped.set()
+
+    def _list(self, directory: str) -> Optional[Listing]:
+        listing = list_directory(directory)
+        with self._lock:
+            self._listings[directory] = listing
+            if self._watcher is None:
+                # Started on first use, in the worker, rather than in a process
+                # which might be forked after building the app
+                self._watcher = threading.Thread(
+                    target=self._watch, name="gordo-listings", daemon=True
+                )
+                self._watcher.start()
+        return listing
+
+    def _watch(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Failed to refresh the directory listings")
+
+
+def get_listings() -> DirectoryListings:
+    """
+    The app's :class:`.DirectoryListings`
+    """
+    return current_app.extensions[EXTENSION_NAME]
+
+
+def init_app(app: Flask):
+    """
+    Keep the listings of the model collection for the app, refreshed every
+    ``LISTING_REFRESH_INTERVAL_S`` seconds.
+    """
+    app.extensions[EXTENSION_NAME] = DirectoryListings(
+        interval=app.config["LISTING_REFRESH_INTERVAL_S"]
+    )
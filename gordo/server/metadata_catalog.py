@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+import copy
+import json
+import logging
+import os
+import threading
+
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import pyarrow as pa
+
+from gordo.server import artifacts
+from gordo.server.artifacts import ArtifactIdentity
+
+"""
+A single file per revision holding the metadata of all of its models.
+
+Written once the models of a revision are built, with :func:`.write_catalog`,
+or ``gordo build-metadata-catalog``, which the workflow runs once all of the
+models of a revision are built. The server memory-maps the catalog of a
+revision, and reads the metadata of each model from it, instead of reading each
+model's ``metadata.json`` from the model collection directory. The catalog file
+is checked for a replacement, or for a catalog written since, through
+:data:`gordo.server.artifacts.identities`.
+
+The catalog records the identity of each ``metadata.json`` it was written from,
+and a model's metadata is only read from the catalog while its ``metadata.json``
+has that identity, so a model rebuilt since the catalog was written is served
+with its new metadata.
+"""
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILENAME = ".metadata-catalog.arrow"
+
+_SCHEMA = pa.schema(
+    [
+        ("name", pa.string()),
+        ("metadata", pa.string()),
+        # Identity of the metadata.json the metadata was read from
+        ("inode", pa.uint64()),
+        ("mtime_ns", pa.int64()),
+        ("size", pa.int64()),
+    ]
+)
+
+
+def _read_metadata_json(
+    model_dir: str,
+) -> Tuple[Optional[str], Optional[ArtifactIdentity]]:
+    path = os.path.join(model_dir, "metadata.json")
+    # Taken first, so a file replaced while reading it is read again by the server
+    identity = artifacts.artifact_identity(path)
+    try:
+        with open(path, "r") as f:
+            return f.read(), identity
+    except (FileNotFoundError, NotADirectoryError):
+        return None, None
+
+
+def write_catalog(directory: str, names: Optional[Iterable[str]] = None) -> str:
+    """
+    Write the metadata catalog of the models in ``directory``.
+
+    Parameters
+    ----------
+    directory: str
+        Model collection directory of a single revision.
+    names: Optional[Iterable[str]]
+        Names of the models to include, defaults to all the models in ``directory``.
+
+    Returns
+    -------
+    str
+        Path of the written catalog.
+    """
+    if names is None:
+        names = os.listdir(directory)
+
+    catalog_names: List[str] = []
+    catalog_metadata: List[str] = []
+    identities: List[ArtifactIdentity] = []
+    for name in sorted(names):
+        metadata, identity = _read_metadata_json(os.path.join(directory, name))
+        if metadata is not None and identity is not None:
+            catalog_names.append(name)
+            catalog_metadata.append(metadata)
+            identities.append(identity)
+
+    inodes, mtimes, sizes = zip(*identities) if identities else ((), (), ())
+    batch = pa.RecordBatch.from_arrays(
+        [
+            pa.array(catalog_names, pa.string()),
+            pa.array(catalog_metadata, pa.string()),
+            pa.array(inodes, pa.uint64()),
+            pa.array(mtimes, pa.int64()),
+            pa.array(sizes, pa.int64()),
+        ],
+        schema=_SCHEMA,
+    )
+    path = os.path.join(directory, CATALOG_FILENAME)
+
+    # Written next to its destination and moved into place, so a server never
+    # reads a partially written catalog
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        writer = pa.ipc.new_file(sink, _SCHEMA)
+        writer.write_batch(batch)
+        writer.close()
+    os.replace(tmp_path, path)
+    logger.info(f"Wrote metadata of {len(catalog_names)} models to {path}")
+    return path
+
+
+class MetadataCatalog:
+    """
+    Memory-mapped metadata catalog of a revision, written by :func:`.write_catalog`.
+
+    Parameters
+    ----------
+    path: str
+        Path of the catalog file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        source = pa.memory_map(path, "r")
+        table = pa.ipc.open_file(source).read_all().combine_chunks()
+        self._metadata = table.column("metadata")
+        self._positions: Dict[str, int] = {
+            name: i for i, name in enumerate(table.column("name").to_pylist())
+        }
+        self._identities: List[ArtifactIdentity] = list(
+            zip(
+                table.column("inode").to_pylist(),
+                table.column("mtime_ns").to_pylist(),
+                table.column("size").to_pylist(),
+            )
+        )
+        self._parsed: Dict[str, dict] = dict()
+
+    @property
+    def names(self) -> List[str]:
+        """
+        Names of the models in the catalog.
+        """
+        return list(self._positions.keys())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._positions
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def identity(self, name: str) -> Optional[ArtifactIdentity]:
+        """
+        Identity of the ``metadata.json`` the model's metadata was read from, or
+        ``None`` if the model is not in the catalog.
+        """
+        position = self._positions.get(name)
+        return self._identities[position] if position is not None else None
+
+    def get(self, name: str) -> dict:
+        """
+        Metadata of the model, as loaded by :func:`gordo.serializer.load_metadata`.
+        Parsed once per model, and copied for each caller.
+
+        Raises
+        ------
+        KeyError
+            If the model is not in the catalog.
+        """
+        try:
+            metadata = self._parsed[name]
+        except KeyError:
+            metadata = self._parsed.setdefault(
+                name, json.loads(self._metadata[self._positions[name]].as_py())
+            )
+        return copy.deepcopy(metadata)
+
+
+class _CachedCatalog(NamedTuple):
+    catalog: Optional[MetadataCatalog]
+    # Identity of the catalog file, None if there is none
+    identity: Optional[ArtifactIdentity]
+
+
+_catalogs_lock = threading.Lock()
+_catalogs: Dict[str, _CachedCatalog] = dict()
+
+
+def _open_catalog(path: str) -> Optional[MetadataCatalog]:
+    try:
+        return MetadataCatalog(path)
+    except FileNotFoundError:
+        return None
+    except Exception as exc:
+        logger.warning(f"Ignoring unreadable metadata catalog {path}: {exc}")
+        return None
+
+
+def get_catalog(directory: str) -> Optional[MetadataCatalog]:
+    """
+    The catalog of the revision in ``directory``, or ``None`` if it has none.
+    Opened once per identity of the catalog file, which is checked for changes
+    at most every ``LISTING_REFRESH_INTERVAL_S`` seconds.
+    """
+    path = os.path.join(directory, CATALOG_FILENAME)
+    identity = artifacts.identities.get(path)
+    cached = _catalogs.get(directory)
+    if cached is not None and cached.identity == identity:
+        return cached.catalog
+
+    with _catalogs_lock:
+        cached = _catalogs.get(directory)
+        if cached is None or cached.identity != identity:
+            catalog = _open_catalog(path) if identity is not None else None
+            cached = _catalogs[directory] = _CachedCatalog(catalog, identity)
+        return cached.catalog
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import threading
+import timeit
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from gordo.server.single_flight import SingleFlight
+
+"""
+Cache of the models loaded by the server, bounded by their footprint in bytes.
+"""
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str]
+
+EVICTION_POLICIES = ("lru", "lfu")
+
+
+def model_footprint(directory: str, name: str) -> int:
+    """
+    Footprint of a model, in bytes, measured as the size of its serialized files.
+
+    Parameters
+    ----------
+    directory: str
+        Directory the model was loaded from.
+    name: str
+        Name of the model, its sub directory within ``directory``.
+
+    Returns
+    -------
+    int
+    """
+    total = 0
+    for root, _, files in os.walk(os.path.join(directory, name)):
+        for file in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                pass
+    return total
+
+
+class _Entry:
+
+    __slots__ = ("value", "size", "version", "hits")
+
+    def __init__(self, value: Any, size: int, version: Hashable = None):
+        self.value = value
+        self.size = size
+        self.version = version
+        self.hits = 0
+
+
+class ModelCache:
+    """
+    Thread safe cache of models, keyed by ``(directory, name)``, evicting models
+    once their total footprint exceeds ``max_bytes``, or there are more than
+    ``max_models`` of them. A model cached with another version than the one
+    requested is stale, and is evicted and loaded again.
+
+    Pinned models are never evicted, but count towards the budget. A model
+    which doesn't fit, even after evicting all the models which aren't pinned,
+    is loaded but not cached, unless it is pinned.
+
+    Parameters
+    ----------
+    max_bytes: Optional[int]
+        Budget for the total footprint of the cached models, unbounded if ``None``.
+    max_models: Optional[int]
+        Largest number of models to cache, unbounded if ``None``.
+    policy: str
+        Which model to evict first, either the least recently used (``"lru"``),
+        or the least frequently used (``"lfu"``), breaking ties by least recent use.
+    footprint: Callable[[str, str], int]
+        Function giving the footprint of the model in bytes, given its directory
+        and name.
+    metrics: Optional[gordo.server.prometheus.GordoServerPrometheusMetrics]
+        Metrics to report hits, misses, evictions and load times to.
+    """
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        max_models: Optional[int] = None,
+        policy: str = "lru",
+        footprint: Callable[[str, str], int] = model_footprint,
+        metrics=None,
+    ):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(
+                f"Unsupported eviction policy '{policy}', use one of {EVICTION_POLICIES}"
+            )
+        self.max_bytes = max_bytes
+        self.max_models = max_models
+        self.policy = policy
+        self.footprint = footprint
+        self.metrics = metrics
+        self._lock = threading.RLock()
+        self._loads = SingleFlight()
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._pinned: Set[CacheKey] = set()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._load_seconds = 0.0
+
+    @classmethod
+    def from_environment(cls) -> "ModelCache":
+        """
+        Cache configured by the ``MODEL_CACHE_MAX_BYTES``, ``N_CACHED_MODELS`` and
+        ``MODEL_CACHE_POLICY`` environment variables. Without a byte budget the
+        cache holds ``N_CACHED_MODELS`` models, by default 2.
+        """
+        max_bytes = os.getenv("MODEL_CACHE_MAX_BYTES")
+        max_models = os.getenv("N_CACHED_MODELS")
+        if max_models is None and max_bytes is None:
+            max_models = "2"
+        return cls(
+            max_bytes=int(max_bytes) if max_bytes is not None else None,
+            max_models=int(max_models) if max_models is not None else None,
+            policy=os.getenv("MODEL_CACHE_POLICY", "lru"),
+        )
+
+    def get(
+        self,
+        directory: str,
+        name: str,
+        loader: Callable[[str, str], Any],
+        version: Hashable = None,
+    ):
+        """
+        Get the model from the cache, loading it with ``loader(directory, name)``
+        if it's not cached, or is cached with another ``version``, such as the
+        identity of its artifact, which was since replaced. Only one thread loads
+        a given model at a time, others missing the same model wait for, and share
+        the outcome of, its load.
+        """
+        key = (directory, name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version:
+                entry.hits += 1
+                self._entries.move_to_end(key)
+                self._hits += 1
+                self._inc_metric("model_cache_hits", name)
+                return entry.value
+            if entry is not None:
+                logger.info(f"Model '{name}' in {directory} was replaced, reloading it")
+                self._evict(key)
+            self._misses += 1
+        self._inc_metric("model_cache_misses", name)
+
+        # Concurrent misses of the same model wait for a single load
+        return self._loads.do(
+            (directory, name, version),
+            lambda: self._load(directory, name, loader, version),
+        )
+
+    def _load(
+        self,
+        directory: str,
+        name: str,
+        loader: Callable[[str, str], Any],
+        version: Hashable = None,
+    ):
+        """
+        Load the model and cache it, if there is room for it.
+        """
+        key = (directory, name)
+        with self._lock:
+            # Loaded by another thread since the miss
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version:
+                return entry.value
+
+        start_time = timeit.default_timer()
+        model = loader(directory, name)
+        load_seconds = timeit.default_timer() - start_time
+        size = self.footprint(directory, name)
+
+        with self._lock:
+            self._load_seconds += load_seconds
+            if key in self._entries:
+                # Another version, loaded by another thread since the miss
+                self._evict(key)
+            if self.metrics is not None:
+                self.metrics.model_load_seconds.labels(
+                    *self.metrics.model_label_values(name)
+                ).observe(load_seconds)
+
+            if not self._make_room(size) and key not in self._pinned:
+                logger.warning(
+                    f"No room for model '{name}' of {size} bytes in the model cache, "
+                    f"it will not be cached"
+                )
+                return model
+
+            self._entries[key] = _Entry(model, size, version)
+            self._bytes += size
+        return model
+
+    def pin(self, directory: str, name: str):
+        """
+        Never evict the model, whether it's already cached or is cached later.
+        """
+        with self._lock:
+            self._pinned.add((directory, name))
+
+    def unpin(self, directory: str, name: str):
+        """
+        Let the model be evicted again.
+        """
+        with self._lock:
+            self._pinned.discard((directory, name))
+
+    def pinned(self) -> List[CacheKey]:
+        """
+        The directories and names of the pinned models.
+        """
+        with self._lock:
+            return sorted(self._pinned)
+
+    def clear(self):
+        """
+        Remove all models from the cache, pinned or not, and reset the stats.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._pinned.clear()
+            self._bytes = 0
+            self._hits = self._misses = self._evictions = 0
+            self._load_seconds = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Current contents and counters of the cache.
+
+        Returns
+        -------
+        dict
+        """
+        with self._lock:
+            return {
+                "models": len(self._entries),
+                "bytes": self._bytes,
+                "max-bytes": self.max_bytes,
+                "max-models": self.max_models,
+                "policy": self.policy,
+                "pinned": sorted(name for _, name in self._pinned),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "load-time-seconds": self._load_seconds,
+            }
+
+    def __contains__(self, key: CacheKey) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def _is_full(self, size: int) -> bool:
+        return (self.max_bytes is not None and self._bytes + size > self.max_bytes) or (
+            self.max_models is not None and len(self._entries) >= self.max_models
+        )
+
+    def _fits(self, size: int) -> bool:
+        """
+        Whether a model of ``size`` bytes fits once all the models which can be
+        evicted are. Must be called while holding the lock.
+        """
+        pinned = [entry for key, entry in self._entries.items() if key in self._pinned]
+        if self.max_bytes is not None:
+            if size + sum(entry.size for entry in pinned) > self.max_bytes:
+                return False
+        return self.max_models is None or len(pinned) < self.max_models
+
+    def _make_room(self, size: int) -> bool:
+        """
+        Evict models until there is room for another one of ``size`` bytes,
+        returning ``False`` if there isn't room even after evicting all that can be.
+        Must be called while holding the lock.
+        """
+        if not self._fits(size):
+            # Evicting the other models wouldn't make room, so keep them
+            return False
+        while self._is_full(size):
+            key = self._eviction_candidate()
+            if key is None:
+                # Everything left is pinned, or there's nothing left
+                return False
+            self._evict(key)
+        return True
+
+    def _evict(self, key: CacheKey):
+        """
+        Must be called while holding the lock.
+        """
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        self._evictions += 1
+        self._inc_metric("model_cache_evictions", key[1])
+        logger.debug(f"Evicted model '{key[1]}' of {entry.size} bytes from cache")
+
+    def _eviction_candidate(self) -> Optional[CacheKey]:
+        candidates = (key for key in self._entries if key not in self._pinned)
+        if self.policy == "lfu":
+            # min() keeps the first of equals, which is the least recently used
+            return min(
+                candidates, key=lambda key: self._entries[key].hits, default=None
+            )
+        return next(candidates, None)
+
+    def _inc_metric(self, metric_name: str, name: str):
+        if self.metrics is not None:
+            getattr(self.metrics, metric_name).labels(
+                *self.metrics.model_label_values(name)
+            ).inc()
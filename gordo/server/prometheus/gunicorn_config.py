@@ -1,5 +1,10 @@
 from prometheus_client import multiprocess
 
+from gordo.server import gunicorn_config
+
+post_fork = gunicorn_config.post_fork
+post_worker_init = gunicorn_config.post_worker_init
+
 
 def child_exit(server, worker):
     multiprocess.mark_process_dead(worker.pid)
@@ -71,6 +71,9 @@ class GordoServerPrometheusMetrics:
         self.label_names: List[str] = []
         self.label_values: List[str] = []
         self.args_names: List[str] = []
+        self.model_label_names: List[str] = []
+        self.encoding_label_names: List[str] = []
+        self.phase_label_names: List[str] = []
 
         if registry is None:
             registry = create_registry()
@@ -88,6 +91,117 @@ class GordoServerPrometheusMetrics:
             self.label_names,
             registry=registry,
         )
+        self.batch_size_rows = Histogram(
+            "%s_batch_size_rows" % self.prefix,
+            "Number of rows in each micro-batched model call",
+            self.model_label_names,
+            buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000, float("inf")),
+            registry=registry,
+        )
+        self.batch_queue_wait_seconds = Histogram(
+            "%s_batch_queue_wait_seconds" % self.prefix,
+            "Time requests waited for their micro-batch to run, in seconds",
+            self.model_label_names,
+            buckets=(
+                0.0005,
+                0.001,
+                0.0025,
+                0.005,
+                0.01,
+                0.025,
+                0.05,
+                0.1,
+                float("inf"),
+            ),
+            registry=registry,
+        )
+
+        self.model_cache_hits = Counter(
+            "%s_model_cache_hits_total" % self.prefix,
+            "Number of models found in the model cache",
+            self.model_label_names,
+            registry=registry,
+        )
+        self.model_cache_misses = Counter(
+            "%s_model_cache_misses_total" % self.prefix,
+            "Number of models not found in the model cache",
+            self.model_label_names,
+            registry=registry,
+        )
+        self.model_cache_evictions = Counter(
+            "%s_model_cache_evictions_total" % self.prefix,
+            "Number of models evicted from the model cache",
+            self.model_label_names,
+            registry=registry,
+        )
+        self.model_load_seconds = Histogram(
+            "%s_model_load_seconds" % self.prefix,
+            "Time taken to load models missing from the model cache, in seconds",
+            self.model_label_names,
+            buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float("inf")),
+            registry=registry,
+        )
+
+        self.phase_duration_seconds = Histogram(
+            "%s_phase_duration_seconds" % self.prefix,
+            "Time spent in each phase of serving a request, in seconds",
+            self.phase_label_names,
+            buckets=(
+                0.001,
+                0.005,
+                0.01,
+                0.025,
+                0.05,
+                0.1,
+                0.25,
+                0.5,
+                1,
+                2.5,
+                5,
+                float("inf"),
+            ),
+            registry=registry,
+        )
+
+        self.admission_queue_depth = Gauge(
+            "%s_admission_queue_depth" % self.prefix,
+            "Number of requests waiting to be let in by the admission control",
+            self.label_names[: len(self.label_values)],
+            multiprocess_mode="livesum",
+            registry=registry,
+        )
+        self.admission_shed = Counter(
+            "%s_admission_shed_total" % self.prefix,
+            "Number of requests rejected by the admission control",
+            self.model_label_names,
+            registry=registry,
+        )
+
+        self.result_cache_hits = Counter(
+            "%s_result_cache_hits_total" % self.prefix,
+            "Number of predictions answered from the result cache",
+            self.model_label_names,
+            registry=registry,
+        )
+        self.result_cache_misses = Counter(
+            "%s_result_cache_misses_total" % self.prefix,
+            "Number of predictions not found in the result cache",
+            self.model_label_names,
+            registry=registry,
+        )
+
+        self.response_bytes = Counter(
+            "%s_response_bytes_total" % self.prefix,
+            "Size of compressed responses before compression, in bytes",
+            self.encoding_label_names,
+            registry=registry,
+        )
+        self.response_compressed_bytes = Counter(
+            "%s_response_compressed_bytes_total" % self.prefix,
+            "Size of compressed responses after compression, in bytes",
+            self.encoding_label_names,
+            registry=registry,
+        )
 
     def init_labels(self):
         label_names, label_values = [], []
@@ -108,10 +222,24 @@ class GordoServerPrometheusMetrics:
             args_names.append(arg_name)
             label_names.append(label_name)
         self.args_names = args_names
+        self.model_label_names = label_names[: len(label_values)] + ["model"]
+        self.encoding_label_names = label_names[: len(label_values)] + ["encoding"]
+        self.phase_label_names = label_names[: len(label_values)] + [
+            "model",
+            "endpoint",
+            "phase",
+        ]
         label_names.extend(self.main_labels)
         self.label_names = label_names
         self.label_values = label_values
 
+    def model_label_values(self, model: str) -> List[str]:
+        """
+        Label values for the metrics which are labeled by model only,
+        rather than by request.
+        """
+        return self.label_values + [model]
+
     def request_label_values(self, req: Request, resp: Response):
         label_values = copy(self.label_values)
         view_args = req.view_args
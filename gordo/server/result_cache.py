@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import threading
+import time
+
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import Flask, Response, after_this_request, current_app, g, request
+
+from gordo.server import utils as server_utils
+
+"""
+Cache of the responses of predictions, for clients sending the same request
+for the same model and revision within a short time of each other.
+
+Keyed by a hash of the request body, the path, which holds the model's name,
+the revision, the version of the model's artifacts and the query parameters, and bounded by the total size of the
+cached responses and the time they're kept. Each worker process has its own cache.
+"""
+
+EXTENSION_NAME = "gordo_result_cache"
+
+# The body and mimetype of a response
+CachedResult = Tuple[bytes, str]
+
+
+class _Entry:
+
+    __slots__ = ("result", "size", "expires_at")
+
+    def __init__(self, result: CachedResult, size: int, expires_at: float):
+        self.result = result
+        self.size = size
+        self.expires_at = expires_at
+
+
+class ResultCache:
+    """
+    Least recently used cache of responses, bounded by their size in bytes and
+    kept for at most ``ttl`` seconds.
+
+    Parameters
+    ----------
+    max_bytes: int
+        Maximum total size of the cached responses.
+    ttl: float
+        Seconds a response is kept for.
+    metrics: Optional[GordoServerPrometheusMetrics]
+        Metrics to report hits and misses to, per model.
+    clock: Callable[[], float]
+        Current time, in seconds.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl: float,
+        metrics=None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.metrics = metrics
+        self.clock = clock
+        self._entries: Dict[str, _Entry] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _record(self, name: str, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if self.metrics is not None:
+            counter = (
+                self.metrics.result_cache_hits
+                if hit
+                else self.metrics.result_cache_misses
+            )
+            counter.labels(*self.metrics.label_values, name).inc()
+
+    def get(self, key: str, name: str = "") -> Optional[CachedResult]:
+        """
+        The cached result of ``key``, or ``None`` if it isn't cached or has expired.
+
+        Parameters
+        ----------
+        key: str
+            Key of the request.
+        name: str
+            Name of the model, used as the label of the metrics.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= self.clock():
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)  # type: ignore
+            self._record(name, hit=entry is not None)
+            return entry.result if entry is not None else None
+
+    def put(self, key: str, result: CachedResult):
+        """
+        Cache ``result`` under ``key``, evicting the least recently used results
+        until it fits. Results larger than ``max_bytes`` are not cached.
+        """
+        size = len(result[0])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and self._bytes + size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+            self._entries[key] = _Entry(result, size, self.clock() + self.ttl)
+            self._bytes += size
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def stats(self) -> dict:
+        """
+        Statistics of the cache
+        """
+        with self._lock:
+            return {
+                "results": len(self._entries),
+                "bytes": self._bytes,
+                "max-bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def request_key(name: str) -> str:
+    """
+    Key of the current request for the model ``name``, a hash of its body, content
+    type, path, revision, version of the model's artifacts and query parameters,
+    so a model rebuilt in place isn't answered with the results of the old one.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (
+        request.path,
+        g.revision,
+        server_utils.model_version(g.collection_dir, name),
+        request.mimetype,
+        repr(sorted(request.args.items(multi=True))),
+    ):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def cached(f):
+    """
+    Decorate a view which has ``gordo_name`` as a url parameter, answering it
+    from the app's :class:`.ResultCache`, if it's enabled, and caching its
+    successful, non streamed, responses.
+    """
+
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        cache: Optional[ResultCache] = current_app.extensions.get(EXTENSION_NAME)
+        if cache is None:
+            return f(*args, **kwargs)
+
+        name = kwargs.get("gordo_name", "")
+        key = request_key(name)
+        result = cache.get(key, name=name)
+        if result is not None:
+            data, mimetype = result
+            return Response(
+                data, mimetype=mimetype, headers={"X-Gordo-Result-Cache": "hit"}
+            )
+
+        @after_this_request
+        def _cache_response(response: Response) -> Response:
+            response.headers["X-Gordo-Result-Cache"] = "miss"
+            if (
+                response.status_code == 200
+                and not response.is_streamed
+                and not response.direct_passthrough
+            ):
+                cache.put(key, (response.get_data(), response.mimetype))
+            return response
+
+        return f(*args, **kwargs)
+
+    return wrapper
+
+
+def init_app(app: Flask, metrics=None):
+    """
+    Enable the result cache for the app, if ``RESULT_CACHE_MAX_BYTES`` is configured.
+    """
+    max_bytes = app.config["RESULT_CACHE_MAX_BYTES"]
+    if max_bytes > 0:
+        app.extensions[EXTENSION_NAME] = ResultCache(
+            max_bytes=max_bytes, ttl=app.config["RESULT_CACHE_TTL_S"], metrics=metrics
+        )
@@ -7,7 +7,6 @@ Gunicorn can be used to run the application as `gevent` async workers by using t
 :func:`~gordo.server.server.run_server` function.
 """
 import os
-import json
 import logging
 import timeit
 import typing
@@ -15,11 +14,29 @@ import subprocess
 from functools import wraps
 
 import yaml
-from flask import Flask, g, request, current_app, make_response, jsonify
+from flask import (
+    Flask,
+    g,
+    request,
+    current_app,
+    make_response,
+    jsonify,
+    has_request_context,
+)
+from flask.json import JSONEncoder
 
 from typing import Optional, Any, Dict
 
 from gordo.server import views
+from gordo.server import admission
+from gordo.server import artifacts
+from gordo.server import batching
+from gordo.server import compression
+from gordo.server import listings
+from gordo.server import result_cache
+from gordo.server import thread_pools
+from gordo.server import timing
+from gordo.server import utils as server_utils
 from gordo import __version__
 
 from prometheus_client import CollectorRegistry
@@ -40,6 +57,43 @@ class Config:
         self.EXPECTED_MODELS = yaml.safe_load(os.getenv("EXPECTED_MODELS", "[]"))
         self.ENABLE_PROMETHEUS = enable_prometheus()
         self.PROJECT = os.getenv("PROJECT")
+        self.BULK_MAX_WORKERS = int(os.getenv("BULK_MAX_WORKERS", 4))
+        self.MICRO_BATCH_WAIT_MS = float(os.getenv("MICRO_BATCH_WAIT_MS", 0))
+        self.MICRO_BATCH_MAX_ROWS = int(os.getenv("MICRO_BATCH_MAX_ROWS", 1000))
+        self.MICRO_BATCH_RESULT_TIMEOUT_S = float(
+            os.getenv("MICRO_BATCH_RESULT_TIMEOUT_S", 60)
+        )
+        self.MICRO_BATCH_ESTIMATORS = [
+            name.strip()
+            for name in os.getenv(
+                "MICRO_BATCH_ESTIMATORS", ",".join(batching.BATCHABLE_ESTIMATORS)
+            ).split(",")
+            if name.strip()
+        ]
+        self.PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "false") != "false"
+        self.RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 0))
+        self.RESULT_CACHE_TTL_S = float(os.getenv("RESULT_CACHE_TTL_S", 10))
+        self.STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", 1000))
+        self.INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", 0))
+        self.ADMISSION_MAX_COST = int(os.getenv("ADMISSION_MAX_COST", 0))
+        self.ADMISSION_MAX_WAIT_S = float(os.getenv("ADMISSION_MAX_WAIT_S", 5))
+        self.ADMISSION_SMALL_COST = int(os.getenv("ADMISSION_SMALL_COST", 10000))
+        self.ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", 64))
+        self.LISTING_REFRESH_INTERVAL_S = float(
+            os.getenv("LISTING_REFRESH_INTERVAL_S", 10)
+        )
+        self.RESPONSE_COMPRESSION = (
+            os.getenv("RESPONSE_COMPRESSION", "false") != "false"
+        )
+        self.RESPONSE_COMPRESSION_MIN_BYTES = int(
+            os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", 1024)
+        )
+        self.RESPONSE_COMPRESSION_GZIP_LEVEL = int(
+            os.getenv("RESPONSE_COMPRESSION_GZIP_LEVEL", 6)
+        )
+        self.RESPONSE_COMPRESSION_ZSTD_LEVEL = int(
+            os.getenv("RESPONSE_COMPRESSION_ZSTD_LEVEL", 3)
+        )
 
 
 def adapt_proxy_deployment(wsgi_app: typing.Callable) -> typing.Callable:
@@ -118,6 +172,19 @@ def adapt_proxy_deployment(wsgi_app: typing.Callable) -> typing.Callable:
     return wrapper
 
 
+class RevisionJSONEncoder(JSONEncoder):
+    """
+    JSON encoder adding the ``revision`` used to serve the request to JSON object
+    responses, as part of their encoding rather than by decoding and encoding
+    the response again.
+    """
+
+    def encode(self, o):
+        if isinstance(o, dict) and has_request_context() and "revision" in g:
+            o = {**o, "revision": g.revision}
+        return super().encode(o)
+
+
 def create_prometheus_metrics(
     project: Optional[str] = None, registry: Optional[CollectorRegistry] = None
 ) -> GordoServerPrometheusMetrics:
@@ -147,12 +214,20 @@ def build_app(
     if config is not None:
         app.config.update(**config)
 
+    app.json_encoder = RevisionJSONEncoder
+    app.config.setdefault("RESTPLUS_JSON", dict()).setdefault(
+        "cls", RevisionJSONEncoder
+    )
+
     app.register_blueprint(views.base_blueprint)
     app.register_blueprint(views.anomaly_blueprint)
+    app.register_blueprint(views.bulk_blueprint)
+    app.register_blueprint(views.npy_blueprint)
 
     app.wsgi_app = adapt_proxy_deployment(app.wsgi_app)  # type: ignore
     app.url_map.strict_slashes = False  # /path and /path/ are ok.
 
+    prometheus_metrics = None
     if app.config["ENABLE_PROMETHEUS"]:
         prometheus_metrics = create_prometheus_metrics(
             project=app.config.get("PROJECT"), registry=prometheus_registry
@@ -161,6 +236,24 @@ def build_app(
     elif prometheus_registry is not None:
         logger.warning("Ignoring non empty prometheus_registry argument")
 
+    admission.init_app(app, metrics=prometheus_metrics)
+    batching.init_app(app, metrics=prometheus_metrics)
+    compression.init_app(app, metrics=prometheus_metrics)
+    result_cache.init_app(app, metrics=prometheus_metrics)
+    timing.init_app(app, metrics=prometheus_metrics)
+    listings.init_app(app)
+    artifacts.identities.interval = app.config["LISTING_REFRESH_INTERVAL_S"]
+    if prometheus_metrics is not None:
+        server_utils.model_cache.metrics = prometheus_metrics
+
+    if app.config["PRELOAD_MODELS"]:
+        # Loading the models starts TensorFlow, so its pools are sized before
+        thread_pools.configure_preload()
+        server_utils.preload_models(
+            directory=os.environ[app.config["MODEL_COLLECTION_DIR_ENV_VAR"]],
+            names=app.config["EXPECTED_MODELS"],
+        )
+
     @app.before_request
     def _start_timer():
         g.start_time = timeit.default_timer()
@@ -175,22 +268,20 @@ def build_app(
         # If a specific revision was requested, update collection_dir
         g.revision = request.args.get("revision") or request.headers.get("revision")
         if g.revision:
-            g.collection_dir = os.path.join(g.collection_dir, "..", g.revision)
-            try:
-                os.listdir(g.collection_dir)  # List dir to ensure it exists
-            except FileNotFoundError:
+            revisions_dir = os.path.join(g.collection_dir, "..")
+            if not listings.get_listings().contains(
+                revisions_dir, g.revision, is_dir=True
+            ):
                 return make_response(
                     jsonify({"error": f"Revision '{g.revision}' not found."}), 410
                 )
+            g.collection_dir = os.path.join(revisions_dir, g.revision)
         else:
             g.revision = g.current_revision
 
     @app.after_request
     def _revision_used(response):
-        if response.is_json:
-            data = response.get_json()
-            data["revision"] = g.revision
-            response.set_data(json.dumps(data).encode())
+        # The revision is added to the body by RevisionJSONEncoder
         response.headers["revision"] = g.revision
         return response
 
@@ -198,7 +289,7 @@ def build_app(
     def _log_time_taken(response):
         runtime_s = timeit.default_timer() - g.start_time
         logger.debug(f"Total runtime for request: {runtime_s}s")
-        response.headers["Server-Timing"] = f"request_walltime_s;dur={runtime_s}"
+        response.headers["Server-Timing"] = timing.server_timing(runtime_s)
         return response
 
     @app.route("/healthcheck")
@@ -209,6 +300,10 @@ def build_app(
     def server_version():
         return jsonify({"version": __version__})
 
+    @app.route("/model-cache")
+    def model_cache_stats():
+        return jsonify(server_utils.model_cache.stats())
+
     return app
 
 
@@ -237,6 +332,8 @@ def run_server(
     threads: Optional[int] = None,
     worker_class: str = "gthread",
     server_app: str = "gordo.server.server:build_app()",
+    preload: bool = False,
+    asgi: bool = False,
 ):
     """
     Run application with Gunicorn server using Gevent Async workers
@@ -254,6 +351,9 @@ def run_server(
         in the [gunicorn documentation](http://docs.gunicorn.org/en/stable/settings.html#loglevel).
     config_module: str
         The config module. Will be passed with `python:` [prefix](https://docs.gunicorn.org/en/stable/settings.html#config).
+        Defaults to :mod:`gordo.server.gunicorn_config`, sizing the thread pools of
+        each worker and warming up its preloaded models, which custom config modules
+        should also import ``post_fork`` and ``post_worker_init`` from.
     worker_connections: int
         The maximum number of simultaneous clients per worker process.
     threads: str
@@ -262,7 +362,20 @@ def run_server(
         The type of workers to use.
     server_app: str
         The application to run
+    preload: bool
+        Load the ``EXPECTED_MODELS`` in the main process, before forking the
+        workers, which then share the memory of the models and each warm them up.
+        The main process sizes TensorFlow's thread pools for the workers first,
+        as they can't once it's started.
+    asgi: bool
+        Serve the app asynchronously, with uvicorn workers, running the app in
+        a thread pool of ``INFERENCE_THREADS`` threads. ``threads`` is then ignored,
+        and ``worker_class`` and the default ``server_app`` replaced.
     """
+    if asgi:
+        worker_class = "uvicorn.workers.UvicornWorker"
+        if server_app == "gordo.server.server:build_app()":
+            server_app = "gordo.server.asgi:build_asgi_app()"
 
     cmd = [
         "gunicorn",
@@ -281,14 +394,22 @@ def run_server(
         "--workers",
         str(workers),
     ]
-    if config_module is not None:
-        cmd.extend(("--config", "python:" + config_module))
+    if config_module is None:
+        config_module = "gordo.server.gunicorn_config"
+    cmd.extend(("--config", "python:" + config_module))
     if worker_class == "gthread":
         if threads is not None:
             cmd.extend(("--threads", str(threads)))
     else:
         if worker_connections is not None:
             cmd.extend(("--worker-connections", str(worker_connections)))
+    if preload:
+        # Set by gunicorn in its environment before it loads the app
+        settings = thread_pools.worker_settings(workers, worker_class, threads or 1)
+        if settings is not None:
+            for name, value in thread_pools.tensorflow_environ(settings).items():
+                cmd.extend(("--env", f"{name}={value}"))
+        cmd.extend(("--env", "PRELOAD_MODELS=true", "--preload"))
 
     cmd.append(server_app)
     run_cmd(cmd)
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+from typing import Any, Callable, Dict, Hashable, Optional
+
+"""
+Deduplication of concurrent calls doing the same work, such as loading the same model.
+"""
+
+
+class _Call:
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time. Threads asking for a key which is
+    already being called wait for that call, and get its result, or its exception.
+
+    Example
+    -------
+    >>> loads = SingleFlight()
+    >>> loads.do(("revision", "model-a"), lambda: "loaded")
+    'loaded'
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = dict()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Call ``fn``, unless a call for ``key`` is already in flight, in which case
+        wait for it and share its outcome.
+
+        Parameters
+        ----------
+        key: Hashable
+            Identity of the work done by ``fn``.
+        fn: Callable[[], Any]
+            The work to do.
+
+        Returns
+        -------
+        Any
+            What ``fn`` returned, in this or the in-flight call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
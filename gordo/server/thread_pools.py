@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import math
+import os
+
+from dataclasses import dataclass
+from typing import Dict, Mapping, MutableMapping, Optional, Tuple
+
+from threadpoolctl import threadpool_limits
+
+"""
+Sizing of the thread pools of TensorFlow and of the BLAS/OpenMP libraries used by
+NumPy and scikit-learn in each server worker.
+
+By default each of them starts as many threads as the host has cores, in every
+worker process, and for every request thread of the worker, oversubscribing
+the CPUs of the pod many times over. Instead, the CPUs the pod may use, given by
+its cgroup CPU quota, are shared between the workers, and the CPUs of a worker
+between its concurrent requests.
+
+``TF_INTRA_OP_THREADS``, ``TF_INTER_OP_THREADS`` and ``BLAS_THREADS`` override
+the derived sizes, and ``SERVER_THREAD_POOLS=false`` leaves the libraries'
+defaults as they are.
+
+TensorFlow's pools can only be sized before it's started, which loading a model
+does. When models are preloaded before forking the workers, the main process
+sizes TensorFlow's pools as the workers would, from the overrides set by
+:func:`gordo.server.server.run_server`, and the workers inherit them.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Intra and inter op sizes TensorFlow was given in this process, or the process
+# it was forked from
+_tensorflow_sizes: Optional[Tuple[int, int]] = None
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+# Read by the BLAS/OpenMP libraries when they're loaded
+BLAS_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+)
+
+
+@dataclass(frozen=True)
+class ThreadPoolSettings:
+    """
+    Sizes of the thread pools of a worker.
+    """
+
+    # Threads TensorFlow runs a single op with
+    intra_op: int
+    # Threads TensorFlow runs independent ops in
+    inter_op: int
+    # Threads of each call to BLAS/OpenMP
+    blas: int
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_quota(root: str = CGROUP_ROOT) -> Optional[float]:
+    """
+    The number of CPUs the cgroup CPU quota of the process allows it to use, or
+    ``None`` if it has no quota.
+
+    Parameters
+    ----------
+    root: str
+        Mount point of the cgroup filesystem.
+    """
+    # cgroup v2, "<quota> <period>" or "max <period>"
+    cpu_max = _read(os.path.join(root, "cpu.max"))
+    if cpu_max is not None:
+        quota, _, period = cpu_max.partition(" ")
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+
+    # cgroup v1, a quota of -1 is no quota
+    quota = _read(os.path.join(root, "cpu", "cpu.cfs_quota_us"))
+    period = _read(os.path.join(root, "cpu", "cpu.cfs_period_us"))
+    if quota is None or period is None or int(quota) <= 0:
+        return None
+    return int(quota) / int(period)
+
+
+def available_cpus(root: str = CGROUP_ROOT) -> int:
+    """
+    The number of CPUs the process can use, the lowest of its cgroup CPU quota,
+    rounded down, and the number of cores it may run on, at least one.
+
+    Parameters
+    ----------
+    root: str
+        Mount point of the cgroup filesystem.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_quota(root)
+    if quota is not None:
+        cpus = min(cpus, math.floor(quota))
+    return max(1, cpus)
+
+
+def derive_settings(
+    cpus: int,
+    workers: int,
+    concurrency: int,
+    environ: Optional[Mapping[str, str]] = None,
+) -> ThreadPoolSettings:
+    """
+    Sizes of the thread pools of each of ``workers`` workers, sharing ``cpus``
+    CPUs, and running up to ``concurrency`` requests at the same time each.
+
+    Parameters
+    ----------
+    cpus: int
+        CPUs available to all of the workers.
+    workers: int
+        Number of workers.
+    concurrency: int
+        Number of requests each worker runs at the same time.
+    environ: Optional[Mapping[str, str]]
+        Environment with the overrides of the derived sizes, defaults to
+        ``os.environ``.
+
+    Example
+    -------
+    >>> derive_settings(cpus=8, workers=4, concurrency=8, environ={})
+    ThreadPoolSettings(intra_op=2, inter_op=2, blas=1)
+    >>> derive_settings(cpus=16, workers=2, concurrency=2, environ={})
+    ThreadPoolSettings(intra_op=8, inter_op=2, blas=4)
+    """
+    environ = os.environ if environ is None else environ
+    worker_cpus = max(1, cpus // max(1, workers))
+    concurrency = max(1, concurrency)
+    return ThreadPoolSettings(
+        # TensorFlow's pools are shared by all of the requests of the worker
+        intra_op=int(environ.get("TF_INTRA_OP_THREADS") or worker_cpus),
+        inter_op=int(
+            environ.get("TF_INTER_OP_THREADS") or min(concurrency, worker_cpus)
+        ),
+        # while each request's call to BLAS/OpenMP may start its own threads
+        blas=int(environ.get("BLAS_THREADS") or max(1, worker_cpus // concurrency)),
+    )
+
+
+def worker_concurrency(worker_class: str, threads: int) -> int:
+    """
+    The number of requests a worker of ``worker_class`` runs models for at the
+    same time.
+
+    Parameters
+    ----------
+    worker_class: str
+        Gunicorn worker class of the server.
+    threads: int
+        Number of threads of ``gthread`` workers.
+    """
+    if worker_class == "gthread":
+        return threads
+    if worker_class == "uvicorn.workers.UvicornWorker":
+        # Models are run in a pool of INFERENCE_THREADS, by default one per core
+        return int(os.getenv("INFERENCE_THREADS", 0)) or available_cpus()
+    return 1
+
+
+def worker_settings(
+    workers: int, worker_class: str, threads: int
+) -> Optional[ThreadPoolSettings]:
+    """
+    Sizes of the thread pools of each worker of the server, or ``None`` if
+    ``SERVER_THREAD_POOLS`` is ``false``.
+
+    Parameters
+    ----------
+    workers: int
+        Number of workers of the server.
+    worker_class: str
+        Gunicorn worker class of the server.
+    threads: int
+        Number of threads of ``gthread`` workers.
+    """
+    if os.getenv("SERVER_THREAD_POOLS", "true") == "false":
+        return None
+    return derive_settings(
+        cpus=available_cpus(),
+        workers=workers,
+        concurrency=worker_concurrency(worker_class, threads),
+    )
+
+
+def tensorflow_environ(settings: ThreadPoolSettings) -> Dict[str, str]:
+    """
+    The overrides of TensorFlow's pool sizes giving those of ``settings``.
+    """
+    return {
+        "TF_INTRA_OP_THREADS": str(settings.intra_op),
+        "TF_INTER_OP_THREADS": str(settings.inter_op),
+    }
+
+
+def configure(
+    settings: ThreadPoolSettings, environ: Optional[MutableMapping[str, str]] = None
+):
+    """
+    Size the thread pools of the current process, through the environment for
+    libraries which aren't loaded yet, and at runtime for the BLAS/OpenMP
+    libraries which are. TensorFlow, if already loaded, is sized by
+    :func:`.configure_tensorflow`.
+
+    Parameters
+    ----------
+    settings: ThreadPoolSettings
+        Sizes of the thread pools.
+    environ: Optional[MutableMapping[str, str]]
+        Environment to set, defaults to ``os.environ``.
+    """
+    environ = os.environ if environ is None else environ
+    for name in BLAS_ENV_VARS:
+        environ[name] = str(settings.blas)
+    environ["TF_NUM_INTRAOP_THREADS"] = str(settings.intra_op)
+    environ["TF_NUM_INTEROP_THREADS"] = str(settings.inter_op)
+
+    threadpool_limits(limits=settings.blas)
+
+
+def configure_tensorflow(settings: ThreadPoolSettings):
+    """
+    Size the thread pools of TensorFlow, once per process, before it runs anything.
+
+    Parameters
+    ----------
+    settings: ThreadPoolSettings
+        Sizes of the thread pools.
+    """
+    global _tensorflow_sizes
+    sizes = (settings.intra_op, settings.inter_op)
+    if _tensorflow_sizes == sizes:
+        # Already sized, by the main process before preloading the models
+        return
+    try:
+        import tensorflow as tf
+    except ImportError:
+        return
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(settings.intra_op)
+        tf.config.threading.set_inter_op_parallelism_threads(settings.inter_op)
+    except RuntimeError as exc:
+        # TensorFlow was already started, by a model loaded before the pools were sized
+        logger.warning(f"Unable to size the TensorFlow thread pools: {exc}")
+    else:
+        _tensorflow_sizes = sizes
+
+
+def configure_preload():
+    """
+    Size TensorFlow's pools in the main process before it preloads the models,
+    with the sizes of ``TF_INTRA_OP_THREADS`` and ``TF_INTER_OP_THREADS``, if both
+    are set, which the forked workers then inherit.
+    """
+    if os.getenv("SERVER_THREAD_POOLS", "true") == "false":
+        return
+    if os.getenv("TF_INTRA_OP_THREADS") and os.getenv("TF_INTER_OP_THREADS"):
+        configure_tensorflow(derive_settings(cpus=1, workers=1, concurrency=1))
+
+
+def configure_worker(workers: int, worker_class: str, threads: int):
+    """
+    Size the thread pools of a server worker, unless ``SERVER_THREAD_POOLS`` is
+    ``false``. Called by gunicorn in each worker after forking it.
+
+    Parameters
+    ----------
+    workers: int
+        Number of workers of the server.
+    worker_class: str
+        Gunicorn worker class of the server.
+    threads: int
+        Number of threads of ``gthread`` workers.
+    """
+    settings = worker_settings(workers, worker_class, threads)
+    if settings is None:
+        return
+    configure(settings)
+    configure_tensorflow(settings)
+    logger.info(f"Sized the thread pools of worker {os.getpid()}: {settings}")
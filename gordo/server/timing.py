@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+import timeit
+
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from flask import Flask, Response, g, has_request_context, request
+
+"""
+Timing of the phases of serving a request: loading the model and its metadata,
+parsing the body, waiting to be let in by the admission control, running the
+model, building the response dataframe and serializing it.
+
+The time spent in each phase is added to the ``Server-Timing`` header of the
+response, next to ``request_walltime_s``, and, with Prometheus enabled, observed
+in the ``gordo_server_phase_duration_seconds`` histogram, labelled by model,
+endpoint and phase.
+"""
+
+ADMISSION = "admission"
+MODEL_LOAD = "model_load"
+METADATA_LOAD = "metadata_load"
+PARSE = "parse"
+INFERENCE = "inference"
+FRAME = "frame"
+SERIALIZE = "serialize"
+
+
+def phase_timings() -> Dict[str, float]:
+    """
+    Seconds spent in each phase of the current request so far, in the order
+    the phases started.
+    """
+    if not has_request_context():
+        return {}
+    return g.setdefault("phase_timings", {})
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    Time the block as the phase ``name`` of the current request, adding to the time
+    already spent in it. Outside of a request, such as in the threads of the bulk
+    endpoint or when preloading models, nothing is timed.
+
+    Parameters
+    ----------
+    name: str
+        Name of the phase.
+
+    Example
+    -------
+    >>> from flask import Flask
+    >>> with Flask("test").test_request_context():
+    ...     with phase(PARSE):
+    ...         pass
+    ...     list(phase_timings())
+    ['parse']
+    """
+    if not has_request_context():
+        yield
+        return
+    start_time = timeit.default_timer()
+    try:
+        yield
+    finally:
+        timings = phase_timings()
+        timings[name] = timings.get(name, 0.0) + timeit.default_timer() - start_time
+
+
+def server_timing(walltime_s: float) -> str:
+    """
+    Value of the ``Server-Timing`` header of the current request, with its wall
+    time and the time spent in each of its phases.
+
+    Example
+    -------
+    >>> from flask import Flask
+    >>> with Flask("test").test_request_context():
+    ...     phase_timings()[INFERENCE] = 0.25
+    ...     server_timing(0.5)
+    'request_walltime_s;dur=0.5, inference_s;dur=0.25'
+    """
+    entries = [f"request_walltime_s;dur={walltime_s}"]
+    entries.extend(
+        f"{name}_s;dur={duration}" for name, duration in phase_timings().items()
+    )
+    return ", ".join(entries)
+
+
+def init_app(app: Flask, metrics=None):
+    """
+    Observe the phase timings of each request in ``metrics``, if given.
+    """
+    if metrics is None:
+        return
+
+    @app.after_request
+    def _observe_phase_timings(response: Response) -> Response:
+        timings = phase_timings()
+        if not timings or request.url_rule is None:
+            return response
+        model = (request.view_args or {}).get("gordo_name", "")
+        endpoint = request.url_rule.rule
+        for name, duration in timings.items():
+            metrics.phase_duration_seconds.labels(
+                *metrics.label_values, model, endpoint, name
+            ).observe(duration)
+        return response
@@ -2,6 +2,8 @@
 
 import logging
 import functools
+import hashlib
+import json
 import zlib
 import os
 import io
@@ -10,17 +12,27 @@ import pickle
 import dateutil
 import timeit
 from datetime import datetime
-from typing import Union, List
+from dataclasses import dataclass
+from typing import Callable, Union, List, Iterable, Iterator, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
-from flask import request, g, jsonify, make_response, Response
+from flask import after_this_request, request, g, jsonify, make_response, Response
 from functools import lru_cache, wraps
 from sklearn.base import BaseEstimator
 from werkzeug.exceptions import NotFound
 
-from gordo import serializer
+from gordo import __version__, serializer
+from gordo.server import artifacts
+from gordo.server import model_io
+from gordo.server import metadata_catalog
+from gordo.server import timing
+from gordo.server.artifacts import ArtifactIdentity
+from gordo.server.model_cache import ModelCache
+from gordo.server.single_flight import SingleFlight
+from gordo_dataset.sensor_tag import SensorTag, normalize_sensor_tags
 
 
 """
@@ -75,13 +87,197 @@ def dataframe_from_parquet_bytes(buf: bytes) -> pd.DataFrame:
     return table.to_pandas()
 
 
-def dataframe_to_dict(df: pd.DataFrame) -> dict:
+ARROW_STREAM_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Writable file-like object collecting what's written to it, until taken with
+    :meth:`~_ChunkSink.take`
+    """
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def take(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def dataframe_into_arrow_stream(
+    df: pd.DataFrame, max_chunksize: int = 10000
+) -> Iterator[bytes]:
+    """
+    Convert a dataframe into the Arrow IPC streaming format, yielding the bytes
+    of the stream one record batch at a time.
+
+    The column layout of the dataframe, including any :class:`pandas.MultiIndex`,
+    is kept in the schema metadata and restored by :func:`.dataframe_from_arrow_bytes`
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        DataFrame to be converted
+    max_chunksize: int
+        Maximum number of rows in each record batch.
+
+    Returns
+    -------
+    Iterator[bytes]
+    """
+    table = pa.Table.from_pandas(df)
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(sink, table.schema)
+    for batch in table.to_batches(max_chunksize=max_chunksize):
+        writer.write_batch(batch)
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def dataframe_into_arrow_bytes(df: pd.DataFrame) -> bytes:
+    """
+    Convert a dataframe into bytes of the Arrow IPC streaming format.
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        DataFrame to be converted
+
+    Returns
+    -------
+    bytes
+    """
+    return b"".join(dataframe_into_arrow_stream(df))
+
+
+def dataframe_from_arrow_bytes(buf: bytes) -> pd.DataFrame:
+    """
+    Convert bytes of the Arrow IPC streaming format into a pandas dataframe.
+    The record batches are read in place from ``buf``, so the only copy made is
+    into the blocks of the dataframe.
+
+    Parameters
+    ----------
+    buf: bytes
+        Bytes of an Arrow stream. Can be the direct result from
+        `func`::gordo.server.utils.dataframe_into_arrow_bytes
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    table = pa.ipc.open_stream(pa.py_buffer(buf)).read_all()
+    return table.to_pandas()
+
+
+def dataframe_from_bytes(buf: bytes) -> pd.DataFrame:
+    """
+    Convert bytes representing either a parquet table or an Arrow stream
+    into a pandas dataframe.
+
+    Parameters
+    ----------
+    buf: bytes
+        Bytes from :func:`.dataframe_into_parquet_bytes` or
+        :func:`.dataframe_into_arrow_bytes`
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    # Parquet files always start with the magic bytes 'PAR1'
+    if buf[:4] == b"PAR1":
+        return dataframe_from_parquet_bytes(buf)
+    return dataframe_from_arrow_bytes(buf)
+
+
+NPY_MIMETYPE = "application/x-npy"
+
+
+def arrays_from_npy_bytes(buf: bytes) -> List[np.ndarray]:
+    """
+    Read the consecutive arrays of the NumPy ``.npy`` format in ``buf``, as written
+    by :func:`.arrays_into_npy_bytes`. The arrays are read in place from ``buf``,
+    without copying their data, and are therefore read-only.
+
+    Parameters
+    ----------
+    buf: bytes
+        Bytes of one or more ``.npy`` arrays.
+
+    Returns
+    -------
+    List[np.ndarray]
+
+    Raises
+    ------
+    ValueError
+        If ``buf`` is not a sequence of ``.npy`` arrays, or one of them holds Python objects.
+
+    Examples
+    --------
+    >>> X, y = arrays_from_npy_bytes(arrays_into_npy_bytes([np.ones((2, 3)), np.zeros(2)]))
+    >>> X.shape, y.shape, X.flags.writeable
+    ((2, 3), (2,), False)
+    """
+    arrays = []
+    stream = io.BytesIO(buf)
+    while stream.tell() < len(buf):
+        version = np.lib.format.read_magic(stream)
+        if version == (1, 0):
+            header = np.lib.format.read_array_header_1_0(stream)
+        else:
+            header = np.lib.format.read_array_header_2_0(stream)
+        shape, fortran_order, dtype = header
+        if dtype.hasobject:
+            raise ValueError("Arrays of Python objects are not supported")
+        count = int(np.prod(shape))
+        array = np.frombuffer(buf, dtype=dtype, count=count, offset=stream.tell())
+        arrays.append(array.reshape(shape, order="F" if fortran_order else "C"))
+        stream.seek(count * dtype.itemsize, io.SEEK_CUR)
+    return arrays
+
+
+def arrays_into_npy_bytes(arrays: Iterable[np.ndarray]) -> bytes:
+    """
+    Write ``arrays`` one after another in the NumPy ``.npy`` format, which
+    :func:`numpy.load` reads back one at the time from a file-like object.
+
+    Parameters
+    ----------
+    arrays: Iterable[np.ndarray]
+        Arrays to write.
+
+    Returns
+    -------
+    bytes
+    """
+    buf = io.BytesIO()
+    for array in arrays:
+        np.lib.format.write_array(buf, np.asanyarray(array), allow_pickle=False)
+    return buf.getvalue()
+
+
+def dataframe_to_dict(df: pd.DataFrame, orient: str = "dict") -> dict:
     """
     Convert a dataframe can have a :class:`pandas.MultiIndex` as columns into a dict
     where each key is the top level column name, and the value is the array
     of columns under the top level name. If it's a simple dataframe, :meth:`pandas.core.DataFrame.to_dict`
     will be used.
 
+    With ``orient="split"`` the dict instead holds the ``index``, the ``columns``, as lists of
+    each column's labels for :class:`pandas.MultiIndex` columns, and the ``data`` as a list of rows.
+    Each timestamp is then only given once, rather than once for every column, which makes it
+    much smaller and faster to encode for dataframes of many columns.
+
     This allows :func:`json.dumps` to be performed, where :meth:`pandas.DataFrame.to_dict()`
     would convert such a multi-level column dataframe into keys of ``tuple`` objects, which are
     not json serializable. However this ends up working with :meth:`pandas.DataFrame.from_dict`
@@ -91,6 +287,9 @@ def dataframe_to_dict(df: pd.DataFrame) -> dict:
     df: pandas.DataFrame
         Dataframe expected to have columns of type :class:`pandas.MultiIndex` 2 levels deep.
 
+    orient: str
+        Either ``"dict"`` (default) or ``"split"``
+
     Returns
     -------
     List[dict]
@@ -116,8 +315,20 @@ def dataframe_to_dict(df: pd.DataFrame) -> dict:
                   'sub-feature-1': {'2019-01-01': 1, '2019-02-01': 5}},
      'feature1': {'sub-feature-0': {'2019-01-01': 2, '2019-02-01': 6},
                   'sub-feature-1': {'2019-01-01': 3, '2019-02-01': 7}}}
+    >>> pprint.pprint(dataframe_to_dict(df, orient="split"))
+    {'columns': [['feature0', 'sub-feature-0'],
+                 ['feature0', 'sub-feature-1'],
+                 ['feature1', 'sub-feature-0'],
+                 ['feature1', 'sub-feature-1']],
+     'data': [[0, 1, 2, 3], [4, 5, 6, 7]],
+     'index': ['2019-01-01', '2019-02-01']}
 
     """
+    if orient == "split":
+        return _dataframe_to_split_dict(df)
+    elif orient != "dict":
+        raise ValueError(f"Unsupported orient '{orient}', use 'dict' or 'split'")
+
     # Need to copy, because Python's mutability allowed .index assignment to mutate the passed df
     data = df.copy()
     if isinstance(data.index, pd.DatetimeIndex):
@@ -133,13 +344,109 @@ def dataframe_to_dict(df: pd.DataFrame) -> dict:
         return data.to_dict()
 
 
+def _dataframe_to_split_dict(df: pd.DataFrame) -> dict:
+    if isinstance(df.index, pd.DatetimeIndex):
+        index = df.index.astype(str).tolist()
+    else:
+        index = df.index.tolist()
+    if isinstance(df.columns, pd.MultiIndex):
+        columns = [list(col) for col in df.columns]
+    else:
+        columns = df.columns.tolist()
+    return {"index": index, "columns": columns, "data": df.to_numpy().tolist()}
+
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def dataframes_into_ndjson(dfs: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """
+    Convert consecutive chunks of a dataframe into newline delimited JSON, yielding
+    the lines of each chunk as soon as it's converted.
+
+    The first line holds the ``columns`` of the dataframe, as given by the
+    ``"split"`` orient of :func:`.dataframe_to_dict`, and each of the following lines
+    the ``index`` and ``data`` of a single row.
+
+    Parameters
+    ----------
+    dfs: Iterable[pd.DataFrame]
+        Chunks of a dataframe, all with the same columns.
+
+    Returns
+    -------
+    Iterator[bytes]
+
+    Examples
+    --------
+    >>> import pandas as pd
+    >>> df = pd.DataFrame({"a": [1, 2, 3]})
+    >>> for line in dataframes_into_ndjson((df.iloc[:2], df.iloc[2:])):
+    ...     print(line.decode(), end="")
+    {"columns": ["a"]}
+    {"index": 0, "data": [1]}
+    {"index": 1, "data": [2]}
+    {"index": 2, "data": [3]}
+    """
+    header = False
+    for df in dfs:
+        split = _dataframe_to_split_dict(df)
+        lines = [
+            json.dumps({"index": index, "data": row})
+            for index, row in zip(split["index"], split["data"])
+        ]
+        if not header:
+            lines.insert(0, json.dumps({"columns": split["columns"]}))
+            header = True
+        if lines:
+            yield ("\n".join(lines) + "\n").encode()
+
+
+def _is_split_dict(data) -> bool:
+    return (
+        isinstance(data, dict)
+        and data.keys() == {"index", "columns", "data"}
+        and isinstance(data["columns"], list)
+        and isinstance(data["data"], list)
+    )
+
+
+def requested_orient() -> str:
+    """
+    The ``orient`` of :func:`.dataframe_to_dict` asked for by the current request
+    with the ``orient`` query parameter, defaulting to ``"dict"``.
+    """
+    return "split" if request.args.get("orient") == "split" else "dict"
+
+
+def requested_timestamp_format() -> str:
+    """
+    The ``timestamp_format`` of :func:`gordo.machine.model.utils.make_base_dataframe`
+    asked for by the current request with the ``timestamps`` query parameter,
+    defaulting to ``"iso"``.
+    """
+    return "epoch" if request.args.get("timestamps") == "epoch" else "iso"
+
+
+def requested_columns() -> Optional[List[str]]:
+    """
+    The top level columns asked for by the current request with the ``columns``
+    query parameter, given as comma separated names, or ``None`` if not given.
+    """
+    values = request.args.getlist("columns")
+    if not values:
+        return None
+    return [name for value in values for name in value.split(",") if name]
+
+
 def dataframe_from_dict(data: dict) -> pd.DataFrame:
     """
     The inverse procedure done by :func:`.multi_lvl_column_dataframe_from_dict`
     Reconstructed a MultiIndex column dataframe from a previously serialized one.
 
     Expects ``data`` to be a nested dictionary where each top level key has a value
-    capable of being loaded from :func:`pandas.core.DataFrame.from_dict`
+    capable of being loaded from :func:`pandas.core.DataFrame.from_dict`, or the
+    ``"split"`` layout given by :func:`.dataframe_to_dict`
 
     Parameters
     ----------
@@ -166,7 +473,12 @@ def dataframe_from_dict(data: dict) -> pd.DataFrame:
     2019-02-01             4             5             6             7
     """
 
-    if isinstance(data, dict) and any(isinstance(val, dict) for val in data.values()):
+    if _is_split_dict(data):
+        columns = data["columns"]
+        if columns and all(isinstance(col, list) for col in columns):
+            columns = pd.MultiIndex.from_tuples(columns)
+        df = pd.DataFrame(data["data"], index=data["index"], columns=columns)
+    elif isinstance(data, dict) and any(isinstance(val, dict) for val in data.values()):
         try:
             keys = data.keys()
             df: pd.DataFrame = pd.concat(
@@ -177,16 +489,54 @@ def dataframe_from_dict(data: dict) -> pd.DataFrame:
     else:
         df = pd.DataFrame.from_dict(data)
 
-    try:
-        df.index = df.index.map(dateutil.parser.isoparse)  # type: ignore
-    except (TypeError, ValueError):
-        df.index = df.index.map(int)
+    df.index = _parse_index(df.index)
 
-    df.sort_index(inplace=True)
+    # Sorting is costly, and most clients already send data in order
+    if not df.index.is_monotonic_increasing:
+        df.sort_index(inplace=True)
 
     return df
 
 
+# The common forms of ISO 8601 timestamps, which pandas parses in a vectorized way
+# the same as dateutil.parser.isoparse does. Other forms fall back to isoparse.
+_ISO_DATETIME_REGEX = (
+    r"\d{4}-\d{2}-\d{2}"
+    r"(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d{1,6})?)?)?"
+    r"(?:Z|[+-]\d{2}(?::?\d{2})?)?"
+)
+
+
+def _parse_index(index: pd.Index) -> pd.Index:
+    """
+    Parse an index of ISO 8601 timestamps into datetimes, or otherwise into integers.
+    Timestamps keep their timezone, or lack of one, as given by
+    :func:`dateutil.parser.isoparse`
+    """
+    if isinstance(index, pd.DatetimeIndex):
+        return index
+    if pd.api.types.is_integer_dtype(index):
+        return index.astype("int64")
+
+    if (
+        index.inferred_type == "string"
+        and index.str.fullmatch(_ISO_DATETIME_REGEX).all()
+    ):
+        try:
+            parsed = pd.to_datetime(index)
+        except (TypeError, ValueError, OverflowError):
+            pass
+        else:
+            # Mixed timezone offsets are not a DatetimeIndex, leave those to isoparse
+            if isinstance(parsed, pd.DatetimeIndex):
+                return parsed
+
+    try:
+        return index.map(dateutil.parser.isoparse)  # type: ignore
+    except (TypeError, ValueError):
+        return index.map(int)
+
+
 def parse_iso_datetime(datetime_str: str) -> datetime:
     parsed_date = dateutil.parser.isoparse(datetime_str)  # type: ignore
     if parsed_date.tzinfo is None:
@@ -197,8 +547,181 @@ def parse_iso_datetime(datetime_str: str) -> datetime:
     return parsed_date
 
 
+def tags_from_metadata(metadata: dict) -> List[SensorTag]:
+    """
+    The input tags of a model, as described by its metadata
+
+    Parameters
+    ----------
+    metadata: dict
+        Metadata of the model, as loaded by :func:`.load_metadata`
+
+    Returns
+    -------
+    List[SensorTag]
+    """
+    return normalize_sensor_tags(
+        metadata["dataset"]["tag_list"],
+        asset=metadata["dataset"].get("asset"),
+        default_asset=metadata["dataset"].get("default_asset"),
+    )
+
+
+def target_tags_from_metadata(metadata: dict) -> List[SensorTag]:
+    """
+    The target tags of a model, as described by its metadata. Defaults to the
+    input tags if the model was not given any ``target_tag_list``
+
+    Parameters
+    ----------
+    metadata: dict
+        Metadata of the model, as loaded by :func:`.load_metadata`
+
+    Returns
+    -------
+    List[SensorTag]
+    """
+    orig_target_tag_list = metadata["dataset"].get("target_tag_list")
+    if orig_target_tag_list:
+        return normalize_sensor_tags(
+            orig_target_tag_list,
+            asset=metadata["dataset"].get("asset"),
+            default_asset=metadata["dataset"].get("default_asset"),
+        )
+    else:
+        return tags_from_metadata(metadata)
+
+
+def frequency_from_metadata(metadata: dict) -> pd.DateOffset:
+    """
+    The frequency the model was trained with in the dataset
+    """
+    return pd.tseries.frequencies.to_offset(metadata["dataset"]["resolution"])
+
+
+@dataclass(frozen=True, eq=False)
+class ServingContext:
+    """
+    Everything about a model needed to serve a request for it, parsed once from
+    its metadata by :func:`.load_serving_context`, rather than on every request.
+    """
+
+    tags: Tuple[SensorTag, ...]
+    target_tags: Tuple[SensorTag, ...]
+    # Tag names, as the columns of the model's input and output
+    columns: pd.Index
+    target_columns: pd.Index
+    # Resolution of the model's dataset, if known
+    frequency: Optional[pd.DateOffset]
+    # Number of rows of input the model's output is shorter than its input
+    model_offset: int = 0
+    feature_thresholds: Optional[np.ndarray] = None
+    aggregate_threshold: Optional[float] = None
+    smooth_feature_thresholds: Optional[np.ndarray] = None
+    smooth_aggregate_threshold: Optional[float] = None
+
+    @classmethod
+    def from_metadata(cls, metadata: dict) -> "ServingContext":
+        """
+        Build the serving context of a model from its metadata.
+
+        Parameters
+        ----------
+        metadata: dict
+            Metadata of the model, as loaded by :func:`.load_metadata`
+
+        Returns
+        -------
+        ServingContext
+        """
+        tags = tuple(tags_from_metadata(metadata))
+        target_tags = tuple(target_tags_from_metadata(metadata))
+        resolution = metadata["dataset"].get("resolution")
+        model_build_metadata = (
+            metadata.get("metadata", {}).get("build_metadata", {}).get("model", {})
+        )
+        model_meta = model_build_metadata.get("model_meta", {})
+
+        def thresholds(key: str) -> Optional[np.ndarray]:
+            values = model_meta.get(key)
+            return np.asarray(values, dtype=float) if values is not None else None
+
+        return cls(
+            tags=tags,
+            target_tags=target_tags,
+            columns=pd.Index([tag.name for tag in tags]),
+            target_columns=pd.Index([tag.name for tag in target_tags]),
+            frequency=(
+                pd.tseries.frequencies.to_offset(resolution)
+                if resolution is not None
+                else None
+            ),
+            model_offset=model_build_metadata.get("model_offset", 0),
+            feature_thresholds=thresholds("feature-thresholds"),
+            aggregate_threshold=model_meta.get("aggregate-threshold"),
+            smooth_feature_thresholds=thresholds("smooth-feature-thresholds"),
+            smooth_aggregate_threshold=model_meta.get("smooth-aggregate-threshold"),
+        )
+
+
+MODEL_FILENAME = "model.pkl"
+METADATA_FILENAME = "metadata.json"
+
+
+@lru_cache(maxsize=1024)
+def canonical_directory(directory: str) -> str:
+    """
+    The canonical path of a revision directory, with symlinks and ``..`` resolved,
+    so a revision requested as ``<collection>/../<revision>`` shares the cached
+    models and metadata of the same revision served by default. Resolved once per
+    path, as revision directories are not moved once deployed.
+
+    Parameters
+    ----------
+    directory: str
+        Directory of the revision.
+
+    Returns
+    -------
+    str
+    """
+    return os.path.realpath(directory)
+
+
+def load_serving_context(directory: str, name: str) -> ServingContext:
+    """
+    The :class:`.ServingContext` of a given model in the directory, built once
+    per version of the model's metadata.
+
+    Parameters
+    ----------
+    directory: str
+        Directory to look for the model's metadata
+    name: str
+        Name of the model, this would be the sub directory within the
+        directory parameter.
+
+    Returns
+    -------
+    ServingContext
+    """
+    directory = canonical_directory(directory)
+    return _load_serving_context(
+        directory,
+        name,
+        artifacts.identities.get(os.path.join(directory, name, METADATA_FILENAME)),
+    )
+
+
+@lru_cache(maxsize=25000)
+def _load_serving_context(
+    directory: str, name: str, identity: Optional[ArtifactIdentity]
+) -> ServingContext:
+    return ServingContext.from_metadata(load_metadata(directory, name))
+
+
 def _verify_dataframe(
-    df: pd.DataFrame, expected_columns: List[str]
+    df: pd.DataFrame, expected_columns: Union[List[str], pd.Index]
 ) -> Union[Response, pd.DataFrame]:
     """
     Verify the dataframe, setting the column names to ``expected_columns``
@@ -210,7 +733,7 @@ def _verify_dataframe(
     ----------
     df: pandas.core.DataFrame
         DataFrame to verify.
-    expected_columns: List[str]
+    expected_columns: Union[List[str], pandas.Index]
         List of expected column names to give if the dataframe does not consist of them
         but the number of columns matches ``len(expected_columns)``
 
@@ -225,7 +748,7 @@ def _verify_dataframe(
             if len(df.columns) != len(expected_columns):
                 msg = dict(
                     message=f"Unexpected features: "
-                    f"was expecting {expected_columns} length of {len(expected_columns)}, "
+                    f"was expecting {list(expected_columns)} length of {len(expected_columns)}, "
                     f"but got {df.columns} length of {len(df.columns)}"
                 )
                 return make_response((jsonify(msg), 400))
@@ -271,39 +794,40 @@ def extract_X_y(method):
     @functools.wraps(method)
     def wrapper_method(self, *args, **kwargs):
         start_time = timeit.default_timer()
-        # Data provided by the client
-        if request.method == "POST":
-
-            # Always require an X, be it in JSON or file/parquet format.
-            if ("X" not in (request.json or {})) and ("X" not in request.files):
-                message = dict(message='Cannot predict without "X"')
-                return make_response((jsonify(message), 400))
-
-            if request.json is not None:
-                X = dataframe_from_dict(request.json["X"])
-                y = request.json.get("y")
-                if y is not None:
-                    y = dataframe_from_dict(y)
-            else:
-                X = dataframe_from_parquet_bytes(request.files["X"].read())
-                y = request.files.get("y")
+        with timing.phase(timing.PARSE):
+            # Data provided by the client
+            if request.method == "POST":
+
+                # Always require an X, be it in JSON or file/parquet format.
+                if ("X" not in (request.json or {})) and ("X" not in request.files):
+                    message = dict(message='Cannot predict without "X"')
+                    return make_response((jsonify(message), 400))
+
+                if request.json is not None:
+                    X = dataframe_from_dict(request.json["X"])
+                    y = request.json.get("y")
+                    if y is not None:
+                        y = dataframe_from_dict(y)
+                else:
+                    X = dataframe_from_bytes(request.files["X"].read())
+                    y = request.files.get("y")
+                    if y is not None:
+                        y = dataframe_from_bytes(y.read())
+
+                X = _verify_dataframe(X, self.serving_context.columns)
+
+                # Verify y if it's not None
                 if y is not None:
-                    y = dataframe_from_parquet_bytes(y.read())
-
-            X = _verify_dataframe(X, [t.name for t in self.tags])
+                    y = _verify_dataframe(y, self.serving_context.target_columns)
 
-            # Verify y if it's not None
-            if y is not None:
-                y = _verify_dataframe(y, [t.name for t in self.target_tags])
-
-            # If either X or y came back as a Response type, there was an error
-            for data_or_resp in [X, y]:
-                if isinstance(data_or_resp, Response):
-                    return data_or_resp
-        else:
-            raise NotImplementedError(
-                f"Cannot extract X and y from '{request.method}' request."
-            )
+                # If either X or y came back as a Response type, there was an error
+                for data_or_resp in [X, y]:
+                    if isinstance(data_or_resp, Response):
+                        return data_or_resp
+            else:
+                raise NotImplementedError(
+                    f"Cannot extract X and y from '{request.method}' request."
+                )
 
         # Assign X and y to the request's global context
         g.X, g.y = X, y
@@ -320,10 +844,15 @@ def extract_X_y(method):
     return wrapper_method
 
 
-@lru_cache(maxsize=int(os.getenv("N_CACHED_MODELS", 2)))
+# Models loaded by the server, configured by the MODEL_CACHE_MAX_BYTES,
+# N_CACHED_MODELS and MODEL_CACHE_POLICY environment variables
+model_cache = ModelCache.from_environment()
+
+
 def load_model(directory: str, name: str) -> BaseEstimator:
     """
-    Load a given model from the directory by name.
+    Load a given model from the directory by name, through :data:`.model_cache`,
+    loading it again if its artifact was replaced since it was cached.
 
     Parameters
     ----------
@@ -337,12 +866,99 @@ def load_model(directory: str, name: str) -> BaseEstimator:
     -------
     BaseEstimator
     """
+    directory = canonical_directory(directory)
+    return model_cache.get(
+        directory,
+        name,
+        _load_model,
+        version=artifacts.identities.get(os.path.join(directory, name, MODEL_FILENAME)),
+    )
+
+
+def _load_model(directory: str, name: str) -> BaseEstimator:
     start_time = timeit.default_timer()
     model = serializer.load(os.path.join(directory, name))
     logger.debug(f"Time to load model: {timeit.default_timer() - start_time}s")
     return model
 
 
+def preload_models(directory: str, names: List[str]):
+    """
+    Load the models ``names`` from ``directory``, and pin them in :data:`.model_cache`
+    for the lifetime of the process.
+
+    Called before the server forks its workers, the workers share the memory of the
+    models copy-on-write, and none of them pay for loading a model on its first request.
+    The models are only loaded, not run, as running them before forking isn't safe;
+    each worker runs them with :func:`.warm_up_models` instead.
+
+    Parameters
+    ----------
+    directory: str
+        Directory to load the models from.
+    names: List[str]
+        Names of the models to load.
+    """
+    start_time = timeit.default_timer()
+    n_loaded = 0
+    # Pinned by the same key as the models are cached
+    directory = canonical_directory(directory)
+    for name in names:
+        model_cache.pin(directory, name)
+        try:
+            load_model(directory, name)
+            load_serving_context(directory, name)
+        except FileNotFoundError:
+            model_cache.unpin(directory, name)
+            logger.error(f"Unable to preload model '{name}', it was not found")
+            continue
+        n_loaded += 1
+    logger.info(
+        f"Preloaded {n_loaded} models in {timeit.default_timer() - start_time:.2f}s"
+    )
+
+
+def warm_up_models():
+    """
+    Run each of the preloaded models once on dummy input, so any lazy initialisation,
+    such as the tracing of TensorFlow graphs, is done ahead of the first request.
+
+    Called by each worker, after sizing its thread pools and before serving requests.
+    """
+    start_time = timeit.default_timer()
+    pinned = model_cache.pinned()
+    for directory, name in pinned:
+        try:
+            model = load_model(directory, name)
+            serving_context = load_serving_context(directory, name)
+        except FileNotFoundError:
+            logger.warning(f"Unable to warm up model '{name}', it was not found")
+            continue
+        _warm_up_model(model, serving_context, name)
+    logger.info(
+        f"Warmed up {len(pinned)} models in {timeit.default_timer() - start_time:.2f}s"
+    )
+
+
+def _warm_up_model(model: BaseEstimator, serving_context: ServingContext, name: str):
+    """
+    Run the model on a frame of zeros, long enough for it to give at least one
+    row of output.
+    """
+    columns = serving_context.columns
+    X = pd.DataFrame(
+        np.zeros((serving_context.model_offset + 1, len(columns))), columns=columns
+    )
+    try:
+        model_io.get_model_output(model=model, X=X)
+    except Exception as exc:
+        logger.warning(f"Failed to warm up model '{name}': {exc}")
+
+
+# Concurrent loads of the same metadata wait for a single load
+_metadata_loads = SingleFlight()
+
+
 def load_metadata(directory: str, name: str) -> dict:
     """
     Load metadata from a directory for a given model by name.
@@ -359,15 +975,34 @@ def load_metadata(directory: str, name: str) -> dict:
     -------
     dict
     """
-    compressed_metadata = _load_compressed_metadata(directory, name)
+    directory = canonical_directory(directory)
+    identity = artifacts.identities.get(
+        os.path.join(directory, name, METADATA_FILENAME)
+    )
+    catalog = metadata_catalog.get_catalog(directory)
+    # Only while metadata.json is the one the catalog was written from
+    if (
+        catalog is not None
+        and identity is not None
+        and catalog.identity(name) == identity
+    ):
+        return catalog.get(name)
+
+    compressed_metadata = _metadata_loads.do(
+        (directory, name, identity),
+        lambda: _load_compressed_metadata(directory, name, identity),
+    )
     return pickle.loads(zlib.decompress(compressed_metadata))
 
 
 @lru_cache(maxsize=25000)
-def _load_compressed_metadata(directory: str, name: str):
+def _load_compressed_metadata(
+    directory: str, name: str, identity: Optional[ArtifactIdentity]
+):
     """
     Loads the metadata for model 'name' from directory 'directory', and returns it as a
-    zlib compressed pickle, to use as little space as possible in the cache.
+    zlib compressed pickle, to use as little space as possible in the cache. Cached
+    by the ``identity`` of the metadata file too, so a replaced file is loaded again.
 
     Notes
     ----
@@ -388,7 +1023,8 @@ def metadata_required(f):
     @wraps(f)
     def wrapper(*args: tuple, gordo_project: str, gordo_name: str, **kwargs: dict):
         try:
-            g.metadata = load_metadata(directory=g.collection_dir, name=gordo_name)
+            with timing.phase(timing.METADATA_LOAD):
+                g.metadata = load_metadata(directory=g.collection_dir, name=gordo_name)
         except FileNotFoundError:
             raise NotFound(f"No model found for '{gordo_name}'")
         else:
@@ -400,14 +1036,19 @@ def metadata_required(f):
 def model_required(f):
     """
     Decorate a view which has ``gordo_name`` as a url parameter and will
-    set ``g.model`` to be the loaded model and ``g.metadata``
-    to that model's metadata
+    set ``g.model`` to be the loaded model, ``g.metadata``
+    to that model's metadata and ``g.serving_context`` to its :class:`.ServingContext`
     """
 
     @wraps(f)
     def wrapper(*args: tuple, gordo_project: str, gordo_name: str, **kwargs: dict):
         try:
-            g.model = load_model(directory=g.collection_dir, name=gordo_name)
+            with timing.phase(timing.MODEL_LOAD):
+                g.model = load_model(directory=g.collection_dir, name=gordo_name)
+            with timing.phase(timing.METADATA_LOAD):
+                g.serving_context = load_serving_context(
+                    directory=g.collection_dir, name=gordo_name
+                )
         except FileNotFoundError:
             raise NotFound(f"No such model found: '{gordo_name}'")
         else:
@@ -417,3 +1058,102 @@ def model_required(f):
             )
 
     return wrapper
+
+
+def model_version(directory: str, name: str) -> str:
+    """
+    Version of the artifacts of a model, from the names, sizes and modification
+    times of its files, which only changes if they are rebuilt. Calculated once per
+    version of the model's artifacts.
+
+    Parameters
+    ----------
+    directory: str
+        Directory of the model's revision.
+    name: str
+        Name of the model, the sub directory within ``directory``.
+
+    Returns
+    -------
+    str
+        Empty if the model doesn't exist.
+    """
+    directory = canonical_directory(directory)
+    return _model_version(
+        directory,
+        name,
+        artifacts.identities.get(os.path.join(directory, name, MODEL_FILENAME)),
+        artifacts.identities.get(os.path.join(directory, name, METADATA_FILENAME)),
+    )
+
+
+@lru_cache(maxsize=25000)
+def _model_version(
+    directory: str,
+    name: str,
+    model_identity: Optional[ArtifactIdentity],
+    metadata_identity: Optional[ArtifactIdentity],
+) -> str:
+    try:
+        entries = sorted(
+            (entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+            for entry in os.scandir(os.path.join(directory, name))
+        )
+    except (FileNotFoundError, NotADirectoryError):
+        return ""
+    return hashlib.sha1(repr(entries).encode()).hexdigest()
+
+
+def conditional_get(resource_version: Callable[..., str]):
+    """
+    Decorate a GET view with conditional GET support. The ETag of the response is
+    that of the server version, the revision, the path, and the ``resource_version``
+    called with the url parameters of the view, so a request with a matching
+    ``If-None-Match`` header is answered with ``304 Not Modified``, without running
+    the view. Responses must be revalidated, see :func:`set_cache_control`.
+
+    Parameters
+    ----------
+    resource_version: Callable[..., str]
+        Called with the url parameters of the view, giving the version of the resource
+        within the revision.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            version = resource_version(**kwargs)
+            etag = hashlib.sha1(
+                "\0".join((__version__, g.revision, request.path, version)).encode()
+            ).hexdigest()
+            # Weak, as the response may be compressed differently
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+                _set_cache_headers(response, etag)
+                return response
+
+            @after_this_request
+            def _set_etag(response):
+                if response.status_code == 200:
+                    _set_cache_headers(response, etag)
+                return response
+
+            return f(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _set_cache_headers(response: Response, etag: str):
+    response.set_etag(etag, weak=True)
+    set_cache_control(response)
+
+
+def set_cache_control(response: Response):
+    """
+    Have responses revalidated on each use, as the latest revision changes on
+    deployments, and the models of a revision may be rebuilt in place.
+    """
+    response.vary.add("revision")
+    response.cache_control.no_cache = True
@@ -1,2 +1,4 @@
 from .base import base_blueprint
 from .anomaly import anomaly_blueprint
+from .bulk import bulk_blueprint
+from .npy import npy_blueprint
@@ -1,17 +1,39 @@
 # -*- coding: utf-8 -*-
 
+import inspect
 import io
+import itertools
+import json
 import logging
 import timeit
 import typing
 
-from flask import Blueprint, make_response, jsonify, g, request, send_file
+import numpy as np
+import pandas as pd
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    g,
+    jsonify,
+    make_response,
+    request,
+    send_file,
+)
 from flask_restplus import fields
 
 from gordo import __version__
 from gordo.server.rest_api import Api
 from gordo.server.views.base import BaseModelView
 from gordo.server import utils
+from gordo.server import admission
+from gordo.server import batching
+from gordo.server import result_cache
+from gordo.server import timing
+from gordo.machine.model.anomaly.diff import (
+    ANOMALY_COLUMN_DEPENDENCIES,
+    DiffBasedAnomalyDetector,
+)
 
 
 logger = logging.getLogger(__name__)
@@ -39,6 +61,12 @@ DELETED_FROM_RESPONSE_COLUMNS = (
     "smooth-tag-anomaly-unscaled",
     "smooth-total-anomaly-unscaled",
 )
+# Top level columns given by default, when the model supports calculating only these
+DEFAULT_RESPONSE_COLUMNS = ("model-input", "model-output") + tuple(
+    name
+    for name in ANOMALY_COLUMN_DEPENDENCIES
+    if name not in DELETED_FROM_RESPONSE_COLUMNS
+)
 _tags = {
     fields.String: fields.Float
 }  # tags of single prediction record {'tag-name': tag-value}
@@ -50,6 +78,201 @@ _single_prediction_record = {
 }
 
 
+def make_anomaly_dataframe(
+    model,
+    X: pd.DataFrame,
+    y: pd.DataFrame,
+    frequency,
+    all_columns: bool = False,
+    model_output: typing.Optional[np.ndarray] = None,
+    timestamp_format: str = "iso",
+    columns: typing.Optional[typing.Collection[str]] = None,
+) -> pd.DataFrame:
+    """
+    Run the model's ``.anomaly()`` method on ``X`` and ``y``, giving only the
+    ``columns`` asked for, or dropping the :data:`DELETED_FROM_RESPONSE_COLUMNS`
+    unless ``all_columns`` is set. Models whose ``.anomaly()`` takes ``columns``
+    only calculate those.
+
+    Parameters
+    ----------
+    model
+        Model implementing :meth:`gordo.machine.model.anomaly.base.AnomalyDetectorBase.anomaly`
+    X: pd.DataFrame
+        Input data to the model
+    y: pd.DataFrame
+        Expected output to compare the model output against
+    frequency
+        The frequency the model was trained with
+    all_columns: bool
+        Keep all the columns calculated by the model.
+    model_output: Optional[np.ndarray]
+        Output of the model given ``X``, if already calculated.
+    timestamp_format: str
+        Format of the ``start`` and ``end`` columns, either ``"iso"`` or ``"epoch"``
+    columns: Optional[Collection[str]]
+        Top level columns to give, besides ``start`` and ``end``. Overrides
+        ``all_columns``.
+
+    Returns
+    -------
+    pd.DataFrame
+
+    Raises
+    ------
+    AttributeError
+        If the model is not an anomaly detector.
+    """
+    # Only pass on the options which aren't the defaults, as not all anomaly
+    # detectors accept them
+    kwargs: typing.Dict[str, typing.Any] = dict()
+    if model_output is not None:
+        kwargs["model_output"] = model_output
+    if timestamp_format != "iso":
+        kwargs["timestamp_format"] = timestamp_format
+    if _accepts_columns(model):
+        if columns is not None:
+            kwargs["columns"] = columns
+        elif not all_columns:
+            kwargs["columns"] = DEFAULT_RESPONSE_COLUMNS
+    anomaly_df = model.anomaly(X, y, frequency=frequency, **kwargs)
+
+    if columns is not None or not all_columns:
+        columns_for_delete = []
+        for column in anomaly_df:
+            if columns is not None:
+                if column[0] not in ("start", "end") and column[0] not in columns:
+                    columns_for_delete.append(column)
+            elif column[0] in DELETED_FROM_RESPONSE_COLUMNS:
+                columns_for_delete.append(column)
+        anomaly_df = anomaly_df.drop(columns=columns_for_delete)
+    return anomaly_df
+
+
+def _accepts_columns(model) -> bool:
+    """
+    Whether the model's ``.anomaly()`` takes the ``columns`` to calculate.
+    """
+    try:
+        return "columns" in inspect.signature(model.anomaly).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def _smoothing_lookback(model) -> int:
+    """
+    Number of preceding rows the smoothed anomalies of each row depend on.
+    """
+    window = getattr(model, "window", None)
+    if window is not None and getattr(model, "smoothing_method", None) is not None:
+        return window - 1
+    return 0
+
+
+def is_ewma_smoothed(model) -> bool:
+    """
+    Whether the model smooths its anomalies with an exponential weighted moving
+    average, which depends on all the preceding rows, so can't be calculated in
+    chunks.
+    """
+    return (
+        getattr(model, "window", None) is not None
+        and getattr(model, "smoothing_method", None) == "ewma"
+    )
+
+
+def anomaly_model_output(X) -> typing.Optional[np.ndarray]:
+    """
+    Output of the current request's model, ``flask.g.model``, given ``X``, if its
+    ``.anomaly()`` takes the output rather than calculating it, timed as the
+    ``inference`` phase and batched with concurrent requests if micro-batching is
+    enabled. Otherwise ``None``, and the output is calculated within ``.anomaly()``.
+
+    Raises
+    ------
+    gordo.server.batching.BatchTimeout
+        If the output of a batch wasn't calculated in time.
+    """
+    if not isinstance(g.model, DiffBasedAnomalyDetector):
+        return None
+    with timing.phase(timing.INFERENCE):
+        return batching.get_model_output(X)
+
+
+def iter_anomaly_dataframes(
+    model,
+    X: pd.DataFrame,
+    y: pd.DataFrame,
+    frequency,
+    chunk_rows: int,
+    model_offset: int = 0,
+    all_columns: bool = False,
+    timestamp_format: str = "iso",
+    columns: typing.Optional[typing.Collection[str]] = None,
+) -> typing.Iterator[pd.DataFrame]:
+    """
+    :func:`.make_anomaly_dataframe` of ``X`` and ``y``, calculated and yielded in
+    consecutive chunks of about ``chunk_rows`` rows, rather than all at once.
+
+    Each chunk is calculated including the rows before it which its first rows
+    depend on, the ``model_offset`` rows of the lookback window of the model, like an LSTM,
+    and those of the rolling window of its smoothing. The chunks concatenated are then the
+    same as the anomalies calculated at once.
+
+    Parameters
+    ----------
+    model
+        Model implementing :meth:`gordo.machine.model.anomaly.base.AnomalyDetectorBase.anomaly`
+    X: pd.DataFrame
+        Input data to the model
+    y: pd.DataFrame
+        Expected output to compare the model output against
+    frequency
+        The frequency the model was trained with
+    chunk_rows: int
+        Number of rows of ``X`` in each chunk.
+    model_offset: int
+        Number of rows of ``X`` the model's output is shorter than its input.
+    all_columns: bool
+        Keep all the columns calculated by the model.
+    timestamp_format: str
+        Format of the ``start`` and ``end`` columns, either ``"iso"`` or ``"epoch"``
+    columns: Optional[Collection[str]]
+        Top level columns to give, besides ``start`` and ``end``.
+
+    Returns
+    -------
+    Iterator[pd.DataFrame]
+
+    Raises
+    ------
+    ValueError
+        If the model's anomalies are ``ewma`` smoothed, see :func:`.is_ewma_smoothed`.
+    """
+    if is_ewma_smoothed(model):
+        raise ValueError(
+            "The 'ewma' smoothed anomalies of a model can't be calculated in chunks"
+        )
+    lookback = model_offset + _smoothing_lookback(model)
+    chunk_rows = max(chunk_rows, lookback + 1)
+    for start in range(0, len(X), chunk_rows):
+        end = min(start + chunk_rows, len(X))
+        chunk_start = max(start - lookback, 0)
+        anomaly_df = make_anomaly_dataframe(
+            model,
+            X.iloc[chunk_start:end],
+            y.iloc[chunk_start:end],
+            frequency=frequency,
+            all_columns=all_columns,
+            timestamp_format=timestamp_format,
+            columns=columns,
+        )
+        # Only the rows of this chunk, not those of the lookback
+        n_rows = end - max(start, model_offset)
+        if n_rows > 0:
+            yield anomaly_df.iloc[-n_rows:]
+
+
 class AnomalyView(BaseModelView):
     """
     Serve model predictions via POST method.
@@ -100,8 +323,10 @@ class AnomalyView(BaseModelView):
             "X": "Nested list of samples to predict, or single list considered as one sample"
         }
     )
+    @result_cache.cached
     @utils.model_required
     @utils.extract_X_y
+    @admission.admitted
     def post(self):
         start_time = timeit.default_timer()
         return self._create_anomaly_response(start_time)
@@ -132,32 +357,115 @@ class AnomalyView(BaseModelView):
             }
             return make_response((jsonify(message), 400))
 
+        if request.args.get("stream") == "ndjson":
+            return self._create_anomaly_stream()
+
+        try:
+            model_output = anomaly_model_output(g.X)
+        except batching.BatchTimeout as exc:
+            logger.error(f"Failed to get the model output; error: {exc}")
+            return exc.response()
+
         # Now create an anomaly dataframe from the base response dataframe
         try:
-            anomaly_df = g.model.anomaly(g.X, g.y, frequency=self.frequency)
+            with timing.phase(
+                timing.FRAME if model_output is not None else timing.INFERENCE
+            ):
+                anomaly_df = make_anomaly_dataframe(
+                    g.model,
+                    g.X,
+                    g.y,
+                    frequency=self.frequency,
+                    all_columns=request.args.get("all_columns") is not None,
+                    model_output=model_output,
+                    timestamp_format=utils.requested_timestamp_format(),
+                    columns=utils.requested_columns(),
+                )
         except AttributeError:
             msg = {
                 "message": f"Model is not an AnomalyDetector, it is of type: {type(g.model)}"
             }
             return make_response(jsonify(msg), 422)  # 422 Unprocessable Entity
 
-        if request.args.get("all_columns") is None:
-            columns_for_delete = []
-            for column in anomaly_df:
-                if column[0] in DELETED_FROM_RESPONSE_COLUMNS:
-                    columns_for_delete.append(column)
-            anomaly_df = anomaly_df.drop(columns=columns_for_delete)
-
-        if request.args.get("format") == "parquet":
-            return send_file(
-                io.BytesIO(utils.dataframe_into_parquet_bytes(anomaly_df)),
-                mimetype="application/octet-stream",
+        # Serialized while streamed, after the timings are reported, so not timed
+        if request.args.get("format") == "arrow":
+            return Response(
+                utils.dataframe_into_arrow_stream(anomaly_df),
+                mimetype=utils.ARROW_STREAM_MIMETYPE,
             )
-        else:
-            context: typing.Dict[typing.Any, typing.Any] = dict()
-            context["data"] = utils.dataframe_to_dict(anomaly_df)
-            context["time-seconds"] = f"{timeit.default_timer() - start_time:.4f}"
-            return make_response(jsonify(context), context.pop("status-code", 200))
+        with timing.phase(timing.SERIALIZE):
+            if request.args.get("format") == "parquet":
+                return send_file(
+                    io.BytesIO(utils.dataframe_into_parquet_bytes(anomaly_df)),
+                    mimetype="application/octet-stream",
+                )
+            else:
+                context: typing.Dict[typing.Any, typing.Any] = dict()
+                context["data"] = utils.dataframe_to_dict(
+                    anomaly_df, orient=utils.requested_orient()
+                )
+                context["time-seconds"] = f"{timeit.default_timer() - start_time:.4f}"
+                return make_response(jsonify(context), context.pop("status-code", 200))
+
+    def _create_anomaly_stream(self):
+        """
+        Create an anomaly response streaming the anomalies as newline delimited JSON,
+        calculating them in chunks of ``STREAM_CHUNK_ROWS`` rows, so only a single
+        chunk of them is held in memory at the time.
+
+        The first chunk is calculated before the response is started, so a model
+        which can't give anomalies gets the same error response as without streaming.
+        A failure in a later chunk ends the stream with a line holding the ``error``.
+
+        Returns
+        -------
+        flask.Response
+        """
+        if is_ewma_smoothed(g.model):
+            msg = {
+                "message": "Cannot stream the anomalies of a model with 'ewma' smoothing, "
+                "request them without 'stream'"
+            }
+            return make_response(jsonify(msg), 400)
+
+        anomaly_dfs = iter_anomaly_dataframes(
+            g.model,
+            g.X,
+            g.y,
+            frequency=self.frequency,
+            chunk_rows=current_app.config["STREAM_CHUNK_ROWS"],
+            model_offset=self.serving_context.model_offset,
+            all_columns=request.args.get("all_columns") is not None,
+            timestamp_format=utils.requested_timestamp_format(),
+            columns=utils.requested_columns(),
+        )
+        try:
+            with timing.phase(timing.INFERENCE):
+                first_df = next(anomaly_dfs, None)
+        except AttributeError:
+            msg = {
+                "message": f"Model is not an AnomalyDetector, it is of type: {type(g.model)}"
+            }
+            return make_response(jsonify(msg), 422)  # 422 Unprocessable Entity
+
+        if first_df is not None:
+            anomaly_dfs = itertools.chain((first_df,), anomaly_dfs)
+        return Response(
+            _ndjson_until_error(utils.dataframes_into_ndjson(anomaly_dfs)),
+            mimetype=utils.NDJSON_MIMETYPE,
+        )
+
+
+def _ndjson_until_error(lines: typing.Iterator[bytes]) -> typing.Iterator[bytes]:
+    """
+    The ``lines``, ending with a line holding the ``error`` if they fail, as the
+    response has already been started.
+    """
+    try:
+        yield from lines
+    except Exception as exc:
+        logger.exception("Failed to stream the anomalies")
+        yield json.dumps({"error": str(exc)}).encode() + b"\n"
 
 
 api.add_resource(
@@ -8,15 +8,30 @@ import timeit
 import typing
 
 import pandas as pd
-from flask import Blueprint, current_app, g, send_file, make_response, jsonify, request
+from flask import (
+    Blueprint,
+    current_app,
+    g,
+    send_file,
+    make_response,
+    jsonify,
+    request,
+    Response,
+)
 from flask_restplus import Resource, fields
+from werkzeug.exceptions import NotFound
 
-from gordo import __version__, serializer
+from gordo import __version__
 from gordo.server.rest_api import Api
 from gordo.server import utils as server_utils
 from gordo.machine.model import utils as model_utils
-from gordo_dataset.sensor_tag import SensorTag, normalize_sensor_tags
-from gordo.server import model_io
+from gordo_dataset.sensor_tag import SensorTag
+from gordo.server import admission
+from gordo.server import batching
+from gordo.server import listings
+from gordo.server import metadata_catalog
+from gordo.server import result_cache
+from gordo.server import timing
 
 
 logger = logging.getLogger(__name__)
@@ -49,6 +64,27 @@ _single_prediction_record = {
 }
 
 
+def _model_version(gordo_project: str, gordo_name: str) -> str:
+    return server_utils.model_version(g.collection_dir, gordo_name)
+
+
+def _listing_version(directory: str) -> str:
+    listing = listings.get_listings().get(directory)
+    return listing.version if listing is not None else ""
+
+
+def _models_version(gordo_project: str) -> str:
+    return _listing_version(g.collection_dir)
+
+
+def _revisions_version(gordo_project: str) -> str:
+    return _listing_version(os.path.join(g.collection_dir, ".."))
+
+
+def _expected_models_version(gordo_project: str) -> str:
+    return ",".join(current_app.config["EXPECTED_MODELS"])
+
+
 class BaseModelView(Resource):
     """
     The base model view.
@@ -59,12 +95,26 @@ class BaseModelView(Resource):
     y: pd.DataFrame = None
     X: pd.DataFrame = None
 
+    @property
+    def serving_context(self) -> server_utils.ServingContext:
+        """
+        The serving context of this model, as set by
+        :func:`gordo.server.utils.model_required`, or built from ``g.metadata``
+
+        Returns
+        -------
+        gordo.server.utils.ServingContext
+        """
+        if "serving_context" not in g:
+            g.serving_context = server_utils.ServingContext.from_metadata(g.metadata)
+        return g.serving_context
+
     @property
     def frequency(self):
         """
         The frequency the model was trained with in the dataset
         """
-        return pd.tseries.frequencies.to_offset(g.metadata["dataset"]["resolution"])
+        return self.serving_context.frequency
 
     @property
     def tags(self) -> typing.List[SensorTag]:
@@ -75,11 +125,7 @@ class BaseModelView(Resource):
         -------
         typing.List[SensorTag]
         """
-        return normalize_sensor_tags(
-            g.metadata["dataset"]["tag_list"],
-            asset=g.metadata["dataset"].get("asset"),
-            default_asset=g.metadata["dataset"].get("default_asset"),
-        )
+        return list(self.serving_context.tags)
 
     @property
     def target_tags(self) -> typing.List[SensorTag]:
@@ -90,24 +136,15 @@ class BaseModelView(Resource):
         -------
         typing.List[SensorTag]
         """
-        # TODO refactor this part to have the same tag preparation logic as in TimeSeriesDataset
-        orig_target_tag_list = []
-        if "target_tag_list" in g.metadata["dataset"]:
-            orig_target_tag_list = g.metadata["dataset"]["target_tag_list"]
-        if orig_target_tag_list:
-            return normalize_sensor_tags(
-                orig_target_tag_list,
-                asset=g.metadata["dataset"].get("asset"),
-                default_asset=g.metadata["dataset"].get("default_asset"),
-            )
-        else:
-            return self.tags
+        return list(self.serving_context.target_tags)
 
     @api.response(200, "Success", API_MODEL_OUTPUT_POST)
     @api.expect(API_MODEL_INPUT_POST, validate=False)
     @api.doc(params={"X": "Nested or single list of sample(s) to predict"})
+    @result_cache.cached
     @server_utils.model_required
     @server_utils.extract_X_y
+    @admission.admitted
     def post(self):
         """
         Process a POST request by using provided user data
@@ -147,7 +184,11 @@ class BaseModelView(Resource):
         process_request_start_time_s = timeit.default_timer()
 
         try:
-            output = model_io.get_model_output(model=g.model, X=X)
+            with timing.phase(timing.INFERENCE):
+                output = batching.get_model_output(X)
+        except batching.BatchTimeout as exc:
+            logger.error(f"Failed to predict or transform; error: {exc}")
+            return exc.response()
         except ValueError as err:
             tb = traceback.format_exc()
             logger.error(
@@ -172,23 +213,34 @@ class BaseModelView(Resource):
                 f"Calculating model output took "
                 f"{get_model_output_time_s-process_request_start_time_s} s"
             )
-            data = model_utils.make_base_dataframe(
-                tags=self.tags,
-                model_input=X.values if isinstance(X, pd.DataFrame) else X,
-                model_output=output,
-                target_tag_list=self.target_tags,
-                index=X.index,
-            )
-            if request.args.get("format") == "parquet":
-                return send_file(
-                    io.BytesIO(server_utils.dataframe_into_parquet_bytes(data)),
-                    mimetype="application/octet-stream",
+            with timing.phase(timing.FRAME):
+                data = model_utils.make_base_dataframe(
+                    tags=self.serving_context.tags,
+                    model_input=X.values if isinstance(X, pd.DataFrame) else X,
+                    model_output=output,
+                    target_tag_list=self.serving_context.target_tags,
+                    index=X.index,
+                    timestamp_format=server_utils.requested_timestamp_format(),
                 )
-            else:
-                context["data"] = server_utils.dataframe_to_dict(data)
-                return make_response(
-                    (jsonify(context), context.pop("status-code", 200))
+            # Serialized while streamed, after the timings are reported, so not timed
+            if request.args.get("format") == "arrow":
+                return Response(
+                    server_utils.dataframe_into_arrow_stream(data),
+                    mimetype=server_utils.ARROW_STREAM_MIMETYPE,
                 )
+            with timing.phase(timing.SERIALIZE):
+                if request.args.get("format") == "parquet":
+                    return send_file(
+                        io.BytesIO(server_utils.dataframe_into_parquet_bytes(data)),
+                        mimetype="application/octet-stream",
+                    )
+                else:
+                    context["data"] = server_utils.dataframe_to_dict(
+                        data, orient=server_utils.requested_orient()
+                    )
+                    return make_response(
+                        (jsonify(context), context.pop("status-code", 200))
+                    )
 
 
 class MetaDataView(Resource):
@@ -196,6 +248,7 @@ class MetaDataView(Resource):
     Serve model / server metadata
     """
 
+    @server_utils.conditional_get(_model_version)
     @server_utils.metadata_required
     def get(self):
         """
@@ -217,19 +270,25 @@ class DownloadModel(Resource):
     """
 
     @api.doc(description="Download model, loadable via gordo.serializer.loads")
-    @server_utils.model_required
-    def get(self):
+    def get(self, gordo_project: str, gordo_name: str):
         """
-        Responds with a serialized copy of the current model being served.
+        Responds with the serialized model being served, its ``model.pkl`` artifact,
+        sent straight from the file without loading the model. Supports conditional
+        and range requests.
 
         Returns
         -------
         bytes
-            Results from ``gordo.serializer.dumps()``
+            Loadable by ``gordo.serializer.loads()``
         """
-        serialized_model = serializer.dumps(g.model)
-        buff = io.BytesIO(serialized_model)
-        return send_file(buff, attachment_filename="model.tar.gz")
+        path = os.path.join(g.collection_dir, gordo_name, "model.pkl")
+        if not os.path.isfile(path):
+            raise NotFound(f"No such model found: '{gordo_name}'")
+        response = send_file(
+            path, mimetype="application/octet-stream", conditional=True, add_etags=True
+        )
+        server_utils.set_cache_control(response)
+        return response
 
 
 class ModelListView(Resource):
@@ -238,13 +297,15 @@ class ModelListView(Resource):
     """
 
     @api.doc(description="List the name of the models capable of being served.")
+    @server_utils.conditional_get(_models_version)
     def get(self, gordo_project: str):
-        try:
-            available_models = os.listdir(g.collection_dir)
-        except FileNotFoundError:
-            available_models = []
-        finally:
-            return jsonify({"models": available_models})
+        listing = listings.get_listings().get(g.collection_dir)
+        available_models = [
+            name
+            for name in (listing.names if listing is not None else ())
+            if not name.startswith(metadata_catalog.CATALOG_FILENAME)
+        ]
+        return jsonify({"models": available_models})
 
 
 class RevisionListView(Resource):
@@ -253,13 +314,13 @@ class RevisionListView(Resource):
     """
 
     @api.doc(description="Available revisions of the project that can be served.")
+    @server_utils.conditional_get(_revisions_version)
     def get(self, gordo_project: str):
-        try:
-            available_revisions = os.listdir(os.path.join(g.collection_dir, ".."))
-        except FileNotFoundError:
-            logger.error(
-                f"Attempted to list directories above {g.collection_dir} but failed with: {traceback.format_exc()}"
-            )
+        listing = listings.get_listings().get(os.path.join(g.collection_dir, ".."))
+        if listing is not None:
+            available_revisions = list(listing.names)
+        else:
+            logger.error(f"Attempted to list directories above {g.collection_dir}")
             available_revisions = [g.current_revision]
         return jsonify(
             {"latest": g.current_revision, "available-revisions": available_revisions}
@@ -268,6 +329,7 @@ class RevisionListView(Resource):
 
 class ExpectedModels(Resource):
     @api.doc(description="Models that the server expects to be able to serve.")
+    @server_utils.conditional_get(_expected_models_version)
     def get(self, gordo_project: str):
         return jsonify({"expected-models": current_app.config["EXPECTED_MODELS"]})
 
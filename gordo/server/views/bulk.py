@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import threading
+import timeit
+import traceback
+import typing
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from flask import Blueprint, current_app, g, jsonify, make_response, request, Response
+from flask_restplus import Resource, fields
+
+from gordo import __version__
+from gordo.server.rest_api import Api
+from gordo.server import utils as server_utils
+from gordo.server import admission
+from gordo.server import model_io
+from gordo.server.views.anomaly import make_anomaly_dataframe
+from gordo.machine.model import utils as model_utils
+
+
+logger = logging.getLogger(__name__)
+
+bulk_blueprint = Blueprint("bulk_model_view", __name__)
+
+api = Api(
+    app=bulk_blueprint,
+    title="Gordo Bulk Model View API Docs",
+    version=__version__,
+    description="Documentation for the Gordo ML Server",
+    default_label="Gordo Endpoints",
+)
+
+# POST type declarations
+API_MODEL_INPUT_POST = api.model(
+    "Bulk Prediction - Multiple Models",
+    {
+        "<gordo-name>": fields.Raw(
+            description="Mapping of 'X' and optionally 'y' for this model"
+        )
+    },
+)
+
+# Namespace of the bulk routes, which can't be the name of a model, as those are
+# lower case alphanumeric with dashes, see gordo.machine.validators.ValidUrlString
+BULK_PREFIX = "_bulk"
+
+_executor_lock = threading.Lock()
+_executor: typing.Optional[ThreadPoolExecutor] = None
+_executor_pid: typing.Optional[int] = None
+
+
+def _get_executor(max_workers: int) -> ThreadPoolExecutor:
+    """
+    The thread pool shared by all bulk requests in this worker process. Created
+    lazily by each process using it, as the threads of a pool created before the
+    server forked its workers don't exist in the workers.
+    """
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="gordo-bulk"
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+class ModelRequestError(Exception):
+    """
+    Failure to process the part of a bulk request belonging to a single model.
+    """
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class BulkModelView(Resource):
+    """
+    Run many models of the project in a single request.
+
+    The request is a mapping of model names to the ``X`` (and optionally ``y``)
+    each model should be given, in the same formats accepted by
+    :class:`gordo.server.views.base.BaseModelView`. Models are processed
+    concurrently, and the response holds the results per model under ``data``
+    and the failures per model under ``errors``::
+
+        {
+            'data': {'model-a': {...}, 'model-b': {...}},
+            'errors': {'model-c': {'message': "No such model found: 'model-c'",
+                                   'status-code': 404}},
+            'time-seconds': '0.2012'
+        }
+
+    Parquet or Arrow stream input is supported by sending multipart files named
+    ``<gordo-name>/X`` and ``<gordo-name>/y``.
+    """
+
+    methods = ["POST"]
+
+    @api.expect(API_MODEL_INPUT_POST, validate=False)
+    @api.doc(
+        params={
+            "<gordo-name>": "Mapping of 'X' and optionally 'y' to give the model of this name"
+        }
+    )
+    def post(self, gordo_project: str):
+        start_time = timeit.default_timer()
+
+        payloads = self._extract_payloads()
+        if isinstance(payloads, Response):
+            return payloads
+
+        self.all_columns = request.args.get("all_columns") is not None
+        self.columns = server_utils.requested_columns()
+        self.orient = server_utils.requested_orient()
+        self.timestamp_format = server_utils.requested_timestamp_format()
+        app = current_app._get_current_object()
+        collection_dir = g.collection_dir
+
+        def process(gordo_name: str, X, y) -> dict:
+            with app.app_context():
+                return self._process_model(collection_dir, gordo_name, X, y)
+
+        executor = _get_executor(current_app.config["BULK_MAX_WORKERS"])
+        futures = {
+            gordo_name: executor.submit(process, gordo_name, X, y)
+            for gordo_name, (X, y) in payloads.items()
+        }
+
+        context: typing.Dict[typing.Any, typing.Any] = {
+            "data": dict(),
+            "errors": dict(),
+        }
+        for gordo_name, future in futures.items():
+            try:
+                context["data"][gordo_name] = future.result()
+            except ModelRequestError as err:
+                context["errors"][gordo_name] = {
+                    "message": err.message,
+                    "status-code": err.status_code,
+                }
+            except Exception as exc:
+                tb = traceback.format_exc()
+                logger.error(
+                    f"Failed to process model '{gordo_name}'; error: {exc} - \nTraceback: {tb}"
+                )
+                context["errors"][gordo_name] = {
+                    "message": "Something unexpected happened; check your input data",
+                    "status-code": 400,
+                }
+        context["time-seconds"] = f"{timeit.default_timer() - start_time:.4f}"
+        return make_response(jsonify(context), 200)
+
+    @staticmethod
+    def _extract_payloads() -> typing.Union[Response, typing.Dict[str, tuple]]:
+        """
+        Get the raw ``X`` and ``y`` per model name from the request, ``X`` and ``y``
+        are parsed into dataframes later by :meth:`~BulkModelView._process_model`.
+        """
+        payloads: typing.Dict[str, tuple] = dict()
+        if request.json is not None:
+            if not isinstance(request.json, dict):
+                message = dict(message="Expected a mapping of model names to data")
+                return make_response((jsonify(message), 400))
+            for gordo_name, data in request.json.items():
+                data = data if isinstance(data, dict) else dict()
+                payloads[gordo_name] = (data.get("X"), data.get("y"))
+        else:
+            for key, file in request.files.items():
+                gordo_name, _, name = key.rpartition("/")
+                if gordo_name and name in ("X", "y"):
+                    X, y = payloads.get(gordo_name, (None, None))
+                    if name == "X":
+                        X = file.read()
+                    else:
+                        y = file.read()
+                    payloads[gordo_name] = (X, y)
+
+        if not payloads:
+            message = dict(message="Cannot predict without any models given")
+            return make_response((jsonify(message), 400))
+        return payloads
+
+    def _process_model(self, collection_dir: str, gordo_name: str, X, y) -> dict:
+        """
+        Load the model, parse and verify its ``X`` and ``y``, and run it. Expected
+        to be run in a worker thread, and therefore does not use ``flask.g``.
+
+        Raises
+        ------
+        ModelRequestError
+            If the request for this model could not be processed.
+        """
+        if X is None:
+            raise ModelRequestError('Cannot predict without "X"')
+
+        try:
+            model = server_utils.load_model(directory=collection_dir, name=gordo_name)
+            serving_context = server_utils.load_serving_context(
+                directory=collection_dir, name=gordo_name
+            )
+        except FileNotFoundError:
+            raise ModelRequestError(f"No such model found: '{gordo_name}'", 404)
+
+        X = self._to_dataframe(X, serving_context.columns)
+        if y is not None:
+            y = self._to_dataframe(y, serving_context.target_columns)
+
+        controller = admission.get_controller()
+        if controller is None:
+            data = self._make_dataframe(model, serving_context, X, y)
+        else:
+            try:
+                with controller.admit(X.size, gordo_name):
+                    data = self._make_dataframe(model, serving_context, X, y)
+            except admission.Overloaded as exc:
+                raise ModelRequestError(exc.message, exc.status_code)
+        return server_utils.dataframe_to_dict(data, orient=self.orient)
+
+    @staticmethod
+    def _to_dataframe(data, expected_columns: pd.Index) -> pd.DataFrame:
+        if isinstance(data, bytes):
+            df = server_utils.dataframe_from_bytes(data)
+        else:
+            df = server_utils.dataframe_from_dict(data)
+        df = server_utils._verify_dataframe(df, expected_columns)
+        if isinstance(df, Response):
+            raise ModelRequestError(df.get_json()["message"], df.status_code)
+        return df
+
+    def _make_dataframe(
+        self,
+        model,
+        serving_context: server_utils.ServingContext,
+        X: pd.DataFrame,
+        y: typing.Optional[pd.DataFrame],
+    ) -> pd.DataFrame:
+        """
+        The output of a single model, equivalent to the one given by
+        :class:`gordo.server.views.base.BaseModelView`
+        """
+        try:
+            output = model_io.get_model_output(model=model, X=X)
+        except ValueError as err:
+            raise ModelRequestError(f"ValueError: {str(err)}")
+        return model_utils.make_base_dataframe(
+            tags=serving_context.tags,
+            model_input=X.values,
+            model_output=output,
+            target_tag_list=serving_context.target_tags,
+            index=X.index,
+            timestamp_format=self.timestamp_format,
+        )
+
+
+class BulkAnomalyView(BulkModelView):
+    """
+    Run the anomaly detection of many models of the project in a single request.
+
+    Like :class:`~BulkModelView`, but each model's output is the one given by
+    :class:`gordo.server.views.anomaly.AnomalyView`, and therefore requires a ``y``
+    for each of the models.
+    """
+
+    def _make_dataframe(
+        self,
+        model,
+        serving_context: server_utils.ServingContext,
+        X: pd.DataFrame,
+        y: typing.Optional[pd.DataFrame],
+    ) -> pd.DataFrame:
+        if y is None:
+            raise ModelRequestError(
+                "Cannot perform anomaly without 'y' to compare against."
+            )
+        try:
+            return make_anomaly_dataframe(
+                model,
+                X,
+                y,
+                frequency=serving_context.frequency,
+                all_columns=self.all_columns,
+                timestamp_format=self.timestamp_format,
+                columns=self.columns,
+            )
+        except AttributeError:
+            raise ModelRequestError(
+                f"Model is not an AnomalyDetector, it is of type: {type(model)}", 422
+            )
+
+
+api.add_resource(BulkModelView, f"/gordo/v0/<gordo_project>/{BULK_PREFIX}/prediction")
+api.add_resource(
+    BulkAnomalyView, f"/gordo/v0/<gordo_project>/{BULK_PREFIX}/anomaly/prediction"
+)
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+
+import functools
+import logging
+import traceback
+import typing
+
+import numpy as np
+import pandas as pd
+from flask import Blueprint, Response, g, jsonify, make_response, request
+
+from gordo import __version__
+from gordo.server.rest_api import Api
+from gordo.server.views.base import BaseModelView
+from gordo.server.views.anomaly import anomaly_model_output, make_anomaly_dataframe
+from gordo.server import utils as server_utils
+from gordo.server import admission
+from gordo.server import batching
+from gordo.server import timing
+
+"""
+Prediction and anomaly routes taking and giving plain NumPy arrays, rather than
+dataframes, for machine to machine traffic where the caller already has the
+input as arrays in the order of the model's tags.
+
+``X``, and optionally ``y``, are posted either as consecutive arrays of the
+``.npy`` format, with the ``application/x-npy`` content type, or as the raw bytes
+of ``X`` followed by those of ``y``, with the ``application/octet-stream`` content
+type and the shape of ``X`` in the ``X-Gordo-Shape`` header, as ``<rows>,<columns>``.
+Raw bytes are little-endian ``float32``, unless the ``X-Gordo-Dtype`` header gives
+another NumPy dtype. Either way the arrays are used in place, without being copied.
+
+Responses are always ``.npy`` arrays.
+"""
+
+logger = logging.getLogger(__name__)
+
+npy_blueprint = Blueprint("npy_model_view", __name__)
+
+api = Api(
+    app=npy_blueprint,
+    title="Gordo NumPy Model View API Docs",
+    version=__version__,
+    description="Documentation for the Gordo ML Server",
+    default_label="Gordo Endpoints",
+)
+
+RAW_MIMETYPE = "application/octet-stream"
+
+
+def _bad_request(message: str) -> Response:
+    return make_response((jsonify(message=message), 400))
+
+
+def _arrays_from_raw_bytes(buf: bytes, n_targets: int) -> typing.List[np.ndarray]:
+    """
+    ``X``, and ``y`` if there are bytes left after ``X``, from raw bytes shaped by
+    the ``X-Gordo-Shape`` and ``X-Gordo-Dtype`` headers.
+    """
+    try:
+        n_rows, n_columns = (
+            int(n) for n in request.headers["X-Gordo-Shape"].split(",")
+        )
+    except (KeyError, ValueError):
+        raise ValueError(
+            "Raw input requires the 'X-Gordo-Shape: <rows>,<columns>' header"
+        )
+    dtype = np.dtype(request.headers.get("X-Gordo-Dtype", "<f4"))
+    if dtype.hasobject:
+        raise ValueError("Arrays of Python objects are not supported")
+
+    X_size = n_rows * n_columns * dtype.itemsize
+    y_size = n_rows * n_targets * dtype.itemsize
+    if len(buf) not in (X_size, X_size + y_size):
+        raise ValueError(
+            f"Expected {X_size} bytes of 'X', and optionally {y_size} bytes of 'y', "
+            f"but got {len(buf)} bytes"
+        )
+    X = np.frombuffer(buf, dtype=dtype, count=n_rows * n_columns)
+    arrays = [X.reshape((n_rows, n_columns))]
+    if len(buf) > X_size:
+        y = np.frombuffer(buf, dtype=dtype, count=n_rows * n_targets, offset=X_size)
+        arrays.append(y.reshape((n_rows, n_targets)))
+    return arrays
+
+
+def _verify_array(
+    array: np.ndarray, name: str, expected_columns: pd.Index
+) -> typing.Optional[str]:
+    """
+    Message of why ``array`` can't be used as ``name``, or ``None`` if it can.
+    """
+    if array.ndim != 2 or array.shape[1] != len(expected_columns):
+        return (
+            f"Unexpected shape of '{name}': was expecting (<rows>, {len(expected_columns)}) "
+            f"for {list(expected_columns)}, but got {array.shape}"
+        )
+    return None
+
+
+def extract_X_y_arrays(method):
+    """
+    For a given flask view, extract ``X`` and optionally ``y`` from the request body
+    as NumPy arrays, and assign them to ``flask.g.X`` and ``flask.g.y``, or give a
+    ``BadRequest`` response if the body can't be read, or the arrays don't match the
+    model's tags.
+    """
+
+    @functools.wraps(method)
+    def wrapper_method(self, *args, **kwargs):
+        buf = request.get_data(cache=False)
+        n_targets = len(self.serving_context.target_columns)
+        try:
+            with timing.phase(timing.PARSE):
+                if request.mimetype == server_utils.NPY_MIMETYPE:
+                    arrays = server_utils.arrays_from_npy_bytes(buf)
+                elif request.mimetype == RAW_MIMETYPE:
+                    arrays = _arrays_from_raw_bytes(buf, n_targets)
+                else:
+                    return _bad_request(
+                        f"Unsupported content type '{request.mimetype}', use "
+                        f"'{server_utils.NPY_MIMETYPE}' or '{RAW_MIMETYPE}'"
+                    )
+        except (ValueError, TypeError) as exc:
+            return _bad_request(f"Failed to read the arrays of the request: {exc}")
+
+        if not 1 <= len(arrays) <= 2:
+            return _bad_request(
+                f"Expected 'X' and optionally 'y', got {len(arrays)} arrays"
+            )
+        X, y = arrays[0], arrays[1] if len(arrays) == 2 else None
+
+        message = _verify_array(X, "X", self.serving_context.columns)
+        if message is None and y is not None:
+            message = _verify_array(y, "y", self.serving_context.target_columns)
+            if message is None and len(y) != len(X):
+                message = f"'X' has {len(X)} rows, but 'y' has {len(y)}"
+        if message is not None:
+            return _bad_request(message)
+
+        g.X, g.y = X, y
+        return method(self, *args, **kwargs)
+
+    return wrapper_method
+
+
+def _npy_response(
+    arrays: typing.Iterable[np.ndarray], headers: typing.Optional[dict] = None
+) -> Response:
+    with timing.phase(timing.SERIALIZE):
+        return Response(
+            server_utils.arrays_into_npy_bytes(arrays),
+            mimetype=server_utils.NPY_MIMETYPE,
+            headers=headers,
+        )
+
+
+class NpyModelView(BaseModelView):
+    """
+    The output of the model given ``X``, as a single ``.npy`` array.
+    """
+
+    methods = ["POST"]
+
+    @api.doc(description="Model output of 'X', with 'X' and the output as NumPy arrays")
+    @server_utils.model_required
+    @extract_X_y_arrays
+    @admission.admitted
+    def post(self):
+        try:
+            with timing.phase(timing.INFERENCE):
+                output = batching.get_model_output(g.X)
+        except batching.BatchTimeout as exc:
+            logger.error(f"Failed to predict or transform; error: {exc}")
+            return exc.response()
+        except ValueError as err:
+            logger.error(
+                f"Failed to predict or transform; error: {err} - \nTraceback: {traceback.format_exc()}"
+            )
+            return _bad_request(f"ValueError: {err}")
+        except Exception as exc:
+            logger.error(
+                f"Failed to predict or transform; error: {exc} - \nTraceback: {traceback.format_exc()}"
+            )
+            return _bad_request("Something unexpected happened; check your input data")
+        return _npy_response([np.asarray(output)])
+
+
+class NpyAnomalyView(BaseModelView):
+    """
+    The anomalies of the model given ``X`` and ``y``, as one ``.npy`` array for each
+    of the top level columns of the anomaly dataframe, except ``start`` and ``end``,
+    in the order given by the ``X-Gordo-Arrays`` header. Each array has the rows of
+    the model output, the last rows of ``X``.
+    """
+
+    methods = ["POST"]
+
+    @api.doc(
+        description="Anomalies of 'X' and 'y', with 'X', 'y' and the anomalies as NumPy arrays"
+    )
+    @server_utils.model_required
+    @extract_X_y_arrays
+    @admission.admitted
+    def post(self):
+        if g.y is None:
+            return _bad_request(
+                "Cannot perform anomaly without 'y' to compare against."
+            )
+
+        # Wrapping the arrays doesn't copy them
+        X = pd.DataFrame(g.X, columns=self.serving_context.columns, copy=False)
+        y = pd.DataFrame(g.y, columns=self.serving_context.target_columns, copy=False)
+        try:
+            model_output = anomaly_model_output(X)
+        except batching.BatchTimeout as exc:
+            logger.error(f"Failed to get the model output; error: {exc}")
+            return exc.response()
+        try:
+            with timing.phase(
+                timing.FRAME if model_output is not None else timing.INFERENCE
+            ):
+                anomaly_df = make_anomaly_dataframe(
+                    g.model,
+                    X,
+                    y,
+                    frequency=self.frequency,
+                    model_output=model_output,
+                    all_columns=request.args.get("all_columns") is not None,
+                    # The cheapest format, as 'start' and 'end' aren't returned
+                    timestamp_format="epoch",
+                    columns=server_utils.requested_columns(),
+                )
+        except AttributeError:
+            msg = {
+                "message": f"Model is not an AnomalyDetector, it is of type: {type(g.model)}"
+            }
+            return make_response(jsonify(msg), 422)  # 422 Unprocessable Entity
+
+        names = [
+            name
+            for name in anomaly_df.columns.get_level_values(0).unique()
+            if name not in ("start", "end")
+        ]
+        return _npy_response(
+            (anomaly_df[name].to_numpy() for name in names),
+            headers={"X-Gordo-Arrays": ",".join(names)},
+        )
+
+
+api.add_resource(NpyModelView, "/gordo/v0/<gordo_project>/<gordo_name>/prediction/npy")
+api.add_resource(
+    NpyAnomalyView, "/gordo/v0/<gordo_project>/<gordo_name>/anomaly/prediction/npy"
+)
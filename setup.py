@@ -16,10 +16,12 @@ def requirements(fp: str):
 
 
 extras_require = {
+    "asgi": requirements("asgi_requirements.in"),
     "docs": requirements("docs_requirements.in"),
     "mlflow": requirements("mlflow_requirements.in"),
     "postgres": requirements("postgres_requirements.in"),
     "tests": requirements("test_requirements.txt"),
+    "zstd": requirements("zstd_requirements.in"),
 }
 extras_require["full"] = extras_require["mlflow"] + extras_require["postgres"]
 
@@ -12,6 +12,7 @@ from gordo import cli
 from gordo.cli.cli import expand_model
 from gordo.serializer import serializer
 from gordo.machine import Machine
+from gordo.server import metadata_catalog
 from tests.utils import temp_env_vars
 
 import json
@@ -459,3 +460,10 @@ def test_log_level_cli():
 
     # Assert all the values to the GORDO_LOG_LEVEL key contains the correct log-level
     assert all(["TEST_LOG_LEVEL" in value for value in gordo_log_levels])
+
+
+def test_build_metadata_catalog_cli(runner, tmpdir):
+    tmpdir.mkdir("model-a").join("metadata.json").write('{"name": "model-a"}')
+    result = runner.invoke(cli.gordo, ["build-metadata-catalog", str(tmpdir)])
+    assert result.exit_code == 0
+    assert tmpdir.join(metadata_catalog.CATALOG_FILENAME).check()
@@ -22,6 +22,7 @@ from gordo.machine.model.anomaly.base import AnomalyDetectorBase
 from gordo.machine.model.anomaly.diff import (
     DiffBasedAnomalyDetector,
     DiffBasedKFCVAnomalyDetector,
+    required_anomaly_columns,
 )
 
 
@@ -794,3 +795,45 @@ def test_diff_detector_require_thresholds(mode: str, require_threshold: bool):
     else:
         # thresholds not required
         model.anomaly(X, y)
+
+
+@pytest.mark.parametrize(
+    "columns",
+    (
+        ["tag-anomaly-unscaled"],
+        ["smooth-total-anomaly-scaled", "model-output"],
+        ["total-anomaly-confidence", "anomaly-confidence"],
+        [],
+    ),
+)
+def test_diff_detector_anomaly_columns(columns):
+    """
+    Only the columns asked for are given, the same as when all are calculated
+    """
+    X = pd.DataFrame(np.random.random((50, 3)), columns=["a", "b", "c"])
+    model = DiffBasedAnomalyDetector(
+        base_estimator=MultiOutputRegressor(LinearRegression()),
+        window=5,
+        smoothing_method="smm",
+    )
+    model.cross_validate(X=X, y=X)
+    model.fit(X, X)
+
+    expected = model.anomaly(X, X)
+    anomaly_df = model.anomaly(X, X, columns=columns)
+    names = list(anomaly_df.columns.get_level_values(0).unique())
+    assert names == ["start", "end"] + [
+        name
+        for name in expected.columns.get_level_values(0).unique()
+        if name in columns
+    ]
+    pd.testing.assert_frame_equal(anomaly_df, expected[names])
+
+
+def test_required_anomaly_columns():
+    assert required_anomaly_columns(["total-anomaly-confidence", "model-input"]) == {
+        "total-anomaly-confidence",
+        "total-anomaly-scaled",
+        "tag-anomaly-scaled",
+    }
+    assert "smooth-tag-anomaly-unscaled" in required_anomaly_columns()
@@ -104,3 +104,37 @@ def test_base_dataframe_creation(dates, tags, target_tag_list, output_offset):
         assert np.array_equal(df.index.values, dates.values[output_offset:])
     else:
         assert np.array_equal(df.index.values, np.arange(0, len(df)))
+
+
+@pytest.mark.parametrize(
+    "index",
+    (
+        pd.date_range("2016-01-01", periods=10, freq="10T", tz="UTC"),
+        pd.date_range("2016-03-27 00:30", periods=10, freq="37T", tz="Europe/Oslo"),
+        pd.date_range("2016-01-01", periods=10, freq="1500ms"),
+    ),
+)
+def test_base_dataframe_timestamps(index):
+    """
+    The start and end columns are the timestamps of the index, as ISO 8601
+    strings or milliseconds since the epoch
+    """
+    frequency = pd.Timedelta(minutes=10)
+    kwargs = dict(
+        tags=["tag1", "tag2"],
+        model_input=np.random.random((10, 2)),
+        model_output=np.random.random((10, 2)).astype("float32"),
+        index=index,
+        frequency=frequency,
+    )
+    df = model_utils.make_base_dataframe(**kwargs)
+    assert df[("start", "")].tolist() == [ts.isoformat() for ts in index]
+    assert df[("end", "")].tolist() == [(ts + frequency).isoformat() for ts in index]
+    assert df["model-output"].dtypes.tolist() == [np.float32, np.float32]
+
+    df = model_utils.make_base_dataframe(timestamp_format="epoch", **kwargs)
+    assert df[("start", "")].tolist() == (index.asi8 // 1_000_000).tolist()
+    assert df[("end", "")].tolist() == ((index + frequency).asi8 // 1_000_000).tolist()
+
+    with pytest.raises(ValueError):
+        model_utils.make_base_dataframe(timestamp_format="unix", **kwargs)
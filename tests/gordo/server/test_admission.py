@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+import numpy as np
+import pytest
+from flask import Flask, Response, g, jsonify
+from prometheus_client import CollectorRegistry
+
+from gordo.server import admission
+from gordo.server.prometheus import GordoServerPrometheusMetrics
+
+
+def _controller(**kwargs) -> admission.AdmissionController:
+    options = dict(max_cost=100, max_wait=0.5, small_cost=10, max_queue=8)
+    options.update(kwargs)
+    return admission.AdmissionController(**options)
+
+
+def _app(**config) -> Flask:
+    app = Flask(__name__)
+    app.config.update(
+        ADMISSION_MAX_COST=100,
+        ADMISSION_MAX_WAIT_S=0.1,
+        ADMISSION_SMALL_COST=10,
+        ADMISSION_MAX_QUEUE=8,
+    )
+    app.config.update(config)
+
+    @app.route("/<gordo_name>/prediction", methods=["POST"])
+    @admission.admitted
+    def prediction(gordo_name):
+        return jsonify({"cost": admission.get_controller().stats()["cost"]})
+
+    @app.route("/<gordo_name>/stream", methods=["POST"])
+    @admission.admitted
+    def stream(gordo_name):
+        return Response(iter([b"a", b"b"]))
+
+    @app.before_request
+    def _set_X():
+        g.X = np.zeros((5, 4))
+
+    admission.init_app(app)
+    return app
+
+
+def test_admission_disabled():
+    app = _app(ADMISSION_MAX_COST=0)
+    with app.app_context():
+        assert admission.get_controller() is None
+
+
+def test_admitted_counts_request():
+    app = _app()
+    client = app.test_client()
+    resp = client.post("/model-a/prediction")
+    assert resp.status_code == 200
+    assert resp.json["cost"] == 20
+
+    # Released once done
+    assert app.extensions[admission.EXTENSION_NAME].stats()["cost"] == 0
+
+
+def test_admitted_releases_stream_on_close():
+    app = _app()
+    controller = app.extensions[admission.EXTENSION_NAME]
+    resp = app.test_client().post("/model-a/stream", buffered=False)
+    assert controller.stats()["cost"] == 20
+    resp.close()
+    assert controller.stats()["cost"] == 0
+
+
+def test_admitted_sheds_after_wait():
+    app = _app()
+    controller = app.extensions[admission.EXTENSION_NAME]
+    cost = controller.acquire(100)
+
+    resp = app.test_client().post("/model-a/prediction")
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "1"
+    assert controller.stats()["shed"] == 1
+    controller.release(cost)
+
+
+def test_acquire_waits_for_release():
+    controller = _controller()
+    cost = controller.acquire(80)
+    threading.Timer(0.05, controller.release, args=(cost,)).start()
+    with controller.admit(50):
+        assert controller.stats()["cost"] == 50
+    assert controller.stats()["cost"] == 0
+
+
+def test_acquire_larger_than_max_cost():
+    controller = _controller()
+    with controller.admit(1000):
+        assert controller.stats()["cost"] == 100
+        with pytest.raises(admission.Overloaded) as exc:
+            controller.acquire(1, "model-a")
+    assert exc.value.status_code == 503
+
+
+def test_acquire_queue_full():
+    controller = _controller(max_queue=0)
+    with controller.admit(100):
+        with pytest.raises(admission.Overloaded) as exc:
+            controller.acquire(1)
+    assert exc.value.status_code == 429
+
+
+def test_acquire_small_requests_first():
+    controller = _controller(max_wait=1)
+    cost = controller.acquire(100)
+    admitted = []
+
+    def request(cost, name):
+        with controller.admit(cost):
+            admitted.append(name)
+            time.sleep(0.01)
+
+    large = threading.Thread(target=request, args=(60, "large"))
+    large.start()
+    time.sleep(0.05)
+    small = threading.Thread(target=request, args=(10, "small"))
+    small.start()
+    time.sleep(0.05)
+
+    controller.release(cost)
+    large.join()
+    small.join()
+    assert admitted == ["small", "large"]
+
+
+def test_admission_metrics():
+    registry = CollectorRegistry()
+    metrics = GordoServerPrometheusMetrics(
+        info={"version": "0.60.0"}, registry=registry
+    )
+    controller = _controller(max_wait=0.01, metrics=metrics)
+    with controller.admit(100):
+        with pytest.raises(admission.Overloaded):
+            controller.acquire(1, "model-a")
+
+    assert (
+        registry.get_sample_value(
+            "gordo_server_admission_shed_total",
+            {"version": "0.60.0", "model": "model-a"},
+        )
+        == 1
+    )
+    assert (
+        registry.get_sample_value(
+            "gordo_server_admission_queue_depth", {"version": "0.60.0"}
+        )
+        == 0
+    )
@@ -1,8 +1,20 @@
 # -*- coding: utf-8 -*-
 
+import json
+
 import pytest
 import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from sklearn.multioutput import MultiOutputRegressor
+
+from gordo.machine.model.anomaly.diff import DiffBasedAnomalyDetector
 from gordo.server import utils as server_utils
+from gordo.server.views.anomaly import (
+    _ndjson_until_error,
+    iter_anomaly_dataframes,
+    make_anomaly_dataframe,
+)
 
 
 @pytest.mark.parametrize(
@@ -10,7 +22,7 @@ from gordo.server import utils as server_utils
     "data_size",
     [10, 1],
 )
-@pytest.mark.parametrize("resp_format", ("json", "parquet", None))
+@pytest.mark.parametrize("resp_format", ("json", "parquet", "arrow", None))
 def test_anomaly_prediction_endpoint(
     base_route,
     sensors_str,
@@ -40,6 +52,8 @@ def test_anomaly_prediction_endpoint(
     if resp_format in (None, "json"):
         assert "data" in resp.json
         data = server_utils.dataframe_from_dict(resp.json["data"])
+    elif resp_format == "arrow":
+        data = server_utils.dataframe_from_arrow_bytes(resp.data)
     else:
         data = server_utils.dataframe_from_parquet_bytes(resp.data)
 
@@ -129,3 +143,233 @@ def test_second_anomaly_prediction_endpoint_all_columns(
     assert "smooth-tag-anomaly-unscaled" in data
     assert "smooth-total-anomaly-scaled" in data
     assert "smooth-total-anomaly-unscaled" in data
+
+
+@pytest.mark.parametrize("stream", (False, True))
+def test_second_anomaly_prediction_endpoint_columns(
+    second_base_route, sensors_str, gordo_ml_server_client, stream
+):
+    """
+    Only the start, end and the columns asked for are given
+    """
+    data_to_post = {
+        "X": np.random.random(size=(10, len(sensors_str))).tolist(),
+        "y": np.random.random(size=(10, len(sensors_str))).tolist(),
+    }
+    endpoint = (
+        f"{second_base_route}/anomaly/prediction"
+        "?columns=tag-anomaly-scaled,smooth-total-anomaly-scaled"
+    )
+    if stream:
+        endpoint += "&stream=ndjson"
+
+    resp = gordo_ml_server_client.post(endpoint, json=data_to_post)
+    assert resp.status_code == 200
+    if stream:
+        columns = json.loads(resp.data.splitlines()[0])["columns"]
+        names = list(dict.fromkeys(column[0] for column in columns))
+    else:
+        data = server_utils.dataframe_from_dict(resp.json["data"])
+        names = list(data.columns.get_level_values(0).unique())
+    assert names == [
+        "start",
+        "end",
+        "tag-anomaly-scaled",
+        "smooth-total-anomaly-scaled",
+    ]
+
+
+def test_anomaly_prediction_endpoint_split_orient(
+    base_route, sensors_str, gordo_ml_server_client
+):
+    """
+    Anomaly responses can be given in the 'split' layout, and have the same content.
+    """
+    data_to_post = {
+        "X": np.random.random(size=(10, len(sensors_str))).tolist(),
+        "y": np.random.random(size=(10, len(sensors_str))).tolist(),
+    }
+    endpoint = f"{base_route}/anomaly/prediction"
+
+    resp = gordo_ml_server_client.post(f"{endpoint}?orient=split", json=data_to_post)
+    assert resp.status_code == 200
+    assert set(resp.json["data"].keys()) == {"index", "columns", "data"}
+    data_split = server_utils.dataframe_from_dict(resp.json["data"])
+
+    resp = gordo_ml_server_client.post(endpoint, json=data_to_post)
+    data = server_utils.dataframe_from_dict(resp.json["data"])
+
+    assert data_split.columns.tolist() == data.columns.tolist()
+    assert np.allclose(
+        data_split["total-anomaly-scaled"].values, data["total-anomaly-scaled"].values
+    )
+
+
+def test_anomaly_prediction_endpoint_epoch_timestamps(
+    base_route, sensors_str, gordo_ml_server_client
+):
+    """
+    With 'timestamps=epoch' the start and end times are given as milliseconds
+    since the Unix epoch, rather than as ISO 8601 strings.
+    """
+    index = pd.date_range("2020-01-01", periods=10, freq="10T", tz="UTC")
+    X = pd.DataFrame(
+        np.random.random(size=(10, len(sensors_str))), columns=sensors_str, index=index
+    )
+    data_to_post = {
+        "X": server_utils.dataframe_to_dict(X),
+        "y": server_utils.dataframe_to_dict(X),
+    }
+    resp = gordo_ml_server_client.post(
+        f"{base_route}/anomaly/prediction?timestamps=epoch", json=data_to_post
+    )
+    assert resp.status_code == 200
+
+    data = server_utils.dataframe_from_dict(resp.json["data"])
+    assert data["start"].values.ravel().tolist() == (index.asi8 // 1_000_000).tolist()
+
+
+@pytest.mark.parametrize("resp_format", ("json", "arrow"))
+def test_anomaly_prediction_endpoint_server_timing(
+    base_route, sensors_str, gordo_ml_server_client, resp_format
+):
+    """
+    The model output and the anomalies calculated from it are timed as separate
+    phases, and streamed responses have no serialization phase
+    """
+    X = np.random.random(size=(10, len(sensors_str))).tolist()
+    resp = gordo_ml_server_client.post(
+        f"{base_route}/anomaly/prediction?format={resp_format}", json={"X": X, "y": X}
+    )
+    assert resp.status_code == 200
+
+    entries = [
+        entry.split(";")[0] for entry in resp.headers["Server-Timing"].split(", ")
+    ]
+    assert "inference_s" in entries
+    assert "frame_s" in entries
+    assert ("serialize_s" in entries) == (resp_format == "json")
+
+
+def _read_ndjson(data: bytes) -> pd.DataFrame:
+    lines = [json.loads(line) for line in data.decode().splitlines()]
+    return server_utils.dataframe_from_dict(
+        {
+            "columns": lines[0]["columns"],
+            "index": [line["index"] for line in lines[1:]],
+            "data": [line["data"] for line in lines[1:]],
+        }
+    )
+
+
+def test_anomaly_prediction_endpoint_ndjson_stream(
+    base_route, sensors_str, gordo_ml_server_client, monkeypatch
+):
+    """
+    With 'stream=ndjson' the anomalies are calculated in chunks and streamed as
+    newline delimited JSON, with the same content as the full response.
+    """
+    monkeypatch.setitem(
+        gordo_ml_server_client.application.config, "STREAM_CHUNK_ROWS", 3
+    )
+    index = pd.date_range("2020-01-01", periods=10, freq="10T", tz="UTC")
+    X = pd.DataFrame(
+        np.random.random(size=(10, len(sensors_str))), columns=sensors_str, index=index
+    )
+    data_to_post = {
+        "X": server_utils.dataframe_to_dict(X),
+        "y": server_utils.dataframe_to_dict(X),
+    }
+    endpoint = f"{base_route}/anomaly/prediction"
+
+    resp = gordo_ml_server_client.post(f"{endpoint}?stream=ndjson", json=data_to_post)
+    assert resp.status_code == 200
+    assert resp.mimetype == "application/x-ndjson"
+    data_stream = _read_ndjson(resp.data)
+
+    resp = gordo_ml_server_client.post(endpoint, json=data_to_post)
+    data = server_utils.dataframe_from_dict(resp.json["data"])
+
+    assert data_stream.columns.tolist() == data.columns.tolist()
+    assert len(data_stream) == len(data)
+    assert np.allclose(
+        data_stream["total-anomaly-scaled"].values, data["total-anomaly-scaled"].values
+    )
+
+
+@pytest.mark.parametrize("model_offset", (0, 2))
+@pytest.mark.parametrize("chunk_rows", (1, 4, 100))
+def test_iter_anomaly_dataframes(model_offset, chunk_rows):
+    """
+    The anomalies calculated in chunks are the same as those calculated at once,
+    including the smoothed anomalies and with a model lookback.
+    """
+    X = pd.DataFrame(
+        np.random.random((30, 3)),
+        columns=["a", "b", "c"],
+        index=pd.date_range("2020-01-01", periods=30, freq="10T", tz="UTC"),
+    )
+    model = DiffBasedAnomalyDetector(
+        base_estimator=MultiOutputRegressor(LinearRegression()),
+        require_thresholds=False,
+        window=3,
+        smoothing_method="sma",
+    )
+    model.fit(X, X)
+
+    class OffsetModel:
+        """The model, with its output model_offset rows shorter than its input"""
+
+        def __getattr__(self, name):
+            return getattr(model, name)
+
+        def anomaly(self, X, y, frequency=None):
+            output = model.predict(X)[model_offset:]
+            return model.anomaly(X, y, frequency=frequency, model_output=output)
+
+    kwargs = dict(frequency=None, all_columns=True)
+    expected = make_anomaly_dataframe(OffsetModel(), X, X, **kwargs)
+    chunks = list(
+        iter_anomaly_dataframes(
+            OffsetModel(),
+            X,
+            X,
+            chunk_rows=chunk_rows,
+            model_offset=model_offset,
+            **kwargs,
+        )
+    )
+    result = pd.concat(chunks)
+    assert len(result) == len(expected) == 30 - model_offset
+    assert result.index.equals(expected.index)
+    assert np.allclose(result.values, expected.values, equal_nan=True)
+
+
+def test_iter_anomaly_dataframes_errors():
+    """
+    Errors of the model are raised on the first chunk, and ewma smoothed anomalies
+    aren't calculated in chunks
+    """
+    X = pd.DataFrame(np.random.random((10, 3)), columns=["a", "b", "c"])
+    model = DiffBasedAnomalyDetector(
+        base_estimator=MultiOutputRegressor(LinearRegression()), require_thresholds=True
+    )
+    model.fit(X, X)
+    with pytest.raises(AttributeError):
+        next(iter_anomaly_dataframes(model, X, X, frequency=None, chunk_rows=4))
+
+    model.require_thresholds = False
+    model.window, model.smoothing_method = 3, "ewma"
+    with pytest.raises(ValueError):
+        next(iter_anomaly_dataframes(model, X, X, frequency=None, chunk_rows=4))
+
+
+def test_ndjson_until_error():
+    def lines():
+        yield b'{"columns": ["a"]}\n'
+        raise ValueError("Failed")
+
+    assert list(_ndjson_until_error(lines())) == [
+        b'{"columns": ["a"]}\n',
+        b'{"error": "Failed"}\n',
+    ]
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+from gordo.server.artifacts import ArtifactIdentities, artifact_identity
+
+
+def test_artifact_identity(tmpdir):
+    path = os.path.join(tmpdir, "model.pkl")
+    assert artifact_identity(path) is None
+
+    with open(path, "wb") as f:
+        f.write(b"model")
+    stat = os.stat(path)
+    assert artifact_identity(path) == (stat.st_ino, stat.st_mtime_ns, 5)
+
+    # Replaced in place
+    os.utime(path, ns=(0, 0))
+    assert artifact_identity(path) == (stat.st_ino, 0, 5)
+
+
+def test_artifact_identities_interval(tmpdir):
+    path = os.path.join(tmpdir, "model.pkl")
+    identities = ArtifactIdentities(interval=60)
+    assert identities.get(path) is None
+
+    with open(path, "wb") as f:
+        f.write(b"model")
+    assert identities.get(path) is None
+
+    identities.clear()
+    assert identities.get(path) == artifact_identity(path)
+
+    # Checked every time without an interval
+    identities = ArtifactIdentities(interval=0)
+    os.utime(path, ns=(0, 0))
+    assert identities.get(path)[1] == 0
+    os.utime(path, ns=(1, 1))
+    assert identities.get(path)[1] == 1
+
+
+def test_artifact_identities_bounded(tmpdir):
+    identities = ArtifactIdentities(interval=0.01, max_entries=10)
+    for i in range(10):
+        identities.get(os.path.join(tmpdir, f"model-{i}"))
+    assert len(identities._identities) == 10
+
+    # Expired identities are dropped once it's full
+    identities._identities = {
+        path: (identity, checked_at - 1)
+        for path, (identity, checked_at) in identities._identities.items()
+    }
+    identities.get(os.path.join(tmpdir, "model-10"))
+    assert len(identities._identities) == 1
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+
+import pytest
+from flask import Flask, Response, jsonify, request
+
+from gordo.server import thread_pools
+from gordo.server.asgi import AsgiApp
+
+
+@pytest.fixture
+def asgi_app():
+    app = Flask(__name__)
+
+    @app.route("/echo", methods=["GET", "POST"])
+    def echo():
+        return jsonify(
+            {
+                "method": request.method,
+                "args": request.args.to_dict(),
+                "json": request.get_json(silent=True),
+                "header": request.headers.get("X-Gordo"),
+            }
+        )
+
+    @app.route("/stream")
+    def stream():
+        return Response((f"{i}\n" for i in range(3)), mimetype="text/plain")
+
+    asgi_app = AsgiApp(app, max_workers=2)
+    yield asgi_app
+    asgi_app.shutdown()
+
+
+def _request(asgi_app, path, method="GET", body=b"", query_string=b"", headers=()):
+    """
+    Send a request to the ASGI app, with its body in chunks of 4 bytes, and
+    return the messages the app sent.
+    """
+    chunks = [body[i : i + 4] for i in range(0, len(body), 4)] or [b""]
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": method,
+        "path": path,
+        "query_string": query_string,
+        "headers": [(b"host", b"localhost")] + list(headers),
+        "server": ("localhost", 5555),
+        "client": ("127.0.0.1", 1234),
+    }
+    sent = []
+
+    async def receive():
+        await asyncio.sleep(0)
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi_app(scope, receive, send))
+    return sent
+
+
+def test_asgi_get(asgi_app):
+    sent = _request(
+        asgi_app, "/echo", query_string=b"a=1", headers=[(b"x-gordo", b"yes")]
+    )
+    assert sent[0]["type"] == "http.response.start"
+    assert sent[0]["status"] == 200
+    assert (b"content-type", b"application/json") in sent[0]["headers"]
+    body = b"".join(message.get("body", b"") for message in sent[1:])
+    assert json.loads(body) == {
+        "method": "GET",
+        "args": {"a": "1"},
+        "json": None,
+        "header": "yes",
+    }
+    assert sent[-1] == {"type": "http.response.body", "body": b""}
+
+
+def test_asgi_post_in_chunks(asgi_app):
+    body = json.dumps({"X": [[1, 2, 3]]}).encode()
+    sent = _request(
+        asgi_app,
+        "/echo",
+        method="POST",
+        body=body,
+        headers=[
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    )
+    body = b"".join(message.get("body", b"") for message in sent[1:])
+    assert json.loads(body)["json"] == {"X": [[1, 2, 3]]}
+
+
+def test_asgi_streamed_response(asgi_app):
+    sent = _request(asgi_app, "/stream")
+    assert [message.get("body") for message in sent[1:]] == [
+        b"0\n",
+        b"1\n",
+        b"2\n",
+        b"",
+    ]
+
+
+def test_asgi_not_found(asgi_app):
+    assert _request(asgi_app, "/missing")[0]["status"] == 404
+
+
+def test_asgi_lifespan(asgi_app):
+    messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi_app({"type": "lifespan"}, receive, send))
+    assert [message["type"] for message in sent] == [
+        "lifespan.startup.complete",
+        "lifespan.shutdown.complete",
+    ]
+
+
+def test_asgi_default_max_workers(monkeypatch):
+    """
+    The thread pool has as many threads as the CPUs the process may use, given
+    its cgroup CPU quota, rather than the cores of the host
+    """
+    monkeypatch.setattr(thread_pools, "available_cpus", lambda: 3)
+    assert AsgiApp(Flask(__name__)).max_workers == 3
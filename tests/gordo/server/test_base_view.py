@@ -22,12 +22,35 @@ def test_empty_target_tag_list():
         assert view.target_tags == [test_tag]
 
 
+def test_prediction_endpoint_server_timing(base_route, sensors, gordo_ml_server_client):
+    """
+    The time spent in each phase of the prediction is in the Server-Timing header
+    """
+    X = np.random.random(size=(10, len(sensors))).tolist()
+    resp = gordo_ml_server_client.post(f"{base_route}/prediction", json={"X": X})
+    assert resp.status_code == 200
+
+    entries = [
+        entry.split(";")[0] for entry in resp.headers["Server-Timing"].split(", ")
+    ]
+    assert entries[0] == "request_walltime_s"
+    for phase in (
+        "model_load",
+        "metadata_load",
+        "parse",
+        "inference",
+        "frame",
+        "serialize",
+    ):
+        assert f"{phase}_s" in entries
+
+
 @pytest.mark.parametrize(
     "data_size,to_dict_arg",
     [(10, None), (1, None), (10, "records"), (10, "list"), (10, "dict")],
 )
-@pytest.mark.parametrize("resp_format", ("json", "parquet", None))
-@pytest.mark.parametrize("send_as_parquet", (True, False))
+@pytest.mark.parametrize("resp_format", ("json", "parquet", "arrow", None))
+@pytest.mark.parametrize("send_as", ("parquet", "arrow", "json"))
 def test_prediction_endpoint_post_ok(
     base_route,
     sensors,
@@ -36,7 +59,7 @@ def test_prediction_endpoint_post_ok(
     data_size,
     to_dict_arg,
     resp_format,
-    send_as_parquet,
+    send_as,
 ):
     """
     Test the expected successful data posts, by sending a variety of valid
@@ -52,11 +75,16 @@ def test_prediction_endpoint_post_ok(
     if resp_format is not None:
         endpoint += f"?format={resp_format}"
 
-    if send_as_parquet:
+    if send_as == "parquet":
         X = pd.DataFrame.from_dict(data_to_post)
         kwargs = dict(
             data={"X": (io.BytesIO(server_utils.dataframe_into_parquet_bytes(X)), "X")}
         )
+    elif send_as == "arrow":
+        X = pd.DataFrame.from_dict(data_to_post)
+        kwargs = dict(
+            data={"X": (io.BytesIO(server_utils.dataframe_into_arrow_bytes(X)), "X")}
+        )
     else:
         kwargs = dict(json={"X": data_to_post})
 
@@ -65,6 +93,9 @@ def test_prediction_endpoint_post_ok(
 
     if resp_format in (None, "json"):
         data = server_utils.dataframe_from_dict(resp.json["data"])
+    elif resp_format == "arrow":
+        assert resp.mimetype == server_utils.ARROW_STREAM_MIMETYPE
+        data = server_utils.dataframe_from_arrow_bytes(resp.data)
     else:
         data = server_utils.dataframe_from_parquet_bytes(resp.data)
 
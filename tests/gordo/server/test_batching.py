@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+import pytest
+import numpy as np
+from prometheus_client import CollectorRegistry
+
+from flask import Flask
+from sklearn.decomposition import PCA
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler
+
+from gordo.server.batching import BatchTimeout, MicroBatcher
+from gordo.server.prometheus import GordoServerPrometheusMetrics
+
+
+class CountingModel:
+    """
+    Model doubling its input, keeping track of the number of rows of each call
+    """
+
+    def __init__(self, lookback_window: int = 0):
+        self.lookback_window = lookback_window
+        self.calls = []
+
+    def predict(self, X):
+        self.calls.append(len(X))
+        if np.any(np.isnan(X)):
+            raise ValueError("NaN in input")
+        return np.asarray(X)[self.lookback_window :] * 2
+
+
+BATCHABLE = ("CountingModel",)
+
+
+def _concurrent_outputs(batcher, model, inputs):
+    outputs, errors = dict(), dict()
+
+    def run(i):
+        try:
+            outputs[i] = batcher.get_model_output(model, inputs[i], name="model-1")
+        except ValueError as exc:
+            errors[i] = exc
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(inputs))]
+    [thread.start() for thread in threads]  # type: ignore
+    [thread.join() for thread in threads]  # type: ignore
+    return outputs, errors
+
+
+@pytest.mark.parametrize("lookback_window", (0, 1))
+def test_micro_batcher_outputs(lookback_window):
+    """
+    Each request gets its own part of the output, and models which don't
+    give one row of output per input row are not batched.
+    """
+    model = CountingModel(lookback_window)
+    batcher = MicroBatcher(
+        max_wait_s=0.1, max_rows=1000, batchable_estimators=BATCHABLE
+    )
+    inputs = [np.full((i + 2, 4), i, dtype=float) for i in range(8)]
+
+    outputs, errors = _concurrent_outputs(batcher, model, inputs)
+
+    assert not errors
+    for i, X in enumerate(inputs):
+        assert np.allclose(outputs[i], X[lookback_window:] * 2)
+
+    assert model.calls[0] == sum(len(X) for X in inputs)
+    if lookback_window:
+        assert len(model.calls) == len(inputs) + 1
+        assert model in batcher._unbatchable
+    else:
+        assert len(model.calls) == 1
+
+
+def test_micro_batcher_errors_per_request():
+    """
+    A failing request doesn't fail the others in its batch
+    """
+    model = CountingModel()
+    batcher = MicroBatcher(
+        max_wait_s=0.1, max_rows=1000, batchable_estimators=BATCHABLE
+    )
+    inputs = [np.ones((2, 4)) for _ in range(4)]
+    inputs[1][0, 0] = np.nan
+
+    outputs, errors = _concurrent_outputs(batcher, model, inputs)
+
+    assert set(errors.keys()) == {1}
+    assert set(outputs.keys()) == {0, 2, 3}
+
+
+def test_micro_batcher_max_rows():
+    """
+    Requests of at least max_rows are never held back
+    """
+    model = CountingModel()
+    batcher = MicroBatcher(max_wait_s=10, max_rows=10, batchable_estimators=BATCHABLE)
+    output = batcher.get_model_output(model, np.ones((10, 4)))
+    assert np.allclose(output, 2)
+    assert model.calls == [10]
+
+
+def test_micro_batcher_metrics():
+    registry = CollectorRegistry()
+    metrics = GordoServerPrometheusMetrics(
+        info={"version": "0.60.0"}, registry=registry
+    )
+    batcher = MicroBatcher(
+        max_wait_s=0.001, max_rows=1000, metrics=metrics, batchable_estimators=BATCHABLE
+    )
+    batcher.get_model_output(CountingModel(), np.ones((5, 4)), name="model-1")
+
+    labels = {"version": "0.60.0", "model": "model-1"}
+    assert registry.get_sample_value("gordo_server_batch_size_rows_sum", labels) == 5
+    assert (
+        registry.get_sample_value("gordo_server_batch_queue_wait_seconds_count", labels)
+        == 1
+    )
+
+
+class FailingMetrics:
+    def model_label_values(self, name):
+        raise ValueError("Failed to record metrics")
+
+
+def test_micro_batcher_leader_failure():
+    """
+    Requests in a batch whose leader fails get its error, rather than waiting forever
+    """
+    model = CountingModel()
+    batcher = MicroBatcher(
+        max_wait_s=0.1,
+        max_rows=1000,
+        metrics=FailingMetrics(),
+        batchable_estimators=BATCHABLE,
+    )
+    inputs = [np.ones((2, 4)) for _ in range(4)]
+
+    outputs, errors = _concurrent_outputs(batcher, model, inputs)
+
+    assert set(errors.keys()) == {0, 1, 2, 3}
+    assert model.calls == []
+
+
+def test_micro_batcher_result_timeout():
+    """
+    Requests in a batch give up waiting for its output after max_result_wait_s
+    """
+    model = CountingModel()
+    batcher = MicroBatcher(
+        max_wait_s=0.2,
+        max_rows=1000,
+        max_result_wait_s=0.01,
+        batchable_estimators=BATCHABLE,
+    )
+    release = threading.Event()
+    batcher._run = lambda model, items, name: release.wait(5)
+    X = np.ones((2, 4))
+
+    leader = threading.Thread(target=batcher.get_model_output, args=(model, X))
+    leader.start()
+    time.sleep(0.05)
+    with pytest.raises(BatchTimeout) as exc_info:
+        batcher.get_model_output(model, X)
+    release.set()
+    leader.join()
+
+    with Flask(__name__).app_context():
+        response = exc_info.value.response()
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_micro_batcher_batchable_estimators():
+    """
+    Only models made of the batchable estimators are batched
+    """
+    batcher = MicroBatcher(max_wait_s=0.1, max_rows=1000)
+    assert batcher.is_batchable(Pipeline([("scaler", MinMaxScaler())]))
+    assert not batcher.is_batchable(
+        Pipeline([("scaler", MinMaxScaler()), ("pca", PCA())])
+    )
+
+    model = CountingModel()
+    batcher.get_model_output(model, np.ones((2, 4)))
+    assert model in batcher._unbatchable
+
+    outputs, errors = _concurrent_outputs(batcher, model, [np.ones((2, 4))] * 4)
+    assert not errors
+    assert model.calls == [2] * 5
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+import io
+
+import pytest
+import numpy as np
+
+from gordo.server import utils as server_utils
+from gordo.server.views import bulk
+
+
+@pytest.fixture
+def bulk_route(api_version, gordo_project):
+    return f"/gordo/{api_version}/{gordo_project}/_bulk"
+
+
+@pytest.mark.parametrize("send_as_parquet", (True, False))
+def test_bulk_anomaly_prediction(
+    bulk_route,
+    gordo_name,
+    second_gordo_name,
+    sensors_str,
+    gordo_ml_server_client,
+    send_as_parquet,
+):
+    """
+    A bulk anomaly request gives back the results of each model, and the errors
+    of the models which could not be processed.
+    """
+    gordo_names = (gordo_name, second_gordo_name)
+    data = {
+        name: {
+            "X": np.random.random(size=(10, len(sensors_str))).tolist(),
+            "y": np.random.random(size=(10, len(sensors_str))).tolist(),
+        }
+        for name in gordo_names
+    }
+    data["model-does-not-exist"] = data[gordo_name]
+
+    if send_as_parquet:
+        files = {
+            f"{name}/{key}": (
+                io.BytesIO(
+                    server_utils.dataframe_into_parquet_bytes(
+                        server_utils.dataframe_from_dict(values).rename(
+                            columns=dict(enumerate(sensors_str))
+                        )
+                    )
+                ),
+                key,
+            )
+            for name, model_data in data.items()
+            for key, values in model_data.items()
+        }
+        resp = gordo_ml_server_client.post(
+            f"{bulk_route}/anomaly/prediction", data=files
+        )
+    else:
+        resp = gordo_ml_server_client.post(
+            f"{bulk_route}/anomaly/prediction", json=data
+        )
+
+    assert resp.status_code == 200
+    assert set(resp.json["data"].keys()) == set(gordo_names)
+    for name in gordo_names:
+        df = server_utils.dataframe_from_dict(resp.json["data"][name])
+        assert "total-anomaly-scaled" in df
+        assert "smooth-tag-anomaly-scaled" not in df
+    assert resp.json["errors"]["model-does-not-exist"]["status-code"] == 404
+
+
+def test_bulk_prediction(bulk_route, gordo_name, sensors_str, gordo_ml_server_client):
+    data = {
+        gordo_name: {"X": np.random.random(size=(10, len(sensors_str))).tolist()},
+        "model-without-data": {},
+    }
+    resp = gordo_ml_server_client.post(f"{bulk_route}/prediction", json=data)
+
+    assert resp.status_code == 200
+    df = server_utils.dataframe_from_dict(resp.json["data"][gordo_name])
+    assert all(key in df for key in ("model-output", "model-input"))
+    assert resp.json["errors"]["model-without-data"]["status-code"] == 400
+
+
+def test_bulk_anomaly_prediction_requires_y(
+    bulk_route, gordo_name, sensors_str, gordo_ml_server_client
+):
+    data = {gordo_name: {"X": np.random.random(size=(10, len(sensors_str))).tolist()}}
+    resp = gordo_ml_server_client.post(f"{bulk_route}/anomaly/prediction", json=data)
+
+    assert resp.status_code == 200
+    assert resp.json["data"] == {}
+    assert resp.json["errors"][gordo_name]["status-code"] == 400
+
+
+@pytest.mark.parametrize("data", ([1, 2, 3], {}))
+def test_bulk_prediction_bad_request(bulk_route, gordo_ml_server_client, data):
+    resp = gordo_ml_server_client.post(f"{bulk_route}/prediction", json=data)
+    assert resp.status_code == 400
+
+
+def test_bulk_executor_per_process(monkeypatch):
+    """
+    A forked worker creates its own thread pool, rather than using the one of
+    the process it was forked from, whose threads it doesn't have.
+    """
+    executor = bulk._get_executor(max_workers=2)
+    assert bulk._get_executor(max_workers=2) is executor
+
+    monkeypatch.setattr(bulk.os, "getpid", lambda: -1)
+    assert bulk._get_executor(max_workers=2) is not executor
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+import gzip
+import json
+import zlib
+
+import pytest
+from flask import Flask, Response, jsonify
+from prometheus_client import CollectorRegistry
+
+from gordo.server import compression
+from gordo.server.prometheus import GordoServerPrometheusMetrics
+
+
+PAYLOAD = {"data": list(range(1000))}
+
+
+def _app(metrics=None, **config) -> Flask:
+    app = Flask(__name__)
+    app.config.update(
+        RESPONSE_COMPRESSION=True,
+        RESPONSE_COMPRESSION_MIN_BYTES=1024,
+        RESPONSE_COMPRESSION_GZIP_LEVEL=6,
+        RESPONSE_COMPRESSION_ZSTD_LEVEL=3,
+    )
+    app.config.update(config)
+
+    @app.route("/large")
+    def large():
+        return jsonify(PAYLOAD)
+
+    @app.route("/small")
+    def small():
+        return jsonify({"data": 1})
+
+    @app.route("/stream")
+    def stream():
+        lines = (json.dumps({"row": i}) + "\n" for i in range(100))
+        return Response(lines, mimetype="application/x-ndjson")
+
+    compression.init_app(app, metrics=metrics)
+    return app
+
+
+@pytest.fixture
+def gzip_only(monkeypatch):
+    monkeypatch.setattr(compression, "zstandard", None)
+
+
+def test_compress_gzip(gzip_only):
+    client = _app().test_client()
+    resp = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in resp.headers["Vary"]
+    assert json.loads(gzip.decompress(resp.data)) == PAYLOAD
+
+
+@pytest.mark.parametrize("path", ("/large", "/small"))
+@pytest.mark.parametrize("headers", ({}, {"Accept-Encoding": "br"}))
+def test_compress_not_accepted(gzip_only, path, headers):
+    resp = _app().test_client().get(path, headers=headers)
+    assert "Content-Encoding" not in resp.headers
+    assert resp.json is not None
+
+
+def test_compress_min_bytes(gzip_only):
+    resp = _app().test_client().get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in resp.headers
+
+
+def test_compress_disabled(gzip_only):
+    client = _app(RESPONSE_COMPRESSION=False).test_client()
+    resp = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in resp.headers
+
+
+def test_compress_stream(gzip_only):
+    client = _app().test_client()
+    resp = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in resp.headers
+    lines = gzip.decompress(resp.data).decode().splitlines()
+    assert [json.loads(line)["row"] for line in lines] == list(range(100))
+
+
+def test_compress_stream_flushes_chunks():
+    chunks = [b"first\n", b"second\n"]
+    compressed = compression.compress_stream(iter(chunks), "gzip", 6)
+    decompressor = zlib.decompressobj(16 + 15)
+    assert decompressor.decompress(next(compressed)) == b"first\n"
+    assert decompressor.decompress(next(compressed)) == b"second\n"
+
+
+def test_compress_zstd():
+    zstandard = pytest.importorskip("zstandard")
+    client = _app().test_client()
+    resp = client.get("/large", headers={"Accept-Encoding": "gzip, zstd"})
+    assert resp.headers["Content-Encoding"] == "zstd"
+    data = zstandard.ZstdDecompressor().decompress(resp.data)
+    assert json.loads(data) == PAYLOAD
+
+
+def test_compress_metrics(gzip_only):
+    registry = CollectorRegistry()
+    metrics = GordoServerPrometheusMetrics(
+        info={"version": "0.60.0"}, registry=registry
+    )
+    client = _app(metrics=metrics).test_client()
+    resp = client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    labels = {"version": "0.60.0", "encoding": "gzip"}
+    assert registry.get_sample_value(
+        "gordo_server_response_bytes_total", labels
+    ) == len(gzip.decompress(resp.data))
+    assert registry.get_sample_value(
+        "gordo_server_response_compressed_bytes_total", labels
+    ) == len(resp.data)
@@ -13,6 +13,8 @@ from unittest.mock import patch, MagicMock
 from gordo.server.server import run_cmd
 from gordo import serializer, __version__
 from gordo.server import server
+from gordo.server import listings
+from gordo.server import utils as server_utils
 
 from prometheus_client.registry import CollectorRegistry
 
@@ -84,6 +86,89 @@ def test_download_model(api_version, gordo_project, gordo_name, gordo_ml_server_
     assert resp.status_code == 404
 
 
+def test_download_model_range(
+    api_version, gordo_project, gordo_name, gordo_ml_server_client
+):
+    """
+    The model artifact is sent as it is stored, and can be downloaded in ranges
+    """
+    route = f"/gordo/{api_version}/{gordo_project}/{gordo_name}/download-model"
+    serialized_model = gordo_ml_server_client.get(route).get_data()
+
+    resp = gordo_ml_server_client.get(route, headers={"Range": "bytes=10-"})
+    assert resp.status_code == 206
+    assert resp.get_data() == serialized_model[10:]
+
+
+@pytest.mark.parametrize("route", ("metadata", "download-model"))
+def test_conditional_get_model(base_route, gordo_ml_server_client, route):
+    """
+    Model resources have an ETag, and aren't sent again when the client has them
+    """
+    resp = gordo_ml_server_client.get(f"{base_route}/{route}")
+    assert resp.status_code == 200
+    etag = resp.headers["ETag"]
+    assert "no-cache" in resp.headers["Cache-Control"]
+
+    # Same resource, same ETag
+    assert gordo_ml_server_client.get(f"{base_route}/{route}").headers["ETag"] == etag
+
+    resp = gordo_ml_server_client.get(
+        f"{base_route}/{route}", headers={"If-None-Match": etag}
+    )
+    assert resp.status_code == 304
+    assert resp.data == b""
+    assert resp.headers["ETag"] == etag
+
+    # A stale ETag gets the full response
+    resp = gordo_ml_server_client.get(
+        f"{base_route}/{route}", headers={"If-None-Match": 'W/"stale"'}
+    )
+    assert resp.status_code == 200
+
+
+def test_conditional_get_revisions(tmpdir):
+    """
+    The ETags of listings change when their directory changes, and differ by revision
+    """
+    for revision in ("1234", "2345"):
+        os.mkdir(os.path.join(tmpdir, revision))
+    model_dir = os.path.join(tmpdir, "1234")
+
+    with tu.temp_env_vars(MODEL_COLLECTION_DIR=model_dir):
+        app = server.build_app({"ENABLE_PROMETHEUS": False})
+        app.testing = True
+        client = app.test_client()
+
+        for route in ("models", "revisions", "expected-models"):
+            resp = client.get(f"/gordo/v0/test-project/{route}")
+            etag = resp.headers["ETag"]
+            resp = client.get(
+                f"/gordo/v0/test-project/{route}", headers={"If-None-Match": etag}
+            )
+            assert resp.status_code == 304
+
+            # Also revalidated when the revision is explicitly requested
+            resp = client.get(
+                f"/gordo/v0/test-project/{route}?revision=2345",
+                headers={"If-None-Match": etag},
+            )
+            assert resp.status_code == 200
+            assert resp.headers["ETag"] != etag
+            assert resp.headers["Cache-Control"] == "no-cache"
+
+        etag = client.get("/gordo/v0/test-project/models").headers["ETag"]
+        os.mkdir(os.path.join(model_dir, "new-model"))
+        os.utime(model_dir, ns=(0, 0))
+        # Seen once the listings are refreshed
+        app.extensions[listings.EXTENSION_NAME].refresh()
+        resp = client.get(
+            "/gordo/v0/test-project/models", headers={"If-None-Match": etag}
+        )
+        assert resp.status_code == 200
+        assert resp.json["models"] == ["new-model"]
+
+
 def test_run_cmd(monkeypatch):
     """
     Test that execution error catchings work as expected
@@ -130,6 +215,8 @@ def test_run_server_gthread():
                 "/dev/shm",
                 "--workers",
                 "2",
+                "--config",
+                "python:gordo.server.gunicorn_config",
                 "--threads",
                 "8",
                 "gordo.server.server:build_app()",
@@ -167,6 +254,8 @@ def test_run_server_gevent():
                 "/dev/shm",
                 "--workers",
                 "2",
+                "--config",
+                "python:gordo.server.gunicorn_config",
                 "--worker-connections",
                 "50",
                 "gordo.server.server:build_app()",
@@ -174,6 +263,71 @@ def test_run_server_gevent():
         )
 
 
+def test_run_server_preload(monkeypatch):
+    monkeypatch.setenv("PRELOAD_MODELS", "false")
+    monkeypatch.delenv("SERVER_THREAD_POOLS", raising=False)
+    monkeypatch.delenv("TF_INTRA_OP_THREADS", raising=False)
+    monkeypatch.delenv("TF_INTER_OP_THREADS", raising=False)
+    monkeypatch.setattr(server.thread_pools, "available_cpus", lambda: 8)
+    with patch(
+        "gordo.server.server.run_cmd", MagicMock(return_value=None, autospec=True)
+    ) as m:
+        server.run_server("127.0.0.1", 9000, 2, "debug", threads=2, preload=True)
+        cmd = m.call_args[0][0]
+        # The main process sizes TensorFlow as each of the workers would
+        assert cmd[-8:-4] == [
+            "--env",
+            "TF_INTRA_OP_THREADS=4",
+            "--env",
+            "TF_INTER_OP_THREADS=2",
+        ]
+        assert cmd[-4:] == [
+            "--env",
+            "PRELOAD_MODELS=true",
+            "--preload",
+            "gordo.server.server:build_app()",
+        ]
+    # Only set for gunicorn, not in the calling process
+    assert os.environ["PRELOAD_MODELS"] == "false"
+
+
+def test_run_server_asgi():
+    with patch(
+        "gordo.server.server.run_cmd", MagicMock(return_value=None, autospec=True)
+    ) as m:
+        server.run_server(
+            "127.0.0.1", 9000, 2, "debug", worker_connections=50, threads=8, asgi=True
+        )
+        cmd = m.call_args[0][0]
+        assert cmd[cmd.index("--worker-class") + 1] == "uvicorn.workers.UvicornWorker"
+        assert "--threads" not in cmd
+        assert cmd[-1] == "gordo.server.asgi:build_asgi_app()"
+
+
+def test_build_app_preload_models(
+    model_collection_directory, trained_model_directories, gordo_name
+):
+    """
+    With PRELOAD_MODELS the expected models are loaded when the app is built,
+    and missing models don't stop the app from being built.
+    """
+    with tu.temp_env_vars(
+        MODEL_COLLECTION_DIR=model_collection_directory,
+        EXPECTED_MODELS=json.dumps([gordo_name, "model-does-not-exist"]),
+    ):
+        try:
+            with patch.object(server_utils, "_warm_up_model") as warm_up:
+                server.build_app({"ENABLE_PROMETHEUS": False, "PRELOAD_MODELS": True})
+                # Only run by the workers, after forking
+                assert not warm_up.called
+                server_utils.warm_up_models()
+            assert warm_up.call_args[0][2] == gordo_name
+            assert (model_collection_directory, gordo_name) in server_utils.model_cache
+            assert server_utils.model_cache.stats()["pinned"] == [gordo_name]
+        finally:
+            server_utils.model_cache.clear()
+
+
 @pytest.mark.parametrize("revisions", [("1234", "2345", "3456"), ("1234",)])
 def test_list_revisions(tmpdir, revisions: List[str]):
     """
@@ -299,6 +453,21 @@ def test_models_by_revision_list_view(caplog, tmpdir, revision_to_models):
             }
 
 
+def test_request_revision_not_a_directory(tmpdir):
+    """
+    A file next to the revisions is not a revision
+    """
+    os.mkdir(os.path.join(tmpdir, "1234"))
+    tmpdir.join("catalog.parquet").write("")
+
+    with tu.temp_env_vars(MODEL_COLLECTION_DIR=os.path.join(tmpdir, "1234")):
+        app = server.build_app({"ENABLE_PROMETHEUS": False})
+        app.testing = True
+        client = app.test_client()
+        resp = client.get("/gordo/v0/test-project/models?revision=catalog.parquet")
+        assert resp.status_code == 410
+
+
 @pytest.mark.parametrize("revisions", (("123", "456"), ("123",)))
 def test_request_specific_revision(trained_model_directory, tmpdir, revisions):
 
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+from unittest.mock import patch
+
+from gordo.server import listings
+
+
+def test_list_directory(tmpdir):
+    os.mkdir(os.path.join(tmpdir, "model-1"))
+    tmpdir.join("catalog.parquet").write("")
+    listing = listings.list_directory(str(tmpdir))
+    assert sorted(listing.names) == ["catalog.parquet", "model-1"]
+    assert listing.directories == {"model-1"}
+    assert listing.version == str(os.stat(tmpdir).st_mtime_ns)
+
+    assert listings.list_directory(os.path.join(tmpdir, "does-not-exist")) is None
+
+
+def test_listings_served_from_memory(tmpdir):
+    index = listings.DirectoryListings(interval=60)
+    os.mkdir(os.path.join(tmpdir, "model-1"))
+    assert index.get(str(tmpdir)).names == ("model-1",)
+
+    with patch.object(os, "scandir") as scandir:
+        assert index.get(os.path.join(tmpdir, "..", tmpdir.basename)).names == (
+            "model-1",
+        )
+        index.refresh()
+    assert not scandir.called
+    index.stop()
+
+
+def test_listings_refresh(tmpdir):
+    index = listings.DirectoryListings(interval=60)
+    missing = os.path.join(tmpdir, "revision")
+    assert index.get(str(tmpdir)).names == ()
+    assert index.get(missing) is None
+
+    os.mkdir(missing)
+    os.mkdir(os.path.join(missing, "model-1"))
+    os.utime(tmpdir, ns=(0, 0))
+    assert index.get(str(tmpdir)).names == ()
+
+    index.refresh()
+    assert index.get(str(tmpdir)).names == ("revision",)
+    assert index.get(str(tmpdir)).version == "0"
+    assert index.get(missing).names == ("model-1",)
+    index.stop()
+
+
+def test_listings_watcher(tmpdir):
+    index = listings.DirectoryListings(interval=0.01)
+    assert index.get(str(tmpdir)).names == ()
+    os.mkdir(os.path.join(tmpdir, "model-1"))
+    os.utime(tmpdir, ns=(0, 0))
+
+    deadline = time.monotonic() + 5
+    while index.get(str(tmpdir)).names == () and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert index.get(str(tmpdir)).names == ("model-1",)
+    index.stop()
+
+
+def test_listings_contains_lists_again_when_missing(tmpdir):
+    index = listings.DirectoryListings(interval=60)
+    assert not index.contains(str(tmpdir), "1234")
+
+    # A new revision is found without waiting for the watcher
+    os.mkdir(os.path.join(tmpdir, "1234"))
+    os.utime(tmpdir, ns=(0, 0))
+    assert index.contains(str(tmpdir), "1234")
+    index.stop()
+
+
+def test_listings_disabled(tmpdir):
+    index = listings.DirectoryListings(interval=0)
+    assert index.get(str(tmpdir)).names == ()
+    os.mkdir(os.path.join(tmpdir, "model-1"))
+    assert index.get(str(tmpdir)).names == ("model-1",)
+    assert index.contains(str(tmpdir), "model-1")
+    assert index._watcher is None
+
+
+def test_listings_contains_directories_only(tmpdir):
+    index = listings.DirectoryListings(interval=60)
+    tmpdir.join("1234").write("")
+    assert index.contains(str(tmpdir), "1234")
+    assert not index.contains(str(tmpdir), "1234", is_dir=True)
+
+    os.mkdir(os.path.join(tmpdir, "2345"))
+    os.utime(tmpdir, ns=(0, 0))
+    assert index.contains(str(tmpdir), "2345", is_dir=True)
+    index.stop()
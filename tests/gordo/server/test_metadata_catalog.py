@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+
+from unittest.mock import patch
+
+import pytest
+
+from gordo.server import artifacts, metadata_catalog, server
+from gordo.server.artifacts import ArtifactIdentities
+from gordo.server import utils as server_utils
+import tests.utils as tu
+
+
+@pytest.fixture
+def collection_dir(tmpdir):
+    """
+    Model collection directory of models which only have metadata
+    """
+    for name in ("model-a", "model-b"):
+        model_dir = tmpdir.mkdir(name)
+        model_dir.join("metadata.json").write(
+            json.dumps({"name": name, "dataset": {"resolution": "10T"}})
+        )
+    tmpdir.mkdir("model-without-metadata")
+    yield str(tmpdir)
+    metadata_catalog._catalogs.pop(str(tmpdir), None)
+
+
+def test_metadata_catalog(collection_dir):
+    assert metadata_catalog.get_catalog(collection_dir) is None
+    metadata_catalog._catalogs.clear()
+    artifacts.identities.clear()
+
+    path = metadata_catalog.write_catalog(collection_dir)
+    assert os.path.basename(path) == metadata_catalog.CATALOG_FILENAME
+
+    catalog = metadata_catalog.get_catalog(collection_dir)
+    assert catalog.names == ["model-a", "model-b"]
+    assert catalog.get("model-b") == {
+        "name": "model-b",
+        "dataset": {"resolution": "10T"},
+    }
+    assert "model-without-metadata" not in catalog
+    with pytest.raises(KeyError):
+        catalog.get("model-without-metadata")
+
+    # Opened once per version of the catalog
+    assert metadata_catalog.get_catalog(collection_dir) is catalog
+
+    # Each caller gets its own copy
+    metadata = catalog.get("model-b")
+    metadata["dataset"]["resolution"] = "1H"
+    assert catalog.get("model-b")["dataset"] == {"resolution": "10T"}
+
+
+def test_metadata_catalog_replaced(collection_dir, monkeypatch):
+    monkeypatch.setattr(artifacts, "identities", ArtifactIdentities(interval=0))
+    assert metadata_catalog.get_catalog(collection_dir) is None
+
+    # Written after the revision was first served
+    metadata_catalog.write_catalog(collection_dir, names=["model-a"])
+    catalog = metadata_catalog.get_catalog(collection_dir)
+    assert catalog.names == ["model-a"]
+    assert metadata_catalog.get_catalog(collection_dir) is catalog
+
+    # Replaced in place
+    metadata_catalog.write_catalog(collection_dir)
+    assert metadata_catalog.get_catalog(collection_dir).names == ["model-a", "model-b"]
+
+
+def test_metadata_catalog_checked_on_interval(collection_dir, monkeypatch):
+    monkeypatch.setattr(artifacts, "identities", ArtifactIdentities(interval=60))
+    assert metadata_catalog.get_catalog(collection_dir) is None
+    metadata_catalog.write_catalog(collection_dir)
+    assert metadata_catalog.get_catalog(collection_dir) is None
+
+    # Once the interval has passed
+    monkeypatch.setattr(artifacts, "identities", ArtifactIdentities(interval=0))
+    assert metadata_catalog.get_catalog(collection_dir).names == ["model-a", "model-b"]
+
+
+def test_metadata_catalog_loses_to_newer_metadata(collection_dir, monkeypatch):
+    """
+    A model whose metadata.json changed since the catalog was written is served
+    with the metadata of the file
+    """
+    monkeypatch.setattr(artifacts, "identities", ArtifactIdentities(interval=0))
+    metadata_catalog.write_catalog(collection_dir)
+
+    # Rebuilt after the catalog was written
+    with open(os.path.join(collection_dir, "model-a", "metadata.json"), "w") as f:
+        json.dump({"name": "model-a", "dataset": {"resolution": "1H"}}, f)
+
+    metadata = server_utils.load_metadata(collection_dir, "model-a")
+    assert metadata["dataset"] == {"resolution": "1H"}
+
+
+def test_server_uses_metadata_catalog(collection_dir):
+    metadata_catalog.write_catalog(collection_dir)
+
+    # Read from the catalog, not from the model's metadata.json
+    with patch.object(
+        server_utils.serializer, "load_metadata", side_effect=AssertionError
+    ):
+        metadata = server_utils.load_metadata(collection_dir, "model-a")
+    assert metadata["name"] == "model-a"
+
+    with tu.temp_env_vars(MODEL_COLLECTION_DIR=collection_dir):
+        app = server.build_app({"ENABLE_PROMETHEUS": False})
+        app.testing = True
+        client = app.test_client()
+
+        # Listed from the directory, as models may be added without a new catalog
+        resp = client.get("/gordo/v0/test-project/models")
+        assert sorted(resp.json["models"]) == [
+            "model-a",
+            "model-b",
+            "model-without-metadata",
+        ]
+
+        resp = client.get("/gordo/v0/test-project/model-a/metadata")
+        assert resp.json["metadata"]["name"] == "model-a"
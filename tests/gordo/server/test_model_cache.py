@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+import pytest
+from prometheus_client import CollectorRegistry
+
+from gordo.server.model_cache import ModelCache, model_footprint
+from gordo.server.prometheus import GordoServerPrometheusMetrics
+
+
+SIZES = {"model-a": 10, "model-b": 20, "model-c": 30, "model-huge": 1000}
+
+
+def _loader(directory, name):
+    return f"{directory}/{name}"
+
+
+def _footprint(directory, name):
+    return SIZES[name]
+
+
+def _cache(**kwargs) -> ModelCache:
+    return ModelCache(footprint=_footprint, **kwargs)
+
+
+def _cached_names(cache):
+    return {name for name in SIZES if ("dir", name) in cache}
+
+
+def test_model_cache_byte_budget():
+    cache = _cache(max_bytes=50)
+    assert cache.get("dir", "model-a", _loader) == "dir/model-a"
+    cache.get("dir", "model-b", _loader)
+    assert _cached_names(cache) == {"model-a", "model-b"}
+
+    # Evicts the least recently used model until model-c fits
+    cache.get("dir", "model-a", _loader)
+    cache.get("dir", "model-c", _loader)
+    assert _cached_names(cache) == {"model-a", "model-c"}
+
+    # Too large for the budget, loaded but not cached, without evicting anything
+    assert cache.get("dir", "model-huge", _loader) == "dir/model-huge"
+    assert _cached_names(cache) == {"model-a", "model-c"}
+
+    stats = cache.stats()
+    assert stats["bytes"] == 40
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 4, 1)
+
+
+def test_model_cache_lfu():
+    cache = _cache(max_models=2, policy="lfu")
+    for name in ("model-a", "model-a", "model-b", "model-c"):
+        cache.get("dir", name, _loader)
+    assert _cached_names(cache) == {"model-a", "model-c"}
+
+
+def test_model_cache_pinning():
+    cache = _cache(max_models=1)
+    cache.pin("dir", "model-a")
+    cache.get("dir", "model-a", _loader)
+
+    # Nothing can be evicted to make room
+    cache.get("dir", "model-b", _loader)
+    assert _cached_names(cache) == {"model-a"}
+
+    cache.unpin("dir", "model-a")
+    cache.get("dir", "model-b", _loader)
+    assert _cached_names(cache) == {"model-b"}
+
+
+def test_model_cache_no_room_beside_pinned():
+    cache = _cache(max_bytes=45)
+    cache.pin("dir", "model-b")
+    for name in ("model-b", "model-a"):
+        cache.get("dir", name, _loader)
+
+    # Doesn't fit beside the pinned model, so model-a is kept
+    assert cache.get("dir", "model-c", _loader) == "dir/model-c"
+    assert _cached_names(cache) == {"model-a", "model-b"}
+    assert cache.stats()["evictions"] == 0
+
+
+def test_model_cache_bad_policy():
+    with pytest.raises(ValueError):
+        ModelCache(policy="fifo")
+
+
+def test_model_cache_metrics():
+    registry = CollectorRegistry()
+    metrics = GordoServerPrometheusMetrics(
+        info={"version": "0.60.0"}, registry=registry
+    )
+    cache = _cache(max_models=1, metrics=metrics)
+    for name in ("model-a", "model-a", "model-b"):
+        cache.get("dir", name, _loader)
+
+    labels = {"version": "0.60.0", "model": "model-a"}
+    assert registry.get_sample_value("gordo_server_model_cache_hits_total", labels) == 1
+    assert (
+        registry.get_sample_value("gordo_server_model_cache_misses_total", labels) == 1
+    )
+    assert (
+        registry.get_sample_value("gordo_server_model_cache_evictions_total", labels)
+        == 1
+    )
+    assert registry.get_sample_value("gordo_server_model_load_seconds_count", labels)
+
+
+def test_model_footprint(tmpdir):
+    tmpdir.mkdir("model-a").join("model.pkl").write_binary(b"0" * 100)
+    assert model_footprint(str(tmpdir), "model-a") == 100
+
+
+@pytest.mark.parametrize("fail", (False, True))
+def test_model_cache_single_flight(fail):
+    """
+    Concurrent misses of the same model load it once, and share its outcome
+    """
+    cache = _cache()
+    started, release = threading.Event(), threading.Event()
+    loads = []
+
+    def slow_loader(directory, name):
+        loads.append(name)
+        started.set()
+        release.wait()
+        if fail:
+            raise FileNotFoundError(name)
+        return _loader(directory, name)
+
+    results, errors = [], []
+
+    def get():
+        try:
+            results.append(cache.get("dir", "model-a", slow_loader))
+        except FileNotFoundError as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    threads[0].start()
+    started.wait()
+    [thread.start() for thread in threads[1:]]  # type: ignore
+    time.sleep(0.05)
+    release.set()
+    [thread.join() for thread in threads]  # type: ignore
+
+    assert loads == ["model-a"]
+    if fail:
+        assert len(errors) == 8
+        assert ("dir", "model-a") not in cache
+    else:
+        assert results == ["dir/model-a"] * 8
+
+
+def test_model_cache_version():
+    cache = _cache(max_models=2)
+    loads = []
+
+    def loader(directory, name):
+        loads.append(name)
+        return f"{directory}/{name}/{len(loads)}"
+
+    assert cache.get("dir", "model-a", loader, version=1) == "dir/model-a/1"
+    assert cache.get("dir", "model-a", loader, version=1) == "dir/model-a/1"
+
+    # Replaced since it was cached
+    assert cache.get("dir", "model-a", loader, version=2) == "dir/model-a/2"
+    assert cache.get("dir", "model-a", loader, version=2) == "dir/model-a/2"
+
+    stats = cache.stats()
+    assert (stats["models"], stats["bytes"]) == (1, SIZES["model-a"])
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 2, 1)
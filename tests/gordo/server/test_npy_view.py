@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+import io
+
+from unittest.mock import patch
+
+import pytest
+import numpy as np
+
+from gordo.server import batching
+from gordo.server import utils as server_utils
+
+
+def _load_arrays(data: bytes):
+    buf = io.BytesIO(data)
+    arrays = []
+    while buf.tell() < len(data):
+        arrays.append(np.load(buf))
+    return arrays
+
+
+@pytest.mark.parametrize("raw", (False, True))
+def test_npy_prediction(base_route, sensors_str, gordo_ml_server_client, raw):
+    """
+    The model output of the NumPy route is the same as that of the JSON route
+    """
+    X = np.random.random(size=(10, len(sensors_str))).astype(np.float32)
+    if raw:
+        resp = gordo_ml_server_client.post(
+            f"{base_route}/prediction/npy",
+            data=X.tobytes(),
+            content_type="application/octet-stream",
+            headers={"X-Gordo-Shape": f"{X.shape[0]},{X.shape[1]}"},
+        )
+    else:
+        resp = gordo_ml_server_client.post(
+            f"{base_route}/prediction/npy",
+            data=server_utils.arrays_into_npy_bytes([X]),
+            content_type="application/x-npy",
+        )
+    assert resp.status_code == 200
+    assert resp.mimetype == "application/x-npy"
+    (output,) = _load_arrays(resp.data)
+
+    resp = gordo_ml_server_client.post(
+        f"{base_route}/prediction", json={"X": X.tolist()}
+    )
+    data = server_utils.dataframe_from_dict(resp.json["data"])
+    assert np.allclose(output, data["model-output"].values, atol=1e-5)
+
+
+def test_npy_anomaly(base_route, sensors_str, gordo_ml_server_client):
+    X = np.random.random(size=(10, len(sensors_str)))
+    y = np.random.random(size=(10, len(sensors_str)))
+    resp = gordo_ml_server_client.post(
+        f"{base_route}/anomaly/prediction/npy",
+        data=server_utils.arrays_into_npy_bytes([X, y]),
+        content_type="application/x-npy",
+    )
+    assert resp.status_code == 200
+    names = resp.headers["X-Gordo-Arrays"].split(",")
+    assert "start" not in names
+    arrays = dict(zip(names, _load_arrays(resp.data)))
+
+    resp = gordo_ml_server_client.post(
+        f"{base_route}/anomaly/prediction", json={"X": X.tolist(), "y": y.tolist()}
+    )
+    data = server_utils.dataframe_from_dict(resp.json["data"])
+    for name in ("model-output", "tag-anomaly-scaled", "total-anomaly-scaled"):
+        assert np.allclose(arrays[name], data[name].values.squeeze())
+
+
+@pytest.mark.parametrize(
+    "data,content_type,headers",
+    (
+        (b"not-npy", "application/x-npy", {}),
+        (np.zeros(10, dtype=np.float32).tobytes(), "application/octet-stream", {}),
+        (
+            np.zeros(10, dtype=np.float32).tobytes(),
+            "application/octet-stream",
+            {"X-Gordo-Shape": "5,2"},
+        ),
+        (
+            server_utils.arrays_into_npy_bytes([np.zeros((5, 1))]),
+            "application/x-npy",
+            {},
+        ),
+        (server_utils.arrays_into_npy_bytes([np.zeros((5, 1))]), "text/plain", {}),
+    ),
+)
+def test_npy_bad_request(
+    base_route, gordo_ml_server_client, data, content_type, headers
+):
+    """
+    Unreadable arrays, or arrays not of the shape of the model's tags, are bad requests
+    """
+    resp = gordo_ml_server_client.post(
+        f"{base_route}/prediction/npy",
+        data=data,
+        content_type=content_type,
+        headers=headers,
+    )
+    assert resp.status_code == 400
+    assert "message" in resp.json
+
+
+def test_npy_prediction_unexpected_error(
+    base_route, sensors_str, gordo_ml_server_client
+):
+    """
+    Only the details of ValueErrors are given back to the client
+    """
+    X = np.random.random(size=(10, len(sensors_str)))
+    with patch.object(
+        batching, "get_model_output", side_effect=RuntimeError("/secret/path")
+    ):
+        resp = gordo_ml_server_client.post(
+            f"{base_route}/prediction/npy",
+            data=server_utils.arrays_into_npy_bytes([X]),
+            content_type="application/x-npy",
+        )
+    assert resp.status_code == 400
+    assert "secret" not in resp.json["message"]
+
+    with patch.object(
+        batching, "get_model_output", side_effect=ValueError("NaN in input")
+    ):
+        resp = gordo_ml_server_client.post(
+            f"{base_route}/prediction/npy",
+            data=server_utils.arrays_into_npy_bytes([X]),
+            content_type="application/x-npy",
+        )
+    assert resp.status_code == 400
+    assert resp.json["message"] == "ValueError: NaN in input"
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+from flask import Flask, g, jsonify, request
+from prometheus_client import CollectorRegistry
+
+from gordo.server import artifacts, result_cache
+from gordo.server.artifacts import ArtifactIdentities
+from gordo.server.prometheus import GordoServerPrometheusMetrics
+from gordo.server.result_cache import ResultCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_result_cache_lru_byte_budget():
+    cache = ResultCache(max_bytes=10, ttl=60)
+    cache.put("a", (b"1234", "application/json"))
+    cache.put("b", (b"1234", "application/json"))
+    assert cache.get("a") == (b"1234", "application/json")
+
+    # Evicts the least recently used result, 'b', to fit 'c'
+    cache.put("c", (b"1234", "application/json"))
+    assert ("a" in cache, "b" in cache, "c" in cache) == (True, False, True)
+
+    # Larger than the whole budget, not cached
+    cache.put("d", (b"0" * 11, "application/json"))
+    assert "d" not in cache
+
+    stats = cache.stats()
+    assert (stats["results"], stats["bytes"], stats["hits"]) == (2, 8, 1)
+
+
+def test_result_cache_ttl():
+    clock = Clock()
+    cache = ResultCache(max_bytes=10, ttl=5, clock=clock)
+    cache.put("a", (b"1234", "application/json"))
+    clock.now = 4.9
+    assert cache.get("a") is not None
+    clock.now = 5
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_result_cache_metrics():
+    registry = CollectorRegistry()
+    metrics = GordoServerPrometheusMetrics(
+        info={"version": "0.60.0"}, registry=registry
+    )
+    cache = ResultCache(max_bytes=10, ttl=5, metrics=metrics)
+    cache.get("a", name="model-a")
+    cache.put("a", (b"1234", "application/json"))
+    cache.get("a", name="model-a")
+
+    labels = {"version": "0.60.0", "model": "model-a"}
+    for name in ("hits", "misses"):
+        assert (
+            registry.get_sample_value(f"gordo_server_result_cache_{name}_total", labels)
+            == 1
+        )
+
+
+@pytest.fixture
+def client(tmpdir, monkeypatch):
+    monkeypatch.setattr(artifacts, "identities", ArtifactIdentities(interval=0))
+    for name in ("model-a", "model-b"):
+        tmpdir.mkdir(name).join("model.pkl").write("model")
+    app = Flask(__name__)
+    app.config.update(RESULT_CACHE_MAX_BYTES=1000, RESULT_CACHE_TTL_S=60)
+    result_cache.init_app(app)
+    calls = []
+
+    @app.before_request
+    def _set_revision():
+        g.revision = request.args.get("revision", "1234")
+        g.collection_dir = str(tmpdir)
+
+    @app.route("/<gordo_name>/prediction", methods=["POST"])
+    @result_cache.cached
+    def prediction(gordo_name):
+        calls.append(gordo_name)
+        if request.json.get("fail"):
+            return jsonify({"error": "failed"}), 400
+        return jsonify({"name": gordo_name, "X": request.json["X"]})
+
+    client = app.test_client()
+    client.calls = calls
+    client.collection_dir = str(tmpdir)
+    return client
+
+
+def test_result_cache_view(client):
+    resp = client.post("/model-a/prediction", json={"X": [1, 2]})
+    assert resp.headers["X-Gordo-Result-Cache"] == "miss"
+
+    resp = client.post("/model-a/prediction", json={"X": [1, 2]})
+    assert resp.headers["X-Gordo-Result-Cache"] == "hit"
+    assert resp.json == {"name": "model-a", "X": [1, 2]}
+    assert client.calls == ["model-a"]
+
+    # A different body, model, revision or query parameters is a different request
+    client.post("/model-a/prediction", json={"X": [1, 3]})
+    client.post("/model-b/prediction", json={"X": [1, 2]})
+    client.post("/model-a/prediction?revision=2345", json={"X": [1, 2]})
+    client.post("/model-a/prediction?format=parquet", json={"X": [1, 2]})
+    assert len(client.calls) == 5
+
+
+def test_result_cache_view_errors_not_cached(client):
+    for _ in range(2):
+        resp = client.post("/model-a/prediction", json={"X": [1], "fail": True})
+        assert resp.status_code == 400
+    assert len(client.calls) == 2
+
+
+def test_result_cache_view_model_rebuilt(client):
+    """
+    Results of a model aren't served once it's rebuilt in the same revision
+    """
+    client.post("/model-a/prediction", json={"X": [1, 2]})
+    with open(os.path.join(client.collection_dir, "model-a", "model.pkl"), "w") as f:
+        f.write("rebuilt model")
+    resp = client.post("/model-a/prediction", json={"X": [1, 2]})
+    assert resp.headers["X-Gordo-Result-Cache"] == "miss"
+    assert len(client.calls) == 2
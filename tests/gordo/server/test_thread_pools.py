@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from threadpoolctl import threadpool_info, threadpool_limits
+
+from gordo.server import thread_pools
+from gordo.server.thread_pools import ThreadPoolSettings
+
+
+@pytest.mark.parametrize(
+    "files,expected",
+    [
+        ({"cpu.max": "max 100000"}, None),
+        ({"cpu.max": "250000 100000"}, 2.5),
+        ({"cpu/cpu.cfs_quota_us": "-1", "cpu/cpu.cfs_period_us": "100000"}, None),
+        ({"cpu/cpu.cfs_quota_us": "50000", "cpu/cpu.cfs_period_us": "100000"}, 0.5),
+        ({}, None),
+    ],
+)
+def test_cgroup_cpu_quota(tmpdir, files, expected):
+    for name, content in files.items():
+        path = os.path.join(tmpdir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content + "\n")
+    assert thread_pools.cgroup_cpu_quota(str(tmpdir)) == expected
+
+
+def test_available_cpus(tmpdir):
+    with open(os.path.join(tmpdir, "cpu.max"), "w") as f:
+        f.write("50000 100000")
+    # Never less than one
+    assert thread_pools.available_cpus(str(tmpdir)) == 1
+
+
+@pytest.mark.parametrize(
+    "cpus,workers,concurrency,expected",
+    [
+        (8, 4, 8, ThreadPoolSettings(intra_op=2, inter_op=2, blas=1)),
+        (16, 2, 2, ThreadPoolSettings(intra_op=8, inter_op=2, blas=4)),
+        (2, 4, 1, ThreadPoolSettings(intra_op=1, inter_op=1, blas=1)),
+    ],
+)
+def test_derive_settings(cpus, workers, concurrency, expected):
+    assert (
+        thread_pools.derive_settings(cpus, workers, concurrency, environ={}) == expected
+    )
+
+
+def test_derive_settings_overrides():
+    environ = {
+        "TF_INTRA_OP_THREADS": "3",
+        "TF_INTER_OP_THREADS": "",
+        "BLAS_THREADS": "2",
+    }
+    assert thread_pools.derive_settings(8, 1, 4, environ=environ) == ThreadPoolSettings(
+        intra_op=3, inter_op=4, blas=2
+    )
+
+
+def test_worker_concurrency(monkeypatch):
+    assert thread_pools.worker_concurrency("gthread", 8) == 8
+    assert thread_pools.worker_concurrency("gevent", 8) == 1
+    monkeypatch.setenv("INFERENCE_THREADS", "3")
+    assert thread_pools.worker_concurrency("uvicorn.workers.UvicornWorker", 8) == 3
+
+
+def test_configure():
+    environ = dict()
+    # Restores the limits of the BLAS/OpenMP libraries on exit
+    with threadpool_limits(limits=None):
+        thread_pools.configure(
+            ThreadPoolSettings(intra_op=2, inter_op=1, blas=1), environ
+        )
+        assert all(pool["num_threads"] == 1 for pool in threadpool_info())
+    assert environ["OMP_NUM_THREADS"] == "1"
+    assert environ["TF_NUM_INTRAOP_THREADS"] == "2"
+    assert environ["TF_NUM_INTEROP_THREADS"] == "1"
+
+
+def test_configure_worker(monkeypatch):
+    """
+    Workers size TensorFlow's pools too, which configure() leaves alone as they
+    can only be sized once per process
+    """
+    configure = MagicMock()
+    configure_tensorflow = MagicMock()
+    monkeypatch.setattr(thread_pools, "configure", configure)
+    monkeypatch.setattr(thread_pools, "configure_tensorflow", configure_tensorflow)
+    monkeypatch.delenv("SERVER_THREAD_POOLS", raising=False)
+
+    thread_pools.configure_worker(workers=1, worker_class="gthread", threads=1)
+    settings = configure.call_args[0][0]
+    configure_tensorflow.assert_called_once_with(settings)
+
+
+class FakeTensorFlowThreading:
+    """
+    TensorFlow's threading config, which can't be changed once it's started
+    """
+
+    def __init__(self):
+        self.started = False
+        self.intra_op = self.inter_op = None
+
+    def _set(self, name, value):
+        if self.started:
+            raise RuntimeError("Cannot be modified after initialization")
+        setattr(self, name, value)
+
+    def set_intra_op_parallelism_threads(self, value):
+        self._set("intra_op", value)
+
+    def set_inter_op_parallelism_threads(self, value):
+        self._set("inter_op", value)
+
+
+def test_configure_preload(monkeypatch):
+    """
+    With the models preloaded before forking, which starts TensorFlow, its pools
+    are sized by the main process as the workers would size them
+    """
+    threading = FakeTensorFlowThreading()
+    monkeypatch.setitem(
+        sys.modules,
+        "tensorflow",
+        SimpleNamespace(config=SimpleNamespace(threading=threading)),
+    )
+    monkeypatch.setattr(thread_pools, "_tensorflow_sizes", None)
+    monkeypatch.setattr(thread_pools, "configure", MagicMock())
+    monkeypatch.setattr(thread_pools, "available_cpus", lambda: 8)
+    monkeypatch.delenv("SERVER_THREAD_POOLS", raising=False)
+    settings = thread_pools.worker_settings(
+        workers=2, worker_class="gthread", threads=2
+    )
+    for name, value in thread_pools.tensorflow_environ(settings).items():
+        monkeypatch.setenv(name, value)
+
+    thread_pools.configure_preload()
+    # Loading the models
+    threading.started = True
+    # and then, in each forked worker
+    thread_pools.configure_worker(workers=2, worker_class="gthread", threads=2)
+
+    assert (threading.intra_op, threading.inter_op) == (4, 2)
+    assert (settings.intra_op, settings.inter_op) == (4, 2)
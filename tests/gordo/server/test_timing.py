@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+from flask import Flask, jsonify
+from prometheus_client import CollectorRegistry
+
+from gordo.server import timing
+from gordo.server.prometheus import GordoServerPrometheusMetrics
+
+
+def _app(metrics=None) -> Flask:
+    app = Flask(__name__)
+
+    @app.route("/<gordo_name>/prediction")
+    def prediction(gordo_name):
+        with timing.phase(timing.INFERENCE):
+            pass
+        with timing.phase(timing.SERIALIZE):
+            return jsonify({"name": gordo_name})
+
+    @app.route("/healthcheck")
+    def healthcheck():
+        return "", 200
+
+    @app.after_request
+    def _server_timing(response):
+        response.headers["Server-Timing"] = timing.server_timing(0.5)
+        return response
+
+    timing.init_app(app, metrics=metrics)
+    return app
+
+
+def test_phase_accumulates():
+    with Flask(__name__).test_request_context():
+        for _ in range(3):
+            with timing.phase(timing.PARSE):
+                pass
+        with timing.phase(timing.INFERENCE):
+            pass
+        timings = timing.phase_timings()
+        assert list(timings) == [timing.PARSE, timing.INFERENCE]
+        assert all(duration >= 0 for duration in timings.values())
+
+
+def test_phase_outside_request():
+    with timing.phase(timing.MODEL_LOAD):
+        pass
+    assert timing.phase_timings() == {}
+
+
+def test_server_timing_header():
+    resp = _app().test_client().get("/model-a/prediction")
+    entries = [
+        entry.split(";")[0] for entry in resp.headers["Server-Timing"].split(", ")
+    ]
+    assert entries == ["request_walltime_s", "inference_s", "serialize_s"]
+
+    resp = _app().test_client().get("/healthcheck")
+    assert resp.headers["Server-Timing"] == "request_walltime_s;dur=0.5"
+
+
+def test_phase_metrics():
+    registry = CollectorRegistry()
+    metrics = GordoServerPrometheusMetrics(
+        info={"version": "0.60.0"}, registry=registry
+    )
+    client = _app(metrics=metrics).test_client()
+    client.get("/model-a/prediction")
+    client.get("/model-a/prediction")
+
+    for phase in (timing.INFERENCE, timing.SERIALIZE):
+        labels = {
+            "version": "0.60.0",
+            "model": "model-a",
+            "endpoint": "/<gordo_name>/prediction",
+            "phase": phase,
+        }
+        assert (
+            registry.get_sample_value(
+                "gordo_server_phase_duration_seconds_count", labels
+            )
+            == 2
+        )
@@ -1,11 +1,17 @@
 # -*- coding: utf-8 -*-
+import json
+import os
+import pickle
 import random
 import pytest
 import pandas as pd
 import numpy as np
 import dateutil
 
+from gordo import serializer
+from gordo.server import artifacts
 from gordo.server import utils as server_utils
+from gordo.server.artifacts import ArtifactIdentities
 
 
 @pytest.mark.parametrize(
@@ -31,6 +37,36 @@ def test_dataframe_parquet_serializers(df):
     assert np.allclose(df.values, df_clone.values)
 
 
+@pytest.mark.parametrize(
+    "df",
+    (
+        pd.DataFrame(np.random.random((10, 10))),
+        pd.DataFrame(
+            np.random.random((10, 10)),
+            index=pd.date_range(start="2016-01-01", end="2016-01-02", periods=10),
+        ),
+        pd.DataFrame(
+            np.random.random((10, 4)),
+            columns=pd.MultiIndex.from_product((("col1", "col2"), ("ft1", "ft2"))),
+        ),
+    ),
+)
+def test_dataframe_arrow_serializers(df):
+    """Arrow streams of several record batches give back the same dataframe"""
+    chunks = list(server_utils.dataframe_into_arrow_stream(df.copy(), max_chunksize=3))
+    assert len(chunks) > 1
+    for df_clone in (
+        server_utils.dataframe_from_arrow_bytes(b"".join(chunks)),
+        server_utils.dataframe_from_bytes(server_utils.dataframe_into_arrow_bytes(df)),
+        server_utils.dataframe_from_bytes(
+            server_utils.dataframe_into_parquet_bytes(df)
+        ),
+    ):
+        assert df.columns.tolist() == df_clone.columns.tolist()
+        assert df.index.tolist() == df_clone.index.tolist()
+        assert np.allclose(df.values, df_clone.values)
+
+
 @pytest.mark.parametrize(
     "df",
     [
@@ -48,13 +84,16 @@ def test_dataframe_parquet_serializers(df):
         ),
     ],
 )
-def test_dataframe_from_to_dict(df):
+@pytest.mark.parametrize("orient", ("dict", "split"))
+def test_dataframe_from_to_dict(df, orient):
     """
     Test (de)serializations back and forth between dataframe -> dict -> dataframe
     """
     index_was_datetimes: bool = isinstance(df.index, pd.DatetimeIndex)
 
-    cloned = server_utils.dataframe_from_dict(server_utils.dataframe_to_dict(df))
+    cloned = server_utils.dataframe_from_dict(
+        server_utils.dataframe_to_dict(df, orient=orient)
+    )
 
     if index_was_datetimes:
         # Ensure the function hasn't mutated the index.
@@ -128,3 +167,122 @@ def test_dataframe_from_dict_ordering(index):
 
     assert np.alltrue(df_out.index == original.index)
     assert np.alltrue(df_out.values == original.values)
+
+
+def test_dataframe_to_dict_split():
+    """
+    The split layout holds each timestamp once, and rows of values.
+    """
+    df = pd.DataFrame(
+        np.random.random((10, 4)),
+        columns=pd.MultiIndex.from_product(
+            (("feature1", "feature2"), ("col1", "col2"))
+        ),
+        index=pd.date_range("2016-01-01", "2016-02-01", periods=10),
+    )
+    data = server_utils.dataframe_to_dict(df, orient="split")
+    assert data["index"] == df.index.astype(str).tolist()
+    assert data["columns"][0] == ["feature1", "col1"]
+    assert np.allclose(data["data"], df.values)
+
+    with pytest.raises(ValueError):
+        server_utils.dataframe_to_dict(df, orient="records")
+
+
+@pytest.mark.parametrize(
+    "index",
+    (
+        ["2020-01-01T00:00:00+00:00", "2020-01-01T01:00:00+01:00"],
+        ["2020-01-01T00:00:00Z", "2020-01-01T01:00:00Z"],
+        ["2020-01-01 00:00:00", "2020-01-01 01:00:00.123"],
+        ["2020-01-01", "2020-01-02"],
+        ["20200101T0000", "20200101T0100"],
+    ),
+)
+def test_dataframe_from_dict_index_parsing(index):
+    """
+    Timestamps are parsed the same as by dateutil's isoparse, keeping their timezone
+    """
+    df = server_utils.dataframe_from_dict({"tag-0": dict(zip(index, range(2)))})
+    expected = [dateutil.parser.isoparse(timestamp) for timestamp in index]
+    assert df.index.tolist() == expected
+    assert [ts.utcoffset() for ts in df.index] == [ts.utcoffset() for ts in expected]
+
+
+def test_serving_context(model_collection_directory, gordo_name, metadata):
+    context = server_utils.load_serving_context(model_collection_directory, gordo_name)
+    assert (
+        server_utils.load_serving_context(model_collection_directory, gordo_name)
+        is context
+    )
+
+    assert list(context.tags) == server_utils.tags_from_metadata(metadata)
+    assert context.columns.tolist() == [tag.name for tag in context.tags]
+    assert list(context.target_tags) == server_utils.target_tags_from_metadata(metadata)
+    assert context.frequency == server_utils.frequency_from_metadata(metadata)
+
+    model_meta = metadata["metadata"]["build_metadata"]["model"]["model_meta"]
+    if "feature-thresholds" in model_meta:
+        assert np.allclose(context.feature_thresholds, model_meta["feature-thresholds"])
+        assert context.aggregate_threshold == model_meta["aggregate-threshold"]
+
+
+def _dump_model(model_dir: str, model, metadata: dict = None):
+    os.makedirs(model_dir, exist_ok=True)
+    serializer.dump(model, model_dir, metadata=metadata)
+
+
+def test_load_model_canonical_key(tmpdir):
+    revision_dir = os.path.join(tmpdir, "1234")
+    _dump_model(os.path.join(revision_dir, "model-a"), {"version": 1})
+    server_utils.model_cache.clear()
+
+    model = server_utils.load_model(revision_dir, "model-a")
+    # The same revision, as requested with ?revision=
+    assert (
+        server_utils.load_model(os.path.join(revision_dir, "..", "1234"), "model-a")
+        is model
+    )
+    stats = server_utils.model_cache.stats()
+    assert (stats["models"], stats["hits"], stats["misses"]) == (1, 1, 1)
+    server_utils.model_cache.clear()
+
+
+def test_load_model_replaced_in_place(tmpdir, monkeypatch):
+    monkeypatch.setattr(artifacts, "identities", ArtifactIdentities(interval=60))
+    model_dir = os.path.join(tmpdir, "1234", "model-a")
+    _dump_model(model_dir, {"version": 1})
+    server_utils.model_cache.clear()
+    assert server_utils.load_model(os.path.dirname(model_dir), "model-a") == {
+        "version": 1
+    }
+
+    with open(os.path.join(model_dir, "model.pkl"), "wb") as f:
+        pickle.dump({"version": 2, "padding": "a larger artifact"}, f)
+
+    # Until its identity is checked again
+    assert server_utils.load_model(os.path.dirname(model_dir), "model-a") == {
+        "version": 1
+    }
+    artifacts.identities.clear()
+    assert server_utils.load_model(os.path.dirname(model_dir), "model-a") == {
+        "version": 2,
+        "padding": "a larger artifact",
+    }
+    stats = server_utils.model_cache.stats()
+    assert (stats["models"], stats["evictions"]) == (1, 1)
+    server_utils.model_cache.clear()
+
+
+def test_load_metadata_replaced_in_place(tmpdir, monkeypatch):
+    monkeypatch.setattr(artifacts, "identities", ArtifactIdentities(interval=0))
+    model_dir = os.path.join(tmpdir, "1234", "model-a")
+    _dump_model(model_dir, {}, metadata={"name": "model-a"})
+    revision_dir = os.path.dirname(model_dir)
+    assert server_utils.load_metadata(revision_dir, "model-a") == {"name": "model-a"}
+
+    with open(os.path.join(model_dir, "metadata.json"), "w") as f:
+        json.dump({"name": "model-a", "revision": "rebuilt"}, f)
+    assert server_utils.load_metadata(
+        os.path.join(revision_dir, "..", "1234"), "model-a"
+    ) == {"name": "model-a", "revision": "rebuilt"}
@@ -631,3 +631,22 @@ def test_expected_models_in_workflow(repo_dir):
 def test_default_image_pull_policy(gordo_version, expected):
     result = default_image_pull_policy(gordo_version)
     assert result == expected
+
+
+def test_metadata_catalog_after_model_builders(path_to_config_files):
+    """
+    The metadata catalog of the revision is written once all of its models are built
+    """
+    expanded_template = _generate_test_workflow_yaml(
+        path_to_config_files, "config-test-disable-influx.yml"
+    )
+    templates = expanded_template["spec"]["templates"]
+    do_all = [task for task in templates if task["name"] == "do-all"][0]
+    tasks = {task["name"]: task for task in do_all["dag"]["tasks"]}
+
+    model_builders = sorted(name for name in tasks if name.startswith("model-builder-"))
+    assert model_builders
+    assert sorted(tasks["metadata-catalog"]["dependencies"]) == model_builders
+
+    template = [task for task in templates if task["name"] == "metadata-catalog"][0]
+    assert template["container"]["command"] == ["gordo", "build-metadata-catalog"]